@@ -4,28 +4,42 @@ from typing import Dict, Any, List
 
 from app.services.inference_service import get_inference_service  # type: ignore
 from app.services.nutrition_service import get_nutrition_service  # type: ignore
-from app.services.nutrition_goal_service import evaluate_day  # type: ignore
+from app.services.daily_summary import apply_logs, today_totals, MACROS  # type: ignore
+from app.services.nutrition_goal_service import calculate_targets, evaluate_day, Profile  # type: ignore
 from app.services.supabase_service import get_supabase_service  # type: ignore
+from app.services.prediction_token import verify_prediction_token  # type: ignore
+from app.services.admission import get_admission  # type: ignore
+from app.services import metrics  # type: ignore
 
 
-def log_meal_controller(user_id: str, meal_type: str, servings: float, filename: str, content: bytes, model_key: str | None = None) -> Dict[str, Any]:
-    # Use selected model if provided to keep consistency with /api/predict
-    infer = get_inference_service(model_key or 'resnet_food101')
+def log_meal_controller(user_id: str, meal_type: str, servings: float, filename: str, content: bytes, model_key: str | None = None, prediction_token: str | None = None,
+                        client: str | None = None, deadline_ms: float | None = None) -> Dict[str, Any]:
+    """Raises AdmissionRejected when the model has to run and no inference slot frees up in time."""
     nutri = get_nutrition_service()
     sb = get_supabase_service()
 
-    pred = infer.predict(content)
+    # Reuse the /api/predict result when the client hands back a valid token for these bytes
+    pred = verify_prediction_token(prediction_token, content, model_key) if prediction_token else None
+    metrics.inc('prediction_tokens_total', result='reused' if pred else ('invalid' if prediction_token else 'absent'))
+    if pred is None:
+        # Use selected model if provided to keep consistency with /api/predict
+        infer = get_inference_service(model_key or 'resnet_food101')
+        # Same slots as /api/predict, so logging can't run the model past the concurrency cap
+        with get_admission().slot(client or f"user:{user_id}", deadline_ms), metrics.stage('inference'):
+            pred = infer.predict(content)
     if not pred.get("success"):
         return {"success": False, "error": pred.get("error", "predict failed")}
 
-    nres = nutri.get_nutrition(pred.get("class_name", ""))
+    with metrics.stage('nutrition_lookup'):
+        nres = nutri.get_nutrition(pred.get("class_name", ""))
     nutrition = nres.get("nutrition") if nres.get("success") else {"calories":0,"protein":0,"fat":0,"carbs":0,"fiber":0}
     scaled = {k: float(v) * float(servings) for k, v in nutrition.items()}
 
     # Try to upload image; on failure, continue without image but include warning
     public_url = None
     try:
-        public_url = sb.upload_image(user_id, content, filename)
+        with metrics.stage('upload_image'):
+            public_url = sb.upload_image(user_id, content, filename)
     except Exception as e:
         # Proceed without image URL; caller can still save the meal, but surface reason
         public_url = None
@@ -42,11 +56,16 @@ def log_meal_controller(user_id: str, meal_type: str, servings: float, filename:
         **scaled,
     }
     try:
-        saved = sb.insert_food_log(log)
+        with metrics.stage('insert_food_log'):
+            saved = sb.insert_food_log(log)
         # Ensure at least the keys we attempted to write are returned
         if not saved:
             return {"success": False, "error": "Insert failed without details."}
+        apply_logs(sb, user_id, [{**log, **saved}])
         resp = {"success": True, "log": saved}
+        # Same shape as /api/predict: lets the client flag approximate ('fuzzy') or missing nutrition
+        resp["nutrition_match"] = {"dish_name": nres.get("dish_name"), "match": nres.get("match"),
+                                   "score": nres.get("match_score")} if nres.get("success") else None
         if public_url is None:
             # Include error message if available
             resp["warning"] = "Image upload failed; saved without image." + (f" Reason: {upload_error}" if 'upload_error' in locals() else "")
@@ -57,13 +76,38 @@ def log_meal_controller(user_id: str, meal_type: str, servings: float, filename:
 
 def meals_today_controller(user_id: str) -> Dict[str, Any]:
     sb = get_supabase_service()
+    # Logs are still listed in the response; totals come from the summary row kept by the write paths
     logs = sb.get_food_logs_by_day(user_id, date.today())
-    totals = {"calories":0.0,"protein":0.0,"fat":0.0,"carbs":0.0,"fiber":0.0}
-    for r in logs:
-        for k in totals:
-            totals[k] += float(r.get(k,0) or 0)
     prof = sb.get_profile(user_id) or {}
     targets = prof.get("targets") or {}
-    evaluation = evaluate_day(totals, targets) if targets else {"complete": False, "missing": {}, "breakdown": {}}
-    sb.upsert_daily_summary({"user_id": user_id, "day": date.today().isoformat(), "totals": totals, "complete": evaluation.get("complete", False)})
+    totals, evaluation = today_totals(sb, user_id, logs, targets)
     return {"success": True, "date": date.today().isoformat(), "logs": logs, "totals": totals, "evaluation": evaluation}
+
+
+def plan_suggest_controller(user_id: str, k: int = 3, max_items: int | None = None) -> Dict[str, Any]:
+    sb = get_supabase_service()
+    prof = sb.get_profile(user_id) or {}
+    targets = prof.get("targets") or {}
+    if not targets:
+        # Profiles saved before targets were stored: derive them like the profile upsert does
+        try:
+            targets = calculate_targets(Profile(
+                age=int(prof.get('age') or 25),
+                weight_kg=float(prof.get('weight_kg') or 60.0),
+                height_cm=float(prof.get('height_cm') or 170.0),
+                gender=str(prof.get('gender') or 'male'),
+                activity=str(prof.get('activity') or 'moderate'),
+            ))
+        except Exception:
+            targets = {"calories":2000.0,"protein":100.0,"fat":70.0,"carbs":250.0,"fiber":25.0}
+    # Today's logs are read only when the summary row is missing
+    totals, evaluation = today_totals(sb, user_id, None, targets)
+    remaining = {m: round(max(0.0, float(targets.get(m, 0) or 0) - totals[m]), 1) for m in MACROS}
+
+    with metrics.stage('plan_suggest'):
+        result = get_nutrition_service().suggest_plan(remaining, targets, k=k, max_items=max_items)
+    for plan in result["plans"]:
+        after = {m: totals[m] + plan["totals"][m] for m in MACROS}
+        plan["completes_day"] = bool(evaluate_day(after, targets).get("complete"))
+    return {"success": True, "date": date.today().isoformat(), "targets": targets, "totals": totals,
+            "remaining": remaining, "evaluation": evaluation, **result}
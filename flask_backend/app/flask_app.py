@@ -4,8 +4,8 @@ Flask app factory registering blueprints and serving the Handlebars site.
 from __future__ import annotations
 #.\.venv\Scripts\Activate.ps1  
 #py -m app.flask_app
-import os, sys
-from flask import Flask, send_from_directory, Response, redirect, request, jsonify
+import os, sys, time
+from flask import Flask, send_from_directory, Response, redirect, request, jsonify, g
 from flask_cors import CORS
 from dotenv import load_dotenv
 
@@ -17,6 +17,12 @@ _ld(os.path.join(BASE_DIR, ".env"))
 
 def create_app() -> Flask:
     app = Flask(__name__, static_folder=None)
+    # Behind N reverse proxies (e.g. Render's router: 1), take the client IP from the
+    # last N X-Forwarded-For hops; with 0 the header is ignored, since clients can forge it
+    proxy_hops = int(os.getenv('TRUSTED_PROXY_HOPS', '0'))
+    if proxy_hops > 0:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxy_hops, x_proto=proxy_hops)
     # Allow all origins + credentials for Supabase auth cookies/headers; adapt if locking down later.
     CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
 
@@ -25,11 +31,45 @@ def create_app() -> Flask:
     from .routes.predict import bp as predict_bp
     from .routes.user import bp as user_bp
     from .routes.meals import bp as meals_bp
+    from .routes.nutrition import bp as nutrition_bp
 
     app.register_blueprint(health_bp)
     app.register_blueprint(predict_bp)
     app.register_blueprint(user_bp)
     app.register_blueprint(meals_bp)
+    app.register_blueprint(nutrition_bp)
+
+    # Load + warm models in background threads (per worker, after gunicorn forks);
+    # /ready reports 503 until they are warm, /health stays a cheap liveness check.
+    from app.services.inference_service import start_preload  # type: ignore
+    from app.services.nutrition_service import warm_nutrition  # type: ignore
+    start_preload()
+    warm_nutrition()
+
+    # Per-route latency + in-flight gauges; the route template keeps label cardinality bounded
+    from app.services import metrics  # type: ignore
+
+    if metrics.METRICS_ENABLED:
+        @app.before_request
+        def _metrics_start():
+            g._metrics_route = request.url_rule.rule if request.url_rule else 'unmatched'
+            g._metrics_start = time.perf_counter()
+            metrics.gauge_add('http_requests_in_flight', 1, route=g._metrics_route)
+
+        @app.after_request
+        def _metrics_observe(resp):
+            start = g.get('_metrics_start')
+            if start is not None:
+                metrics.observe('http_request_duration_seconds', time.perf_counter() - start,
+                                method=request.method, route=g._metrics_route, status=resp.status_code)
+            return resp
+
+        @app.teardown_request
+        def _metrics_done(_exc):
+            # teardown runs even when a handler raised, so the gauge cannot leak
+            route = g.pop('_metrics_route', None)
+            if route is not None:
+                metrics.gauge_add('http_requests_in_flight', -1, route=route)
 
     # Serve static assets under /app/*
     WEB_DIR = os.path.join(BASE_DIR, "web")
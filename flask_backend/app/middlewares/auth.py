@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import os
 from functools import wraps
-from typing import Callable, Optional, Any, Dict
+from typing import Callable, Optional, Any, Dict, Tuple
 from flask import request, jsonify, g
 
 from dotenv import load_dotenv
@@ -10,6 +10,8 @@ load_dotenv()
 
 # Use local services package directly
 from app.services.supabase_service import get_supabase_service  # type: ignore
+from app.services import metrics  # type: ignore
+from app.services.auth_tokens import verify_token, should_upsert_user  # type: ignore
 
 REQUIRE_JWT = os.getenv("REQUIRE_JWT", "true").lower() == "true"
 DEMO_USER_ID = os.getenv("DEMO_USER_ID", "").strip()
@@ -24,6 +26,65 @@ def _extract_user_id(user_obj: Any) -> Optional[str]:
     return getattr(user_obj, 'id', None)
 
 
+def _user_fields(user: Any) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """(email, display_name, url_image) from a supabase-py User or a claims dict."""
+    if isinstance(user, dict):
+        email = user.get('email')
+        meta = user.get('user_metadata') or {}
+    else:
+        email = getattr(user, 'email', None)
+        meta = getattr(user, 'user_metadata', None) or {}
+    display_name = url_image = None
+    if isinstance(meta, dict):
+        display_name = meta.get('display_name') or meta.get('full_name')
+        url_image = meta.get('avatar_url') or meta.get('picture')
+    return email, display_name, url_image
+
+
+def _remote_user(token: str) -> Any:
+    # Validate token using admin api (only when it cannot be checked locally)
+    sb = get_supabase_service()
+    with metrics.stage('auth_get_user'):
+        res = sb.client.auth.get_user(token)
+    return getattr(res, "user", None)
+
+
+def _authenticate(token: str) -> Optional[str]:
+    """User id for a valid token, stashed on g; None if the token is invalid."""
+    with metrics.stage('auth_verify'):
+        user = verify_token(token, _remote_user)
+    uid = _extract_user_id(user)
+    if not uid:
+        return None
+    # Stash user id for downstream handlers
+    g.user_id = uid
+    # Best-effort upsert into public.users for app bookkeeping, only when it changed
+    try:
+        fields = _user_fields(user)
+        if should_upsert_user(uid, fields):
+            email, display_name, url_image = fields
+            with metrics.stage('upsert_user'):
+                get_supabase_service().upsert_user(uid, email=email, display_name=display_name, url_image=url_image)
+    except Exception:
+        pass
+    return uid
+
+
+def optional_user_id() -> Optional[str]:
+    """Verified user id on a public route: from require_auth, else a valid Bearer token.
+    None when anonymous or the token is invalid; never rejects the request."""
+    uid = getattr(g, 'user_id', None)
+    if uid:
+        return uid
+    auth = request.headers.get("Authorization", "")
+    if not auth.startswith("Bearer "):
+        return None
+    try:
+        return _authenticate(auth.split(" ", 1)[1].strip())
+    except Exception:
+        return None
+
+
 def require_auth(fn: Callable):
     @wraps(fn)
     def wrapper(*args, **kwargs):
@@ -34,36 +95,14 @@ def require_auth(fn: Callable):
             if auth.startswith("Bearer "):
                 token = auth.split(" ", 1)[1].strip()
                 try:
-                    sb = get_supabase_service()
-                    res = sb.client.auth.get_user(token)
-                    user = getattr(res, "user", None)
-                    uid = _extract_user_id(user)
-                    if not uid:
-                        return jsonify({"success": False, "error": "Invalid token"}), 401
-                    g.user_id = uid
-                    try:
-                        email = None
-                        display_name = None
-                        url_image = None
-                        if isinstance(user, dict):
-                            email = user.get('email')
-                            meta = user.get('user_metadata') or {}
-                            if isinstance(meta, dict):
-                                display_name = meta.get('display_name') or meta.get('full_name')
-                                url_image = meta.get('avatar_url') or meta.get('picture')
-                        else:
-                            email = getattr(user, 'email', None)
-                            meta = getattr(user, 'user_metadata', None) or {}
-                            if isinstance(meta, dict):
-                                display_name = meta.get('display_name') or meta.get('full_name')
-                                url_image = meta.get('avatar_url') or meta.get('picture')
-                        sb.upsert_user(uid, email=email, display_name=display_name, url_image=url_image)
-                    except Exception:
-                        pass
-                    return fn(*args, **kwargs)
+                    uid = _authenticate(token)
                 except Exception:
                     # Fall through to header/env fallback below
-                    pass
+                    uid = ''
+                if uid is None:
+                    return jsonify({"success": False, "error": "Invalid token"}), 401
+                if uid:
+                    return fn(*args, **kwargs)
             # Otherwise, require X-User-Id header or DEMO_USER_ID env var
             uid = request.headers.get('X-User-Id') or DEMO_USER_ID
             if not uid:
@@ -78,36 +117,10 @@ def require_auth(fn: Callable):
             return jsonify({"success": False, "error": "Missing Bearer token"}), 401
         token = auth.split(" ", 1)[1].strip()
         try:
-            sb = get_supabase_service()
-            # Validate token using admin api
-            res = sb.client.auth.get_user(token)
-            user = getattr(res, "user", None)
-            uid = _extract_user_id(user)
-            if not uid:
-                return jsonify({"success": False, "error": "Invalid token"}), 401
-            # Stash user id for downstream handlers
-            g.user_id = uid
-            # Best-effort upsert into public.users for app bookkeeping
-            try:
-                email = None
-                display_name = None
-                url_image = None
-                if isinstance(user, dict):
-                    email = user.get('email')
-                    meta = user.get('user_metadata') or {}
-                    if isinstance(meta, dict):
-                        display_name = meta.get('display_name') or meta.get('full_name')
-                        url_image = meta.get('avatar_url') or meta.get('picture')
-                else:
-                    email = getattr(user, 'email', None)
-                    meta = getattr(user, 'user_metadata', None) or {}
-                    if isinstance(meta, dict):
-                        display_name = meta.get('display_name') or meta.get('full_name')
-                        url_image = meta.get('avatar_url') or meta.get('picture')
-                sb.upsert_user(uid, email=email, display_name=display_name, url_image=url_image)
-            except Exception:
-                pass
+            uid = _authenticate(token)
         except Exception:
             return jsonify({"success": False, "error": "Unauthorized"}), 401
+        if not uid:
+            return jsonify({"success": False, "error": "Invalid token"}), 401
         return fn(*args, **kwargs)
     return wrapper
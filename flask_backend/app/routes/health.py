@@ -1,8 +1,26 @@
 from __future__ import annotations
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, jsonify
+from app.services.inference_service import get_readiness  # type: ignore
+from app.services.metrics import METRICS_ENABLED, render_all  # type: ignore
 
 bp = Blueprint('health', __name__)
 
 @bp.get('/health')
 def health():
+    """Liveness: cheap, never touches models or Supabase."""
     return jsonify({"status": "healthy", "backend": "flask"})
+
+
+@bp.get('/ready')
+def ready():
+    """Readiness: 200 only once the preloaded models are loaded and warmed up (per worker)."""
+    r = get_readiness()
+    return jsonify({"status": "ready" if r['ready'] else "starting", **r}), (200 if r['ready'] else 503)
+
+
+@bp.get('/metrics')
+def metrics():
+    """Prometheus text format, merged across all gunicorn workers (see services/metrics.py)."""
+    if not METRICS_ENABLED:
+        return Response("metrics disabled (METRICS=false)\n", status=404, mimetype="text/plain")
+    return Response(render_all(), content_type="text/plain; version=0.0.4; charset=utf-8")
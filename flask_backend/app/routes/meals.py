@@ -1,20 +1,30 @@
 from __future__ import annotations
+import base64
+import json
+import uuid
 from flask import Blueprint, request, jsonify, g
 from ..middlewares.auth import require_auth
-from .utils import require_fields
+from .utils import busy, client_key, deadline_ms, require_fields
 from ..controllers.meals_controller import (
     log_meal_controller,
     meals_today_controller,
+    plan_suggest_controller,
 )
 from app.services.supabase_service import get_supabase_service  # type: ignore
+from app.services.admission import AdmissionRejected  # type: ignore
 from datetime import date, datetime, timedelta, timezone
 from ..services.nutrition_goal_service import calculate_targets, Profile  # type: ignore
+from app.services.daily_summary import apply_logs  # type: ignore
+from app.services.stats_series import MACROS, stats_series as stats_series_totals  # type: ignore
+from app.services.response_cache import cached_response, invalidates_user_cache  # type: ignore
+from app.services.nutrition_service import get_nutrition_service  # type: ignore
 
 bp = Blueprint('meals', __name__, url_prefix='/api')
 
 
 @bp.post('/meals/log')
 @require_auth
+@invalidates_user_cache
 def log_meal():
     try:
         if 'file' not in request.files:
@@ -26,8 +36,14 @@ def log_meal():
         meal_type = request.form.get('meal_type', 'unspecified')
         # Optional model selection to align with /api/predict
         model_key = request.form.get('model')
+        # Optional token from /api/predict; skips re-running the model for the same image
+        prediction_token = request.form.get('prediction_token')
         f = request.files['file']
-        res = log_meal_controller(g.user_id, meal_type, servings, f.filename, f.read(), model_key=model_key)
+        try:
+            res = log_meal_controller(g.user_id, meal_type, servings, f.filename, f.read(), model_key=model_key,
+                                      prediction_token=prediction_token, client=client_key(), deadline_ms=deadline_ms())
+        except AdmissionRejected as e:
+            return busy(e.retry_after, e.reason)
         status = 200 if res.get('success') else 500
         return jsonify(res), status
     except Exception as e:
@@ -36,52 +52,90 @@ def log_meal():
 
 @bp.get('/meals/today')
 @require_auth
+@cached_response
 def meals_today():
     return jsonify(meals_today_controller(g.user_id))
 
 
+# Columns /meals/history may return (?fields=); id + created_at always come back for the cursor
+HISTORY_FIELDS = ('id', 'created_at', 'meal_type', 'image_url', 'food_name', 'class_name', 'confidence',
+                  'servings', 'calories', 'protein', 'fat', 'carbs', 'fiber')
+HISTORY_PAGE_SIZE = 50
+HISTORY_PAGE_MAX = 200
+
+
+def _encode_cursor(row: dict) -> str:
+    raw = json.dumps([row['created_at'], row['id']], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor: str) -> tuple[str, str]:
+    """(created_at, id) of the last row of the previous page; ValueError if malformed."""
+    try:
+        created_at, log_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        datetime.fromisoformat(str(created_at))
+        return str(created_at), str(uuid.UUID(str(log_id)))
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
 @bp.get('/meals/history')
 @require_auth
+@cached_response
 def meals_history():
-    s = request.args.get('start')
-    e = request.args.get('end')
-    today = date.today()
-    try:
-        start_d = datetime.fromisoformat(s).date() if s else (today - timedelta(days=7))
-    except Exception:
-        start_d = today - timedelta(days=7)
+    """One page of the user's logs between start..end, keyset-paginated on (created_at, id).
+    Query params:
+      - start, end: YYYY-MM-DD (inclusive, default last 7 days)
+      - limit: page size (default 50, max 200); order: asc|desc (default asc)
+      - cursor: next_cursor from the previous page
+      - fields: comma-separated subset of HISTORY_FIELDS
+      - totals: 0 to skip daily_totals (only sent with the first page)
+    """
+    start_d, end_d, start_utc, end_utc, _ = _parse_local_range(request.args.get('start'), request.args.get('end'), default_days=7)
     try:
-        end_d = datetime.fromisoformat(e).date() if e else today
-    except Exception:
-        end_d = today
-    # Ensure start <= end
-    if start_d > end_d:
-        start_d, end_d = end_d, start_d
-    # Compute local timezone day window and convert to UTC
-    local_tz = datetime.now().astimezone().tzinfo
-    start_local = datetime.combine(start_d, datetime.min.time(), tzinfo=local_tz)
-    # inclusive end day -> add one day then use half-open [start, end)
-    end_local_plus = datetime.combine(end_d + timedelta(days=1), datetime.min.time(), tzinfo=local_tz)
-    start_utc = start_local.astimezone(timezone.utc).isoformat()
-    end_utc = end_local_plus.astimezone(timezone.utc).isoformat()
+        limit = min(HISTORY_PAGE_MAX, max(1, int(request.args.get('limit', HISTORY_PAGE_SIZE))))
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid limit"}), 400
+    desc = (request.args.get('order') or 'asc').lower() == 'desc'
+    fields = [f.strip() for f in (request.args.get('fields') or '').split(',') if f.strip()]
+    unknown = [f for f in fields if f not in HISTORY_FIELDS]
+    if unknown:
+        return jsonify({"success": False, "error": f"Unknown fields: {', '.join(unknown)}"}), 400
+    columns = list(dict.fromkeys(['id', 'created_at', *fields])) if fields else list(HISTORY_FIELDS)
+    cursor = request.args.get('cursor')
+
     sb = get_supabase_service()
-    res = (sb.client.table('food_logs').select('*')
-           .eq('user_id', g.user_id)
-           .gte('created_at', start_utc)
-           .lt('created_at', end_utc)
-           .order('created_at', desc=False).execute())
-    logs = res.data or []
-    daily = {}
-    for r in logs:
-        day = r['created_at'][:10]
-        daily.setdefault(day, {"calories":0.0,"protein":0.0,"fat":0.0,"carbs":0.0,"fiber":0.0})
-        for k in ["calories","protein","fat","carbs","fiber"]:
-            daily[day][k] += float(r.get(k,0) or 0)
-    return jsonify({"success": True, "range": {"start": start_d.isoformat(), "end": end_d.isoformat()}, "logs": logs, "daily_totals": daily})
+    q = (sb.client.table('food_logs').select(','.join(columns))
+         .eq('user_id', g.user_id)
+         .gte('created_at', start_utc)
+         .lt('created_at', end_utc))
+    if cursor:
+        try:
+            after_at, after_id = _decode_cursor(cursor)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        op = 'lt' if desc else 'gt'
+        q = q.or_(f'created_at.{op}."{after_at}",and(created_at.eq."{after_at}",id.{op}.{after_id})')
+    # One extra row tells whether another page exists; served by the (user_id, created_at, id) index
+    rows = q.order('created_at', desc=desc).order('id', desc=desc).limit(limit + 1).execute().data or []
+    has_more = len(rows) > limit
+    logs = rows[:limit]
+    body = {
+        "success": True,
+        "range": {"start": start_d.isoformat(), "end": end_d.isoformat()},
+        "logs": logs,
+        "has_more": has_more,
+        "next_cursor": _encode_cursor(logs[-1]) if has_more else None,
+    }
+    if not cursor and request.args.get('totals', '1') != '0':
+        # Whole-range per-day totals, independent of the page (aggregated in Postgres)
+        body["daily_totals"] = {r["key"]: {m: r[m] for m in MACROS} for r in stats_series_totals(sb, g.user_id, start_utc, end_utc, 'day')}
+    return jsonify(body)
 
 
 @bp.get('/streak')
 @require_auth
+@cached_response
 def streak():
     sb = get_supabase_service()
     start = (date.today() - timedelta(days=60)).isoformat()
@@ -96,27 +150,25 @@ def streak():
 
 @bp.delete('/meals/log/<log_id>')
 @require_auth
+@invalidates_user_cache
 def delete_meal_log(log_id: str):
     """Delete one meal log owned by the current user."""
     try:
         sb = get_supabase_service()
-        res = (sb.client.table('food_logs')
-               .delete()
-               .eq('id', log_id)
-               .eq('user_id', g.user_id)
-               .execute())
-        # Supabase returns deleted rows in res.data for some versions; success even if 0 rows
-        return jsonify({"success": True, "deleted": len(getattr(res, 'data', []) or [])})
+        deleted = sb.delete_food_log(g.user_id, log_id)
+        # Success even if 0 rows; subtract what was removed from its day's summary
+        apply_logs(sb, g.user_id, deleted, sign=-1.0)
+        return jsonify({"success": True, "deleted": len(deleted)})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 
-def _parse_local_range(start_str: str | None, end_str: str | None):
+def _parse_local_range(start_str: str | None, end_str: str | None, default_days: int = 30):
     today = date.today()
     try:
-        start_d = datetime.fromisoformat(start_str).date() if start_str else (today - timedelta(days=30))
+        start_d = datetime.fromisoformat(start_str).date() if start_str else (today - timedelta(days=default_days))
     except Exception:
-        start_d = today - timedelta(days=30)
+        start_d = today - timedelta(days=default_days)
     try:
         end_d = datetime.fromisoformat(end_str).date() if end_str else today
     except Exception:
@@ -133,6 +185,7 @@ def _parse_local_range(start_str: str | None, end_str: str | None):
 
 @bp.get('/stats/series')
 @require_auth
+@cached_response
 def stats_series():
     """Return time-series of nutrition totals for the user between start..end.
     Query params:
@@ -148,59 +201,11 @@ def stats_series():
         bucket = 'day'
     goal_weight = request.args.get('goal_weight')
 
-    start_d, end_d, start_utc, end_utc, local_tz = _parse_local_range(s, e)
+    start_d, end_d, start_utc, end_utc, _ = _parse_local_range(s, e)
     sb = get_supabase_service()
-    res = (sb.client.table('food_logs').select('*')
-           .eq('user_id', g.user_id)
-           .gte('created_at', start_utc)
-           .lt('created_at', end_utc)
-           .order('created_at', desc=False).execute())
-    rows = res.data or []
-
-    # Helper to parse created_at to local datetime
-    def to_local_dt(ts):
-        try:
-            dt = datetime.fromisoformat(str(ts))
-            if dt.tzinfo is None:
-                dt = dt.replace(tzinfo=timezone.utc)
-            return dt.astimezone(local_tz)
-        except Exception:
-            return None
-
-    # Bucket function
-    def bucket_key_and_sort(dt: datetime):
-        if bucket == 'day':
-            key = dt.date().isoformat()
-            sort_k = datetime(dt.year, dt.month, dt.day, tzinfo=local_tz)
-        elif bucket == 'week':
-            y, w, _ = dt.isocalendar()
-            key = f"{y}-W{int(w):02d}"
-            # Monday of ISO week
-            monday = (dt - timedelta(days=dt.weekday())).date()
-            sort_k = datetime(monday.year, monday.month, monday.day, tzinfo=local_tz)
-        elif bucket == 'month':
-            key = f"{dt.year}-{int(dt.month):02d}"
-            sort_k = datetime(dt.year, dt.month, 1, tzinfo=local_tz)
-        else:  # year
-            key = f"{dt.year}"
-            sort_k = datetime(dt.year, 1, 1, tzinfo=local_tz)
-        return key, sort_k
-
-    # Aggregate
-    agg: dict[str, dict] = {}
-    for r in rows:
-        dt = to_local_dt(r.get('created_at'))
-        if not dt:
-            continue
-        key, sort_k = bucket_key_and_sort(dt)
-        a = agg.setdefault(key, {"calories":0.0,"protein":0.0,"fat":0.0,"carbs":0.0,"fiber":0.0, "_sort": sort_k })
-        for k in ("calories","protein","fat","carbs","fiber"):
-            a[k] += float(r.get(k,0) or 0)
-
-    # Sort buckets by sort key
-    items = sorted(agg.items(), key=lambda kv: kv[1]["_sort"]) if agg else []
-    labels = [k for k,_ in items]
-    series = [{"key": k, **{m:v for m,v in d.items() if m != "_sort"}} for k,d in items]
+    # Bucketed in Postgres (stats_series function); one row per bucket comes back
+    series = stats_series_totals(sb, g.user_id, start_utc, end_utc, bucket)
+    labels = [r["key"] for r in series]
 
     # Compute targets from profile and optional goal_weight adjustment
     prof = sb.get_profile(g.user_id) or {}
@@ -246,7 +251,7 @@ def stats_series():
     # Advice based on average per day over the date range
     total_days = max(1, (end_d - start_d).days + 1)
     sums = {"calories":0.0,"protein":0.0,"fat":0.0,"carbs":0.0,"fiber":0.0}
-    for _, d in items:
+    for d in series:
         for k in sums:
             sums[k] += float(d.get(k,0) or 0)
     avgs = {k: (sums[k]/total_days) for k in sums}
@@ -262,16 +267,16 @@ def stats_series():
         elif v > 1.2 * t:
             advice["excess"][k] = round(v - t, 1)
 
-    # Recommendations for missing macros from nutrition dataset
+    # Recommendations for missing macros from the in-process nutrition store (no I/O):
+    # densest sources first, capped at the calories still missing so they don't overshoot
     recs: dict[str, list] = {}
     try:
-        for m in advice["missing"].keys():
+        nutrition = get_nutrition_service()
+        kcal_cap = advice["missing"].get("calories")
+        for m, gap in advice["missing"].items():
             if m not in ("calories","protein","fat","carbs","fiber"):
                 continue
-            q = (sb.client.table('nutrition')
-                 .select('dish_name, calories, protein, fat, carbs, fiber, serving')
-                 .order(m, desc=True).limit(5).execute())
-            recs[m] = q.data or []
+            recs[m] = nutrition.recommend(m, gap=gap, kcal_cap=kcal_cap, k=5)
     except Exception:
         recs = {}
 
@@ -285,3 +290,21 @@ def stats_series():
         "range": {"start": start_d.isoformat(), "end": end_d.isoformat()},
         "bucket": bucket,
     })
+
+
+@bp.get('/plan/suggest')
+@require_auth
+@cached_response
+def plan_suggest():
+    """Dishes + whole servings that best close today's remaining targets.
+    Query params:
+      - k: number of plans (default 3, max 10)
+      - max_items: dishes per plan, 1..3 (default PLAN_MAX_ITEMS)
+    """
+    try:
+        k = max(1, min(10, int(request.args.get('k', 3))))
+        max_items = request.args.get('max_items')
+        max_items = max(1, min(3, int(max_items))) if max_items else None
+    except ValueError:
+        return jsonify({"success": False, "error": "k and max_items must be integers"}), 400
+    return jsonify(plan_suggest_controller(g.user_id, k=k, max_items=max_items))
@@ -0,0 +1,30 @@
+from __future__ import annotations
+from flask import Blueprint, request, jsonify
+from app.services.nutrition_service import get_nutrition_service  # type: ignore
+
+bp = Blueprint('nutrition', __name__, url_prefix='/api/nutrition')
+
+SEARCH_LIMIT = 10
+SEARCH_LIMIT_MAX = 50
+
+
+@bp.get('/search')
+def search():
+    """Autocomplete over dish names and both models' class names (in memory, no I/O).
+    Query params:
+      - q: prefix of any word of the name; accents/case/separators ignored ('pho b' -> 'pho_bo')
+      - limit: max results (default 10, max 50)
+    Each result carries its nutrition per serving, so a client can log it without /api/predict.
+    """
+    q = (request.args.get('q') or '').strip()
+    try:
+        limit = max(1, min(SEARCH_LIMIT_MAX, int(request.args.get('limit', SEARCH_LIMIT))))
+    except ValueError:
+        return jsonify({"success": False, "error": "limit must be an integer"}), 400
+    if not q:
+        return jsonify({"success": False, "error": "q is required"}), 400
+    results = get_nutrition_service().search(q, limit)
+    resp = jsonify({"success": True, "query": q, "results": results})
+    # Same for every user; changes only when the nutrition table or a model does
+    resp.headers['Cache-Control'] = 'public, max-age=60'
+    return resp
@@ -1,10 +1,41 @@
 from __future__ import annotations
-from flask import Blueprint, request, jsonify
-from app.services.inference_service import get_inference_service, get_available_models, get_model_status  # type: ignore
+import json
+import os
+import time
+from flask import Blueprint, request, jsonify, Response
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.formparser import parse_form_data
+from app.services.inference_service import get_inference_service, get_available_models, get_model_status, get_readiness, get_registry_status, BATCH_MAX_SIZE  # type: ignore
+from app.services.admission import AdmissionRejected, get_admission  # type: ignore
 from app.services.nutrition_service import get_nutrition_service  # type: ignore
+from app.services import metrics  # type: ignore
+from app.services.prediction_token import issue_prediction_token  # type: ignore
+from .utils import busy, client_key, deadline_ms
 
 bp = Blueprint('predict', __name__, url_prefix='/api')
 
+# Limits for /api/predict/batch, enforced by the multipart parser while the body is read
+PREDICT_BATCH_MAX_FILES = int(os.getenv('PREDICT_BATCH_MAX_FILES', '32'))
+PREDICT_BATCH_MAX_BYTES = int(os.getenv('PREDICT_BATCH_MAX_BYTES', str(64 * 1024 * 1024)))
+
+_EMPTY_NUTRITION = {
+    "calories": 0,
+    "protein": 0,
+    "fat": 0,
+    "carbs": 0,
+    "fiber": 0
+}
+
+
+def _attach_nutrition(nutri, out: dict, class_name: str) -> None:
+    nres = nutri.get_nutrition(class_name or '')
+    out['nutrition'] = nres.get('nutrition') if nres.get('success') else dict(_EMPTY_NUTRITION)
+    # How the class was matched to a nutrition row: 'exact' | 'alias' | 'fuzzy' (approximate,
+    # see dish_name); None when nothing matched and the zeros above are placeholders
+    out['nutrition_match'] = {"dish_name": nres.get("dish_name"), "match": nres.get("match"),
+                              "score": nres.get("match_score")} if nres.get('success') else None
+
+
 @bp.get('/predict/models')
 def list_models():
     """List all available models"""
@@ -20,25 +51,33 @@ def list_models():
 @bp.get('/predict/status')
 def model_status():
     try:
-        return jsonify({"success": True, "models": get_model_status()})
+        return jsonify({
+            "success": True,
+            "models": get_model_status(),
+            "registry": get_registry_status(),
+            "admission": get_admission().stats(),
+        })
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 @bp.get('/predict/health')
 def predict_health():
-    """Quick check to ensure default model can be loaded"""
+    """Report default model state without loading it (see /ready for readiness)"""
     try:
         # Check default model (now vn30 prioritized)
-        infer = get_inference_service('vn30')
-        ok = infer is not None and getattr(infer, 'model', None) is not None
+        key = 'vn30'
+        status = get_model_status().get(key, {})
+        readiness = get_readiness()
         
         return jsonify({
             "success": True,
-            "model_loaded": bool(ok),
-            "model_key": infer.model_key,
-            "model_name": infer.config['name'],
-            "model_type": infer.model_type,
-            "available_models": list(get_available_models().keys())
+            "model_loaded": bool(status.get('loaded')),
+            "model_key": key,
+            "model_name": get_available_models()[key]['name'],
+            "model_type": status.get('backend'),
+            "available_models": list(get_available_models().keys()),
+            "ready": readiness['ready'],
+            "preload": readiness['models'],
         })
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -52,7 +91,7 @@ def predict():
         
         content = request.files['file'].read()
         
-        # Get model selection from request (default to resnet_food101)
+        # Get model selection from request (default to resnet_food101; 'auto' runs the cascade)
         model_key = request.form.get('model', 'resnet_food101')
         
         # Validate model key
@@ -66,6 +105,9 @@ def predict():
         # Load inference service for selected model
         try:
             infer = get_inference_service(model_key)
+        except MemoryError as e:
+            # Pinned models fill MODEL_MEMORY_BUDGET_MB; transient from the client's view
+            return jsonify({"success": False, "error": str(e)}), 503
         except Exception as e:
             print(f"[predict] model load failed key={model_key} err={e}")
             return jsonify({
@@ -82,8 +124,12 @@ def predict():
                 "error": f"Failed to load nutrition service: {str(e)}"
             }), 500
 
-        # Make prediction
-        pred = infer.predict(content)
+        # Make prediction (waits for an inference slot, or fails fast when saturated)
+        try:
+            with get_admission().slot(client_key(), deadline_ms()), metrics.stage('inference'):
+                pred = infer.predict(content)
+        except AdmissionRejected as e:
+            return busy(e.retry_after, e.reason)
         
         if not pred.get('success'):
             return jsonify({
@@ -92,16 +138,10 @@ def predict():
             }), 500
         
         # Get nutrition info
-        nres = nutri.get_nutrition(pred.get('class_name', ''))
-        nutrition = nres.get('nutrition') if nres.get('success') else {
-            "calories": 0,
-            "protein": 0,
-            "fat": 0,
-            "carbs": 0,
-            "fiber": 0
-        }
-        
-        pred['nutrition'] = nutrition
+        with metrics.stage('nutrition_lookup'):
+            _attach_nutrition(nutri, pred, pred.get('class_name', ''))
+        # Lets /api/meals/log save this result without running the model again
+        pred['prediction_token'] = issue_prediction_token(pred, content, model_key)
         
         return jsonify(pred)
     
@@ -110,4 +150,91 @@ def predict():
         return jsonify({
             "success": False, 
             "error": f"Unexpected server error: {str(e)}"
-        }), 500
\ No newline at end of file
+        }), 500
+
+@bp.post('/predict/batch')
+def predict_batch():
+    """Predict many images from one multipart request (repeated `file` fields).
+
+    Streams NDJSON: one line per image as soon as its tensor batch finishes
+    ({"index", "filename", ...prediction, "nutrition", "nutrition_match", "prediction_token"}),
+    then a final {"done": true, ...} summary line. Count and total size limits
+    are enforced while the body is parsed (413 before any inference runs).
+    """
+    model_key = request.args.get('model')
+    try:
+        # Parse directly from the WSGI stream so the byte cap applies as the upload is read
+        _, form, files = parse_form_data(
+            request.environ,
+            max_content_length=PREDICT_BATCH_MAX_BYTES,
+            max_form_parts=PREDICT_BATCH_MAX_FILES + 8,
+            silent=False,
+        )
+    except RequestEntityTooLarge:
+        return jsonify({
+            "success": False,
+            "error": f"Batch too large: at most {PREDICT_BATCH_MAX_FILES} files and {PREDICT_BATCH_MAX_BYTES} bytes"
+        }), 413
+    except Exception as e:
+        return jsonify({"success": False, "error": f"Invalid multipart body: {e}"}), 400
+
+    uploads = files.getlist('file')
+    if not uploads:
+        return jsonify({"success": False, "error": "No file provided"}), 400
+    if len(uploads) > PREDICT_BATCH_MAX_FILES:
+        return jsonify({"success": False, "error": f"Too many files: at most {PREDICT_BATCH_MAX_FILES}"}), 413
+
+    model_key = model_key or form.get('model', 'resnet_food101')
+    available_models = get_available_models()
+    if model_key not in available_models:
+        return jsonify({
+            "success": False,
+            "error": f"Invalid model: {model_key}. Available models: {list(available_models.keys())}"
+        }), 400
+    try:
+        infer = get_inference_service(model_key)
+        nutri = get_nutrition_service()
+    except MemoryError as e:
+        return jsonify({"success": False, "error": str(e)}), 503
+    except Exception as e:
+        return jsonify({"success": False, "error": f"Failed to load model '{model_key}': {str(e)}"}), 500
+    admission = get_admission()
+    retry_after = admission.would_reject()
+    if retry_after is not None:
+        return busy(retry_after, "Inference queue full")
+    client, deadline = client_key(), deadline_ms()
+
+    step = max(1, BATCH_MAX_SIZE)
+
+    def generate():
+        start = time.perf_counter()
+        ok = 0
+        try:
+            for offset in range(0, len(uploads), step):
+                chunk = uploads[offset:offset + step]
+                contents = [f.read() for f in chunk]
+                # One slot per tensor batch, so a large upload queues behind single-image requests
+                try:
+                    with admission.slot(client, deadline):
+                        preds = infer.predict_many(contents)
+                except AdmissionRejected as e:
+                    preds = [{"success": False, "error": e.reason, "retry_after": e.retry_after}] * len(chunk)
+                for i, (f, content, pred) in enumerate(zip(chunk, contents, preds)):
+                    line = {"index": offset + i, "filename": f.filename, **pred}
+                    if pred.get('success'):
+                        ok += 1
+                        _attach_nutrition(nutri, line, pred.get('class_name', ''))
+                        line['prediction_token'] = issue_prediction_token(pred, content, model_key)
+                    yield json.dumps(line) + "\n"
+        finally:
+            for f in uploads:
+                f.close()
+        yield json.dumps({
+            "done": True,
+            "count": len(uploads),
+            "succeeded": ok,
+            "model": model_key,
+            "ms": round((time.perf_counter() - start) * 1000, 1),
+        }) + "\n"
+
+    return Response(generate(), mimetype='application/x-ndjson')
@@ -4,12 +4,14 @@ from .utils import require_fields
 from ..middlewares.auth import require_auth
 from ..controllers.user_controller import upsert_profile_controller
 from app.services.supabase_service import get_supabase_service  # type: ignore
+from app.services.response_cache import cached_response, invalidates_user_cache  # type: ignore
 
 bp = Blueprint('user', __name__, url_prefix='/api/user')
 
 
 @bp.post('/profile')
 @require_auth
+@invalidates_user_cache
 def upsert_profile():
     data = request.get_json(force=True)
     require_fields(data, ['age','weight_kg','height_cm','gender'])
@@ -21,6 +23,7 @@ def upsert_profile():
 
 @bp.get('/profile')
 @require_auth
+@cached_response
 def get_profile():
     sb = get_supabase_service()
     prof = sb.get_profile(g.user_id)
@@ -31,6 +34,7 @@ def get_profile():
 
 @bp.delete('/account')
 @require_auth
+@invalidates_user_cache
 def delete_account():
     """Delete the current authenticated user from Supabase Auth.
     Requires server to be configured with service role key.
@@ -46,6 +50,7 @@ def delete_account():
 
 @bp.post('/avatar')
 @require_auth
+@invalidates_user_cache
 def upload_avatar():
     """Upload avatar using service role (bypasses storage RLS) and upsert public.users.url_image.
     Accepts multipart/form-data with field 'file' and optional 'email'.
@@ -1,7 +1,34 @@
 from __future__ import annotations
-from flask import abort
+from flask import abort, jsonify, request
+from ..middlewares.auth import optional_user_id
 
 def require_fields(data, fields):
     missing = [f for f in fields if f not in data]
     if missing:
         abort(400, f"Missing fields: {', '.join(missing)}")
+
+
+def client_key() -> str:
+    """Fair-scheduling identity for admission: the verified user id, else the peer IP.
+    remote_addr is the real client only behind TRUSTED_PROXY_HOPS (ProxyFix in flask_app);
+    client-supplied X-Forwarded-For is never read here."""
+    uid = optional_user_id()
+    if uid:
+        return 'user:' + uid
+    return 'ip:' + (request.remote_addr or 'unknown')
+
+
+def deadline_ms():
+    # Clients may ask for a tighter deadline than INFERENCE_DEADLINE_MS, never a looser one
+    try:
+        return float(request.headers.get('X-Request-Deadline-Ms', '')) or None
+    except ValueError:
+        return None
+
+
+def busy(retry_after: int, error: str):
+    """503 + Retry-After for a request the admission controller turned away."""
+    resp = jsonify({"success": False, "error": error, "retry_after": retry_after})
+    resp.status_code = 503
+    resp.headers['Retry-After'] = str(retry_after)
+    return resp
@@ -0,0 +1,190 @@
+"""
+Admission control for inference: a fixed number of slots, a bounded wait queue
+served round-robin across clients, and a deadline on every wait.
+
+Without it each gunicorn thread blocks in the forward pass and later uploads pile
+up until the proxy times them out. Here a request either gets a slot, waits its
+turn (one client's burst cannot starve the others), or is rejected at once with
+a Retry-After estimate so the client backs off instead of hanging.
+
+Slots default to INFERENCE_BATCH_MAX_SIZE when micro-batching is on, so admission
+never caps the batches the batcher can form (a slot is held while its request waits
+on the shared forward pass, not per forward pass). Defaults leave at least one
+gunicorn thread outside slots + queue, so /health, /ready and the fast 503 path keep
+answering while every slot is busy; WEB_THREADS has to exceed the slot count for that.
+"""
+from __future__ import annotations
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, Optional
+
+from . import metrics
+
+ADMISSION_ENABLED = os.getenv('INFERENCE_ADMISSION', 'true').lower() == 'true'
+# Same variables inference_service reads for the micro-batcher
+_BATCH_SIZE = max(1, int(os.getenv('INFERENCE_BATCH_MAX_SIZE', '8'))) if os.getenv('INFERENCE_BATCHING', 'true').lower() == 'true' else 2
+MAX_CONCURRENCY = max(1, int(os.getenv('INFERENCE_MAX_CONCURRENCY', str(_BATCH_SIZE))))
+_WEB_THREADS = int(os.getenv('WEB_THREADS', '12'))
+QUEUE_MAX = max(0, int(os.getenv('INFERENCE_QUEUE_MAX', str(max(1, _WEB_THREADS - MAX_CONCURRENCY - 1)))))
+DEADLINE_MS = max(1.0, float(os.getenv('INFERENCE_DEADLINE_MS', '8000')))
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: int) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ('event', 'granted')
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.granted = False
+
+
+class AdmissionController:
+    def __init__(self, slots: int, queue_max: int) -> None:
+        self.slots = slots
+        self.queue_max = queue_max
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiting = 0
+        # Per-client FIFOs plus the round-robin order of clients that have someone waiting
+        self._queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        self._turns: Deque[str] = deque()
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_deadline = 0
+        self._waits_ms: Deque[float] = deque(maxlen=512)
+        self._service_ms = 0.0  # EWMA of slot hold time, for Retry-After
+
+    def _retry_after(self, depth: int) -> int:
+        per_slot = (self._service_ms or 1000.0) / 1000.0
+        return max(1, math.ceil(per_slot * (depth + 1) / self.slots))
+
+    def _drop(self, client: str, waiter: _Waiter) -> None:
+        q = self._queues.get(client)
+        if q is not None and waiter in q:
+            q.remove(waiter)
+            self._waiting -= 1
+            if not q:
+                del self._queues[client]
+                self._turns.remove(client)
+
+    def acquire(self, client: str, timeout_s: float) -> float:
+        """Block until a slot is ours; returns the wait in ms or raises AdmissionRejected."""
+        start = time.perf_counter()
+        with self._lock:
+            if self._active < self.slots and not self._waiting:
+                self._active += 1
+                self.admitted += 1
+                self._waits_ms.append(0.0)
+                metrics.inc('admission_total', result='admitted')
+                return 0.0
+            if self._waiting >= self.queue_max:
+                self.rejected_full += 1
+                metrics.inc('admission_total', result='rejected_full')
+                raise AdmissionRejected('Inference queue full', self._retry_after(self._waiting))
+            waiter = _Waiter()
+            if client not in self._queues:
+                self._queues[client] = deque()
+                self._turns.append(client)
+            self._queues[client].append(waiter)
+            self._waiting += 1
+        waiter.event.wait(max(0.0, timeout_s))
+        with self._lock:
+            # Checked under the lock: a grant racing the timeout still counts as admitted
+            if not waiter.granted:
+                self._drop(client, waiter)
+                self.rejected_deadline += 1
+                metrics.inc('admission_total', result='rejected_deadline')
+                raise AdmissionRejected('Inference deadline exceeded while queued', self._retry_after(self._waiting))
+            waited = (time.perf_counter() - start) * 1000
+            self.admitted += 1
+            self._waits_ms.append(waited)
+        metrics.inc('admission_total', result='admitted')
+        metrics.observe('stage_duration_seconds', waited / 1000.0, stage='admission_wait')
+        return waited
+
+    def release(self, held_ms: float) -> None:
+        with self._lock:
+            self._service_ms = held_ms if not self._service_ms else 0.8 * self._service_ms + 0.2 * held_ms
+            if not self._turns:
+                self._active -= 1
+                return
+            # Hand the slot straight to the next client in turn; _active stays the same
+            client = self._turns.popleft()
+            q = self._queues[client]
+            waiter = q.popleft()
+            self._waiting -= 1
+            if q:
+                self._turns.append(client)
+            else:
+                del self._queues[client]
+            waiter.granted = True
+            waiter.event.set()
+
+    @contextmanager
+    def slot(self, client: str, deadline_ms: Optional[float] = None) -> Iterator[float]:
+        if not ADMISSION_ENABLED:
+            yield 0.0
+            return
+        budget = min(DEADLINE_MS, deadline_ms) if deadline_ms else DEADLINE_MS
+        waited = self.acquire(client or 'anonymous', budget / 1000.0)
+        start = time.perf_counter()
+        try:
+            yield waited
+        finally:
+            self.release((time.perf_counter() - start) * 1000)
+
+    def would_reject(self) -> Optional[int]:
+        """Retry-After seconds if a new request would be refused right now, else None."""
+        if not ADMISSION_ENABLED:
+            return None
+        with self._lock:
+            if self._active >= self.slots and self._waiting >= self.queue_max:
+                return self._retry_after(self._waiting)
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._waits_ms)
+            pct = lambda p: round(waits[min(len(waits) - 1, int(p * len(waits)))], 1) if waits else None  # noqa: E731
+            return {
+                'enabled': ADMISSION_ENABLED,
+                'slots': self.slots,
+                'active': self._active,
+                'queue_max': self.queue_max,
+                'queue_depth': self._waiting,
+                'waiting_clients': len(self._queues),
+                'deadline_ms': DEADLINE_MS,
+                'admitted': self.admitted,
+                'rejected_full': self.rejected_full,
+                'rejected_deadline': self.rejected_deadline,
+                'wait_ms_p50': pct(0.50),
+                'wait_ms_p95': pct(0.95),
+                'wait_ms_max': round(waits[-1], 1) if waits else None,
+                'avg_service_ms': round(self._service_ms, 1),
+            }
+
+
+_singleton: Optional[AdmissionController] = None
+_singleton_lock = threading.Lock()
+
+
+def get_admission() -> AdmissionController:
+    global _singleton
+    if _singleton is None:
+        with _singleton_lock:
+            if _singleton is None:
+                if ADMISSION_ENABLED and _WEB_THREADS <= MAX_CONCURRENCY + QUEUE_MAX:
+                    print(f"[admission] WEB_THREADS={_WEB_THREADS} leaves no thread outside {MAX_CONCURRENCY} slots"
+                          f" + {QUEUE_MAX} queued; raise WEB_THREADS or lower INFERENCE_MAX_CONCURRENCY")
+                _singleton = AdmissionController(MAX_CONCURRENCY, QUEUE_MAX)
+    return _singleton
@@ -0,0 +1,179 @@
+"""
+Supabase access-token verification for require_auth without a network round trip.
+
+Tokens are checked locally: HS256 against the project's JWT secret
+(SUPABASE_JWT_SECRET), or asymmetric keys from the project's JWKS endpoint (fetched
+once and cached; needs `cryptography`). Only when no key is available does it
+fall back to `auth.get_user` (AUTH_VERIFY=remote forces that). Validated tokens are
+kept in a bounded TTL cache, never past their own `exp`. Like any local JWT check,
+a token revoked by sign-out stays valid until it expires, so AUTH_TOKEN_CACHE_TTL
+and the project's JWT expiry bound that window.
+
+The `users` bookkeeping upsert is throttled here too: per worker, at most once per
+USER_UPSERT_INTERVAL per user, and only when email/name/avatar differ from the
+last write.
+"""
+from __future__ import annotations
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import jwt
+
+from . import metrics
+
+SUPABASE_URL = os.getenv("SUPABASE_URL", "")
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET", "")
+SUPABASE_JWKS_URL = os.getenv("SUPABASE_JWKS_URL") or (
+    f"{SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json" if SUPABASE_URL else "")
+SUPABASE_JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+AUTH_VERIFY = os.getenv("AUTH_VERIFY", "auto").lower()  # auto | local | remote
+AUTH_TOKEN_CACHE_TTL = float(os.getenv("AUTH_TOKEN_CACHE_TTL", "300"))
+AUTH_TOKEN_CACHE_MAX = int(os.getenv("AUTH_TOKEN_CACHE_MAX", "10000"))
+JWKS_CACHE_TTL = int(os.getenv("JWKS_CACHE_TTL", "600"))
+USER_UPSERT_INTERVAL = float(os.getenv("USER_UPSERT_INTERVAL", "3600"))
+JWT_LEEWAY_S = 30
+
+_ASYMMETRIC = ("RS256", "ES256", "EdDSA")
+_API_KEY_ROLES = ("anon", "service_role")
+
+
+class _NoKey(Exception):
+    """No local key can check this token; the caller may ask Supabase instead."""
+
+
+class _TokenCache:
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[0] < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return item[1]
+
+    def put(self, key: str, user: Dict[str, Any], expires_at: float) -> None:
+        with self._lock:
+            self._data[key] = (expires_at, user)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+
+_cache = _TokenCache(AUTH_TOKEN_CACHE_MAX)
+_jwks_client = None
+_jwks_lock = threading.Lock()
+
+
+def _jwks():
+    global _jwks_client
+    if not SUPABASE_JWKS_URL:
+        raise _NoKey("no JWKS URL")
+    if _jwks_client is None:
+        with _jwks_lock:
+            if _jwks_client is None:
+                _jwks_client = jwt.PyJWKClient(SUPABASE_JWKS_URL, cache_keys=True, lifespan=JWKS_CACHE_TTL, timeout=5)
+    return _jwks_client
+
+
+def user_from_claims(claims: Dict[str, Any]) -> Dict[str, Any]:
+    # Same shape require_auth reads from supabase-py's User
+    return {
+        "id": claims.get("sub"),
+        "email": claims.get("email"),
+        "user_metadata": claims.get("user_metadata") or {},
+        "role": claims.get("role"),
+    }
+
+
+def verify_local(token: str) -> Dict[str, Any]:
+    """Claims of a valid token; raises _NoKey when no key is configured for its alg,
+    jwt.InvalidTokenError when the token is bad."""
+    alg = jwt.get_unverified_header(token).get("alg")
+    if alg == "HS256":
+        if not SUPABASE_JWT_SECRET:
+            raise _NoKey("SUPABASE_JWT_SECRET not set")
+        key: Any = SUPABASE_JWT_SECRET
+    elif alg in _ASYMMETRIC:
+        try:
+            key = _jwks().get_signing_key_from_jwt(token).key
+        except (jwt.PyJWKClientError, jwt.exceptions.PyJWKError) as e:
+            # Unreachable endpoint, unknown kid, or `cryptography` missing
+            raise _NoKey(str(e)) from e
+    else:
+        raise jwt.InvalidAlgorithmError(f"unsupported alg {alg!r}")
+    claims = jwt.decode(
+        token, key, algorithms=[alg], audience=SUPABASE_JWT_AUDIENCE or None,
+        options={"require": ["exp", "sub"], "verify_aud": bool(SUPABASE_JWT_AUDIENCE)},
+        leeway=JWT_LEEWAY_S,
+    )
+    # The project's anon / service_role API keys are signed with the same secret
+    if claims.get("role") in _API_KEY_ROLES:
+        raise jwt.InvalidTokenError(f"{claims.get('role')} key is not a user token")
+    return claims
+
+
+def verify_token(token: str, remote: Callable[[str], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    """User dict for a valid token (cached), None if invalid. `remote` asks Supabase
+    for the user and is only used when the token cannot be checked locally."""
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    user = _cache.get(key)
+    if user is not None:
+        metrics.inc("auth_tokens_total", result="cache_hit")
+        return user
+    claims: Optional[Dict[str, Any]] = None
+    if AUTH_VERIFY != "remote":
+        try:
+            claims = verify_local(token)
+            user = user_from_claims(claims)
+            metrics.inc("auth_tokens_total", result="local")
+        except _NoKey as e:
+            if AUTH_VERIFY == "local":
+                print(f"[auth] cannot verify token locally: {e}")
+                metrics.inc("auth_tokens_total", result="invalid")
+                return None
+        except jwt.InvalidTokenError:
+            metrics.inc("auth_tokens_total", result="invalid")
+            return None
+    if user is None:
+        user = remote(token)
+        if not user:
+            metrics.inc("auth_tokens_total", result="invalid")
+            return None
+        metrics.inc("auth_tokens_total", result="remote")
+        try:
+            claims = jwt.decode(token, options={"verify_signature": False})
+        except jwt.InvalidTokenError:
+            claims = {}
+    exp = float((claims or {}).get("exp") or 0) or time.time() + AUTH_TOKEN_CACHE_TTL
+    _cache.put(key, user, min(time.time() + AUTH_TOKEN_CACHE_TTL, exp))
+    return user
+
+
+_upserts: "OrderedDict[str, Tuple[float, Tuple]]" = OrderedDict()
+_upserts_lock = threading.Lock()
+
+
+def should_upsert_user(user_id: str, fields: Tuple) -> bool:
+    """True when this user's bookkeeping row needs writing: the fields differ from what
+    this worker last wrote and USER_UPSERT_INTERVAL has passed since then."""
+    now = time.time()
+    with _upserts_lock:
+        last = _upserts.get(user_id)
+        if last is not None and (last[1] == fields or now - last[0] < USER_UPSERT_INTERVAL):
+            return False
+        _upserts[user_id] = (now, fields)
+        _upserts.move_to_end(user_id)
+        while len(_upserts) > AUTH_TOKEN_CACHE_MAX:
+            _upserts.popitem(last=False)
+        return True
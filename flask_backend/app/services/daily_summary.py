@@ -0,0 +1,179 @@
+"""
+daily_summaries kept current on the write path instead of recomputed on read.
+
+log_meal_controller and DELETE /api/meals/log/<id> add or subtract the log's macros
+on its (user_id, day) row through the apply_daily_summary_delta SQL function (one
+atomic upsert, so concurrent logs can't lose updates), then re-evaluate `complete`
+against the profile targets. A day with no row yet (logs written before this
+existed) is first seeded from its food_logs. GET /api/meals/today reads that row
+by key.
+
+Days are the server's local calendar days, as in get_food_logs_by_day. A failed
+summary update never fails the meal write; repair_daily_summaries() recomputes rows
+from food_logs to fix drift (failed updates, edits made directly in the database,
+a seed racing a concurrent first log of the day). Run it via
+scripts/repair_daily_summaries.py.
+"""
+from __future__ import annotations
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from . import metrics
+from .nutrition_goal_service import evaluate_day
+
+MACROS = ("calories", "protein", "fat", "carbs", "fiber")
+_PAGE = 1000  # PostgREST's default max rows per response
+_EPS = 1e-6
+
+
+def zero_totals() -> Dict[str, float]:
+    return {k: 0.0 for k in MACROS}
+
+
+def sum_totals(rows: Iterable[Dict[str, Any]]) -> Dict[str, float]:
+    totals = zero_totals()
+    for r in rows:
+        for k in totals:
+            totals[k] += float(r.get(k, 0) or 0)
+    return totals
+
+
+def local_day(ts: Any) -> date:
+    """Server-local calendar day of a food_logs.created_at value (today if missing)."""
+    if not ts:
+        return date.today()
+    try:
+        dt = datetime.fromisoformat(str(ts))
+    except ValueError:
+        return date.today()
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone().date()
+
+
+def _is_complete(totals: Dict[str, float], targets: Dict[str, Any]) -> bool:
+    return bool(evaluate_day(totals, targets).get("complete")) if targets else False
+
+
+def _seed_missing_day(sb, user_id: str, d: date, rows: List[Dict[str, Any]], sign: float) -> None:
+    """Create a missing summary row from the day's food_logs as they were before `rows`
+    were inserted (sign=1) or deleted (sign=-1), so the delta applied next lands on
+    top of logs written before the row existed."""
+    if sb.get_daily_summary(user_id, d) is not None:
+        return
+    ids = {str(r.get("id")) for r in rows if r.get("id") is not None}
+    before = [r for r in sb.get_food_logs_by_day(user_id, d) if str(r.get("id")) not in ids]
+    if sign < 0:
+        before += rows
+    if before:
+        sb.seed_daily_summary(user_id, d, sum_totals(before))
+
+
+def apply_logs(sb, user_id: str, rows: List[Dict[str, Any]], sign: float = 1.0) -> None:
+    """Add (sign=1) or subtract (sign=-1) logs from their days' summaries. Best effort.
+    Call after the food_logs insert/delete; a day without a row is seeded first."""
+    by_day: Dict[date, Tuple[Dict[str, float], List[Dict[str, Any]]]] = {}
+    for r in rows:
+        delta, day_rows = by_day.setdefault(local_day(r.get("created_at")), (zero_totals(), []))
+        day_rows.append(r)
+        for k in MACROS:
+            delta[k] += sign * float(r.get(k, 0) or 0)
+    targets: Optional[Dict[str, Any]] = None
+    for d, (delta, day_rows) in by_day.items():
+        try:
+            with metrics.stage('daily_summary'):
+                _seed_missing_day(sb, user_id, d, day_rows, sign)
+                row = sb.apply_daily_summary_delta(user_id, d, delta)
+                if row is None:
+                    continue
+                if targets is None:
+                    targets = (sb.get_profile(user_id) or {}).get("targets") or {}
+                complete = _is_complete(row.get("totals") or {}, targets)
+                if bool(row.get("complete")) != complete:
+                    sb.set_daily_summary_complete(user_id, d, complete)
+            metrics.inc('daily_summary_updates_total', result='ok')
+        except Exception as e:
+            metrics.inc('daily_summary_updates_total', result='error')
+            print(f"[summary] update failed for {user_id} {d}: {e}; repair_daily_summaries will fix it")
+
+
+def today_totals(sb, user_id: str, logs: Optional[List[Dict[str, Any]]], targets: Dict[str, Any]) -> Tuple[Dict[str, float], Dict[str, Any]]:
+    """(totals, evaluation) for today from the summary row. Today's logs are only summed
+    when the row doesn't exist yet, which also seeds it; pass logs=None to have them
+    read only in that case. Writes only if `complete` flipped (e.g. the profile
+    targets changed since the last log)."""
+    today = date.today()
+    try:
+        row = sb.get_daily_summary(user_id, today)
+    except Exception:
+        row = None
+    if row is None:
+        if logs is None:
+            logs = sb.get_food_logs_by_day(user_id, today)
+        totals = sum_totals(logs)
+        evaluation = evaluate_day(totals, targets) if targets else {"complete": False, "missing": {}, "breakdown": {}}
+        if logs:
+            sb.upsert_daily_summary({"user_id": user_id, "day": today.isoformat(), "totals": totals,
+                                     "complete": evaluation.get("complete", False)})
+        return totals, evaluation
+    stored = row.get("totals") or {}
+    totals = {k: float(stored.get(k, 0) or 0) for k in MACROS}
+    evaluation = evaluate_day(totals, targets) if targets else {"complete": False, "missing": {}, "breakdown": {}}
+    if bool(row.get("complete")) != bool(evaluation.get("complete", False)):
+        sb.set_daily_summary_complete(user_id, today, bool(evaluation.get("complete", False)))
+    return totals, evaluation
+
+
+def _paged(query_fn) -> List[Dict[str, Any]]:
+    out: List[Dict[str, Any]] = []
+    offset = 0
+    while True:
+        page = query_fn().range(offset, offset + _PAGE - 1).execute().data or []
+        out.extend(page)
+        if len(page) < _PAGE:
+            return out
+        offset += _PAGE
+
+
+def repair_daily_summaries(sb, start: date, end: date, user_id: Optional[str] = None, dry_run: bool = False) -> Dict[str, Any]:
+    """Recompute daily_summaries for days start..end (inclusive) from food_logs and
+    rewrite rows whose totals or `complete` flag drifted. Returns counts and the fixed keys."""
+    local_tz = datetime.now().astimezone().tzinfo
+    start_utc = datetime.combine(start, datetime.min.time(), tzinfo=local_tz).astimezone(timezone.utc).isoformat()
+    end_utc = datetime.combine(end + timedelta(days=1), datetime.min.time(), tzinfo=local_tz).astimezone(timezone.utc).isoformat()
+
+    def logs_query():
+        q = (sb.client.table('food_logs').select('id, user_id, created_at, ' + ', '.join(MACROS))
+             .gte('created_at', start_utc).lt('created_at', end_utc))
+        return (q.eq('user_id', user_id) if user_id else q).order('id')
+
+    def summaries_query():
+        q = sb.client.table('daily_summaries').select('*').gte('day', start.isoformat()).lte('day', end.isoformat())
+        return (q.eq('user_id', user_id) if user_id else q).order('user_id').order('day')
+
+    expected: Dict[Tuple[str, str], Dict[str, float]] = {}
+    for r in _paged(logs_query):
+        key = (r['user_id'], local_day(r.get('created_at')).isoformat())
+        totals = expected.setdefault(key, zero_totals())
+        for k in MACROS:
+            totals[k] += float(r.get(k, 0) or 0)
+    stored = {(r['user_id'], str(r['day'])): r for r in _paged(summaries_query)}
+
+    targets: Dict[str, Dict[str, Any]] = {}
+    fixed: List[str] = []
+    for key in sorted(set(expected) | set(stored)):
+        uid, day = key
+        totals = expected.get(key, zero_totals())
+        if uid not in targets:
+            targets[uid] = (sb.get_profile(uid) or {}).get("targets") or {}
+        complete = _is_complete(totals, targets[uid])
+        row = stored.get(key)
+        if row is not None:
+            have = row.get("totals") or {}
+            if bool(row.get("complete")) == complete and all(
+                    abs(float(have.get(k, 0) or 0) - totals[k]) <= _EPS * max(1.0, abs(totals[k])) for k in MACROS):
+                continue
+        fixed.append(f"{uid}/{day}")
+        if not dry_run:
+            sb.upsert_daily_summary({"user_id": uid, "day": day, "totals": totals, "complete": complete})
+    return {"checked": len(set(expected) | set(stored)), "fixed": len(fixed), "rows": fixed, "dry_run": dry_run}
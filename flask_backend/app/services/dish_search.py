@@ -0,0 +1,92 @@
+"""
+Prefix search over dish names for /api/nutrition/search (autocomplete, correcting a
+wrong prediction, logging a dish by name).
+
+Entries are the nutrition table's dish_name values plus the class names of every
+loaded model's class_map (merged when they are the same name). Each entry is indexed
+under folded keys (see nutrition_index.fold/normalize, so 'Phở bò', 'pho bo' and
+'pho_bo' meet): the whole name, its separator-free compact form, and every word
+suffix ('bo' finds 'pho_bo'). The keys sit in one sorted list, so a query is
+two bisects plus a scan of the matching range.
+
+Ranking, deterministic: exact name, then whole-name prefix, then word prefix;
+within a rank, shorter names first, then alphabetical.
+"""
+from __future__ import annotations
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .nutrition_index import compact, normalize
+
+_EXACT, _PREFIX, _WORD = 0, 1, 2
+
+
+class DishSearch:
+    def __init__(self, names: Dict[str, List[str]],
+                 resolve: Callable[[str], Optional[Dict[str, Any]]]) -> None:
+        """`names` maps each name to its sources ('nutrition' or a model key);
+        `resolve` gives its get_nutrition result (or None)."""
+        self.entries: List[Dict[str, Any]] = []
+        keys: List[Tuple[str, int, int]] = []
+        for name in sorted(names):
+            key = normalize(name)
+            if not key:
+                continue
+            i = len(self.entries)
+            result = resolve(name)
+            self.entries.append({
+                "name": name,
+                "food_name": name.replace('_', ' ').title(),
+                "sources": sorted(set(names[name])),
+                "dish_name": result["dish_name"] if result else None,
+                "match": result.get("match") if result else None,
+                "nutrition": dict(result["nutrition"]) if result else None,
+                "serving": result.get("serving") if result else None,
+                "_key": key,
+            })
+            keys.append((key, _PREFIX, i))
+            if compact(name) != key:
+                keys.append((compact(name), _PREFIX, i))
+            words = key.split('_')
+            for w in range(1, len(words)):
+                keys.append(('_'.join(words[w:]), _WORD, i))
+        keys.sort()
+        self._keys = [k for k, _, _ in keys]
+        self._refs = [(rank, i) for _, rank, i in keys]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        q = normalize(query)
+        if not q or limit <= 0:
+            return []
+        best: Dict[int, int] = {}
+        for probe in {q, compact(query)} - {''}:
+            lo = bisect_left(self._keys, probe)
+            # Every key starting with `probe` sorts before probe + a char above any in keys
+            hi = bisect_right(self._keys, probe + '\x7f', lo)
+            for rank, i in self._refs[lo:hi]:
+                if rank == _PREFIX and self.entries[i]["_key"] == q:
+                    rank = _EXACT
+                if rank < best.get(i, 3):
+                    best[i] = rank
+        order = sorted(best, key=lambda i: (best[i], len(self.entries[i]["_key"]), self.entries[i]["_key"]))
+        out = []
+        for i in order[:limit]:
+            e = self.entries[i]
+            out.append({**{k: v for k, v in e.items() if k != "_key"},
+                        "nutrition": dict(e["nutrition"]) if e["nutrition"] else None,
+                        "rank": ("exact", "prefix", "word")[best[i]]})
+        return out
+
+
+def collect_names(dish_names: Iterable[str], class_maps: Dict[str, Dict[int, str]]) -> Dict[str, List[str]]:
+    """{name: sources} over the table's dishes and each model's class names."""
+    names: Dict[str, List[str]] = {}
+    for d in dish_names:
+        names.setdefault(d, []).append('nutrition')
+    for model_key, class_map in class_maps.items():
+        for c in class_map.values():
+            names.setdefault((c or '').strip().lower(), []).append(model_key)
+    return names
@@ -1,26 +1,52 @@
 from __future__ import annotations
-import io
+import contextlib
 import os
+import queue
+import threading
 import time
+from concurrent.futures import Future
 from dataclasses import dataclass
 from typing import Dict, Any, Optional, Tuple
 
 import numpy as np
-from PIL import Image
-
-# Import PyTorch
-try:
-    import torch
-    import torch.nn as nn
-    import torchvision
-    import torchvision.transforms as transforms
-    from torchvision.transforms import InterpolationMode
-    _HAS_TORCH = True
-except Exception as _e:
-    torch = None
-    _HAS_TORCH = False
-    print(f"[inference] PyTorch import failed: {_e}")
-    raise RuntimeError("PyTorch is required but not installed")
+
+from . import metrics
+from .model_registry import MODEL_MEMORY_BUDGET_MB, MODEL_PINNED, ModelRegistry, rss_bytes
+from .prediction_cache import get_prediction_cache, PREDICTION_CACHE_ENABLED
+from .prediction_token import image_digest
+from .preprocessing import get_preprocessor
+from . import onnx_backend
+from . import safetensors_weights
+
+# PyTorch and the helpers built on it are imported on the first PyTorch model load
+# (_import_torch), so workers serving only ONNX models never import torch.
+torch: Any = None
+nn: Any = None
+torchvision: Any = None
+_torch_lock = threading.Lock()
+# Same variables model_compile / quantization read; needed for status before torch is imported
+COMPILE_MODE = os.getenv('INFERENCE_COMPILE_MODE', 'eager').lower()
+STATIC_QUANTIZE = os.getenv('STATIC_QUANTIZE', 'false').lower() == 'true'
+
+
+def _import_torch() -> None:
+    global torch, nn, torchvision, compile_model, load_torchscript_artifact, uses_channels_last, warmup, load_int8_artifact
+    if torch is not None:
+        return
+    with _torch_lock:
+        if torch is not None:
+            return
+        try:
+            import torch as _torch
+            import torch.nn as _nn
+            import torchvision as _torchvision
+        except Exception as e:
+            raise RuntimeError(f"PyTorch not installed but required for this model: {e}") from e
+        from .model_compile import compile_model, load_torchscript_artifact, uses_channels_last, warmup
+        from .quantization import load_int8_artifact
+        nn, torchvision = _nn, _torchvision
+        torch = _torch  # last: other threads treat a set `torch` as fully imported
+
 
 # Default locations for models
 THIS_DIR = os.path.dirname(__file__)
@@ -45,9 +71,46 @@ MODEL_CONFIGS = {
         'file': 'best_food101_model.pth',
         'architecture': 'resnet50',
         'input_size': 224,
+        # Eligible for STATIC_QUANTIZE (conv-heavy; see quantization.py)
+        'static_quantize': True,
+        # Food-101 classes that overlap Vietnamese dishes; the cascade hands these to VN30
+        'escalate_classes': ['pho', 'spring_rolls', 'fried_rice', 'ramen', 'pad_thai', 'dumplings', 'hot_and_sour_soup'],
     }
 }
 
+# model=auto: run the cheaper model first, escalate only when it is unsure or off-domain
+CASCADE_KEY = 'auto'
+CASCADE_ORDER = [k.strip() for k in os.getenv('CASCADE_ORDER', 'resnet_food101,vn30').split(',') if k.strip() in MODEL_CONFIGS]
+CASCADE_CONFIDENCE = float(os.getenv('CASCADE_CONFIDENCE', '0.6'))
+
+# Micro-batching: concurrent requests for the same model are stacked into one forward pass.
+# BATCH_WAIT_MS bounds the extra latency a lone request pays waiting for companions.
+BATCHING_ENABLED = os.getenv('INFERENCE_BATCHING', 'true').lower() == 'true'
+BATCH_MAX_SIZE = max(1, int(os.getenv('INFERENCE_BATCH_MAX_SIZE', '8')))
+BATCH_WAIT_MS = max(0.0, float(os.getenv('INFERENCE_BATCH_WAIT_MS', '5')))
+TOP_K = 5
+WARMUP_RUNS = max(0, int(os.getenv('INFERENCE_WARMUP_RUNS', '2')))
+
+BACKENDS = ('pytorch', 'onnx')
+
+
+def _backend_for(model_key: str) -> str:
+    """Backend for a model: INFERENCE_BACKEND_<KEY>, else INFERENCE_BACKEND, else config 'type'."""
+    cfg = MODEL_CONFIGS[model_key]
+    backend = os.getenv(f"INFERENCE_BACKEND_{model_key.upper()}") or os.getenv('INFERENCE_BACKEND') or cfg['type']
+    backend = backend.lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}' for {model_key}. Available: {list(BACKENDS)}")
+    return backend
+
+
+def _resolve_model_file(filename: str) -> Optional[str]:
+    for base in CANDIDATE_MODEL_DIRS:
+        candidate = os.path.join(base, filename)
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
 
 @dataclass
 class _ModelState:
@@ -55,48 +118,65 @@ class _ModelState:
     class_map: Optional[Dict[int, str]] = None
     input_size: int = 224
     model_path: Optional[str] = None
+    weights_path: Optional[str] = None
     model_type: Optional[str] = None
     config: Optional[Dict] = None
     device: Optional[Any] = None
+    compile_mode: str = 'eager'
+    channels_last: bool = False
+    load_ms: Optional[float] = None
+    warmup_ms: Optional[float] = None
 
 # Store multiple model states
 _model_cache: Dict[str, _ModelState] = {}
 
 
-def _load_pytorch_vit(model_path: str, device) -> Tuple[Any, Dict[int, str]]:
-    """Load Vision Transformer (ViT) PyTorch model"""
-    if not _HAS_TORCH:
-        raise RuntimeError("PyTorch not installed")
-    
+def _read_checkpoint(model_path: str, device) -> Dict[str, Any]:
+    """Training checkpoint dict; '.safetensors' files come back mmap-backed ('mmap': True)."""
+    if model_path.endswith(safetensors_weights.SAFETENSORS_SUFFIX):
+        return safetensors_weights.load_checkpoint(model_path)
     # Use weights_only when available to avoid loading optimizer/state
     try:
-        checkpoint = torch.load(model_path, map_location=device, weights_only=True)
+        return torch.load(model_path, map_location=device, weights_only=True)
     except TypeError:
-        checkpoint = torch.load(model_path, map_location=device)
-    num_classes = checkpoint['num_classes']
+        return torch.load(model_path, map_location=device)
+
+
+def _init_device(checkpoint: Dict[str, Any]):
+    # Skip random init when the weights will be adopted as-is (load_state_dict(assign=True))
+    return torch.device('meta') if checkpoint.get('mmap') else contextlib.nullcontext()
+
+
+def _load_pytorch_vit(model_path: str, device) -> Tuple[Any, Dict[int, str]]:
+    """Load Vision Transformer (ViT) PyTorch model"""
+    _import_torch()
     
-    # Initialize ViT architecture
-    model = torchvision.models.vit_b_16(weights=None)
+    checkpoint = _read_checkpoint(model_path, device)
+    num_classes = checkpoint['num_classes']
     
-    # Modify classifier head to match training
-    in_features = model.heads.head.in_features
-    model.heads.head = nn.Sequential(
-        nn.Dropout(0.5),
-        nn.Linear(in_features, 512),
-        nn.ReLU(),
-        nn.Dropout(0.4),
-        nn.Linear(512, num_classes)
-    )
+    with _init_device(checkpoint):
+        # Initialize ViT architecture
+        model = torchvision.models.vit_b_16(weights=None)
+        
+        # Modify classifier head to match training
+        in_features = model.heads.head.in_features
+        model.heads.head = nn.Sequential(
+            nn.Dropout(0.5),
+            nn.Linear(in_features, 512),
+            nn.ReLU(),
+            nn.Dropout(0.4),
+            nn.Linear(512, num_classes)
+        )
     
     # Load weights
-    model.load_state_dict(checkpoint['model_state_dict'])
+    model.load_state_dict(checkpoint['model_state_dict'], assign=bool(checkpoint.get('mmap')))
     class_list = checkpoint['class_list']
     
     model = model.to(device)
     # Optional dynamic quantization to reduce memory (Linear layers)
     if os.getenv('DYNAMIC_QUANTIZE', 'true').lower() == 'true':
         try:
-            model = torch.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+            model = torch.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8, inplace=True)
             print("[inference] Applied dynamic quantization to ViT linear layers")
         except Exception as _qe:
             print(f"[inference] Quantization skipped: {_qe}")
@@ -110,33 +190,30 @@ def _load_pytorch_vit(model_path: str, device) -> Tuple[Any, Dict[int, str]]:
 
 def _load_pytorch_resnet(model_path: str, device) -> Tuple[Any, Dict[int, str]]:
     """Load ResNet-50 PyTorch model"""
-    if not _HAS_TORCH:
-        raise RuntimeError("PyTorch not installed")
-    
-    # Initialize ResNet architecture
-    model = torchvision.models.resnet50(weights=None)
+    _import_torch()
     
     # Load checkpoint
-    try:
-        checkpoint = torch.load(model_path, map_location=device, weights_only=True)
-    except TypeError:
-        checkpoint = torch.load(model_path, map_location=device)
+    checkpoint = _read_checkpoint(model_path, device)
     num_classes = checkpoint['num_classes']
     
-    # Modify classifier head
-    model.fc = nn.Sequential(
-        nn.Dropout(0.3),
-        nn.Linear(model.fc.in_features, num_classes)
-    )
+    with _init_device(checkpoint):
+        # Initialize ResNet architecture
+        model = torchvision.models.resnet50(weights=None)
+        
+        # Modify classifier head
+        model.fc = nn.Sequential(
+            nn.Dropout(0.3),
+            nn.Linear(model.fc.in_features, num_classes)
+        )
     
     # Load weights
-    model.load_state_dict(checkpoint['model_state_dict'])
+    model.load_state_dict(checkpoint['model_state_dict'], assign=bool(checkpoint.get('mmap')))
     class_list = checkpoint['class_list']
     
     model = model.to(device)
     if os.getenv('DYNAMIC_QUANTIZE', 'false').lower() == 'true':
         try:
-            model = torch.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+            model = torch.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8, inplace=True)
             print("[inference] Applied dynamic quantization to ResNet linear layer")
         except Exception as _qe:
             print(f"[inference] ResNet quantization skipped: {_qe}")
@@ -148,6 +225,99 @@ def _load_pytorch_resnet(model_path: str, device) -> Tuple[Any, Dict[int, str]]:
     return model, class_map
 
 
+def _load_pytorch_state(state: _ModelState) -> None:
+    config = state.config
+    # Load PyTorch model
+    _import_torch()
+
+    model_path = _resolve_model_file(config['file'])
+    st_path = safetensors_weights.pick_weights(
+        model_path, _resolve_model_file(safetensors_weights.safetensors_path(config['file'])))
+    if not model_path and not st_path:
+        raise FileNotFoundError(f"Model file not found: {config['file']}")
+    # Artifacts (TorchScript, int8) stay keyed to the .pth; a lone .safetensors stands in for it
+    model_path = model_path or st_path
+    state.model_path = model_path
+    state.weights_path = st_path or model_path
+    
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    state.device = device
+    
+    arch = config['architecture']
+    # Static int8 artifact from scripts/quantize_resnet.py (quantized kernels are CPU-only)
+    int8 = load_int8_artifact(model_path) if STATIC_QUANTIZE and config.get('static_quantize') else None
+    if int8 is not None:
+        state.model, state.class_map = int8
+        state.device = torch.device("cpu")
+        state.compile_mode = 'int8-static'
+        return
+    # A cached frozen TorchScript artifact replaces building the eager model entirely
+    cached = load_torchscript_artifact(model_path, arch, device) if COMPILE_MODE == 'torchscript' else None
+    if cached is not None:
+        state.model, state.class_map = cached
+        state.compile_mode = 'torchscript'
+    else:
+        try:
+            if arch == 'vit_b_16':
+                state.model, state.class_map = _load_pytorch_vit(state.weights_path, device)
+            elif arch == 'resnet50':
+                state.model, state.class_map = _load_pytorch_resnet(state.weights_path, device)
+            else:
+                raise ValueError(f"Unknown architecture: {arch}")
+        except RuntimeError as re:
+            if 'out of memory' in str(re).lower():
+                raise RuntimeError("Model load OOM: consider removing large model or using smaller architecture") from re
+            raise
+        state.model, state.compile_mode = compile_model(
+            state.model, state.class_map, model_path, arch, state.input_size, COMPILE_MODE, device)
+    state.channels_last = uses_channels_last(state.compile_mode, arch)
+
+
+def _warmup_pytorch(state: _ModelState, batch_sizes: Tuple[int, ...]) -> float:
+    try:
+        return warmup(state.model, state.input_size, state.channels_last, batch_sizes, state.device, WARMUP_RUNS)
+    except Exception as e:
+        if state.compile_mode != 'compile':
+            raise
+        # torch.compile fails lazily (e.g. no C++ toolchain); fall back to the eager module
+        print(f"[inference] torch.compile warmup failed, using eager: {e}")
+        state.model = getattr(state.model, '_orig_mod', state.model).to(memory_format=torch.contiguous_format)
+        state.compile_mode, state.channels_last = 'eager', False
+        return warmup(state.model, state.input_size, False, batch_sizes, state.device, WARMUP_RUNS)
+
+
+def _load_onnx_state(state: _ModelState) -> None:
+    filename = onnx_backend.onnx_path(state.config['file'])
+    model_path = _resolve_model_file(filename)
+    if not model_path:
+        raise FileNotFoundError(f"ONNX model not found: {filename} (run scripts/export_onnx.py)")
+    state.model_path = model_path
+    state.model = onnx_backend.OnnxModel(model_path)
+    state.class_map = state.model.class_map
+    state.compile_mode = 'onnxruntime'
+
+
+def _resident_bytes(state: _ModelState, rss_before: Optional[int]) -> int:
+    """Memory a freshly loaded model holds: the larger of the RSS growth over its load
+    (allocator arenas, ORT buffers, frozen TorchScript constants) and its tensor bytes
+    (or file size), since RSS may not grow when freed pages get reused."""
+    tensor_bytes = 0
+    if torch is not None and isinstance(state.model, nn.Module):
+        try:
+            tensors = list(state.model.parameters()) + list(state.model.buffers())
+            tensor_bytes = sum(t.numel() * t.element_size() for t in tensors)
+        except Exception:
+            tensor_bytes = 0
+    if not tensor_bytes:
+        try:
+            tensor_bytes = os.path.getsize(state.model_path)
+        except Exception:
+            tensor_bytes = 0
+    rss_after = rss_bytes()
+    rss_delta = rss_after - rss_before if rss_before is not None and rss_after is not None else 0
+    return max(rss_delta, tensor_bytes)
+
+
 def _ensure_model_loaded(model_key: str) -> _ModelState:
     """Load and cache model if not already loaded"""
     if model_key in _model_cache:
@@ -155,78 +325,228 @@ def _ensure_model_loaded(model_key: str) -> _ModelState:
     
     if model_key not in MODEL_CONFIGS:
         raise ValueError(f"Unknown model: {model_key}. Available: {list(MODEL_CONFIGS.keys())}")
-    
+
+    with _registry.load_guard():
+        state = _model_cache.get(model_key)
+        if state is not None:
+            return state
+        _registry.make_room(model_key, _registry.estimate(model_key, _model_file_size(model_key)))
+        rss_before = rss_bytes()
+        state = _load_model_state(model_key)
+        resident = _resident_bytes(state, rss_before)
+        _model_cache[model_key] = state
+        _registry.record_load(model_key, resident, (state.load_ms or 0.0) + (state.warmup_ms or 0.0))
+        metrics.observe('model_load_seconds', ((state.load_ms or 0.0) + (state.warmup_ms or 0.0)) / 1000.0,
+                        model=model_key, backend=state.model_type, mode=state.compile_mode)
+        print(f"[inference] '{model_key}' resident ~{resident / 2**20:.0f}MB")
+        # The estimate may have been low; settle the budget against the measured size
+        try:
+            _registry.make_room(model_key, 0)
+        except MemoryError as e:
+            print(f"[inference] Over memory budget after loading '{model_key}': {e}")
+        return state
+
+
+def _model_file_size(model_key: str) -> int:
+    cfg = MODEL_CONFIGS[model_key]
+    try:
+        filename = onnx_backend.onnx_path(cfg['file']) if _backend_for(model_key) == 'onnx' else cfg['file']
+        return os.path.getsize(_resolve_model_file(filename) or '')
+    except (OSError, ValueError):
+        return 0
+
+
+def _load_model_state(model_key: str) -> _ModelState:
     config = MODEL_CONFIGS[model_key]
     state = _ModelState(config=config, input_size=config['input_size'])
-    
-    # Resolve model path
-    model_path = None
-    for base in CANDIDATE_MODEL_DIRS:
-        candidate = os.path.join(base, config['file'])
-        if os.path.exists(candidate):
-            model_path = candidate
-            break
-    
-    if not model_path:
-        raise FileNotFoundError(f"Model file not found: {config['file']}")
-    
-    state.model_path = model_path
-    state.model_type = config['type']
-    
-    # Load PyTorch model
-    if not _HAS_TORCH:
-        raise RuntimeError("PyTorch not installed but required for this model")
-    
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    start_load = time.time()
-    state.device = device
-    
+    state.model_type = _backend_for(model_key)
     arch = config['architecture']
-    try:
-        if arch == 'vit_b_16':
-            state.model, state.class_map = _load_pytorch_vit(model_path, device)
-        elif arch == 'resnet50':
-            state.model, state.class_map = _load_pytorch_resnet(model_path, device)
-        else:
-            raise ValueError(f"Unknown architecture: {arch}")
-    except RuntimeError as re:
-        if 'out of memory' in str(re).lower():
-            raise RuntimeError("Model load OOM: consider removing large model or using smaller architecture") from re
-        raise
+
+    start_load = time.time()
+    if state.model_type == 'onnx':
+        _load_onnx_state(state)
+    else:
+        _load_pytorch_state(state)
     load_dur = (time.time() - start_load) * 1000
+    state.load_ms = round(load_dur, 1)
     try:
-        fsz = os.path.getsize(model_path)
+        fsz = os.path.getsize(state.model_path)
     except Exception:
         fsz = -1
-    print(f"[inference] Loaded model '{model_key}' arch={arch} size={fsz} bytes in {load_dur:.1f}ms device={device}")
-    
-    # Cache the loaded model
-    _model_cache[model_key] = state
+    print(f"[inference] Loaded model '{model_key}' arch={arch} backend={state.model_type} mode={state.compile_mode} size={fsz} bytes in {load_dur:.1f}ms device={state.device or 'cpu'}")
+
+    # Pay JIT profiling / graph compilation now rather than on the first user request
+    batch_sizes = (1, BATCH_MAX_SIZE) if BATCHING_ENABLED and BATCH_MAX_SIZE > 1 else (1,)
+    if state.model_type == 'onnx':
+        warm = onnx_backend.warmup(state.model, state.input_size, batch_sizes, WARMUP_RUNS)
+    else:
+        warm = _warmup_pytorch(state, batch_sizes)
+    state.warmup_ms = round(warm, 1)
+    if state.warmup_ms:
+        print(f"[inference] Warmed up '{model_key}' batch_sizes={batch_sizes} in {state.warmup_ms:.1f}ms")
+    _join_nutrition(model_key, state)
     return state
 
 
+def _join_nutrition(model_key: str, state: _ModelState) -> None:
+    """Resolve the model's classes to nutrition rows now, so lookups after predict are dict hits."""
+    try:
+        from .nutrition_service import get_nutrition_service
+        get_nutrition_service().attach_class_map(model_key, state.class_map or {})
+    except Exception as e:
+        print(f"[inference] nutrition join for '{model_key}' skipped: {e}")
+
+
+def _preprocess(img_bytes: bytes, state: _ModelState):
+    """(1, 3, H, W) input for the model's backend: a torch tensor, or a float32 array for ONNX"""
+    arr = get_preprocessor(state.config['architecture'])(img_bytes)
+    return arr if state.model_type == 'onnx' else torch.from_numpy(arr)
+
+
 def _preprocess_pytorch(img_bytes: bytes, size: int, architecture: str):
-    """Preprocess image for PyTorch models"""
-    if not _HAS_TORCH:
-        raise RuntimeError("PyTorch not installed")
-    
-    # Choose interpolation based on architecture
-    if architecture == 'vit_b_16':
-        interpolation = InterpolationMode.BICUBIC
-    else:
-        interpolation = InterpolationMode.BILINEAR
-    
-    transform = transforms.Compose([
-        transforms.Resize((256, 256), interpolation=interpolation),
-        transforms.CenterCrop(224),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], 
-                           std=[0.229, 0.224, 0.225])
-    ])
-    
-    img = Image.open(io.BytesIO(img_bytes)).convert("RGB")
-    img_tensor = transform(img)
-    return img_tensor.unsqueeze(0)  # Add batch dimension
+    """Preprocess image for PyTorch models (see preprocessing.py); returns a (1, 3, H, W) tensor"""
+    _import_torch()
+    return torch.from_numpy(get_preprocessor(architecture)(img_bytes))
+
+
+def _stack(state: _ModelState, items: list):
+    if state.model_type == 'onnx':
+        return np.concatenate(items, axis=0)
+    return torch.cat(items, dim=0)
+
+
+def _forward_topk(state: _ModelState, batch_tensor, k: int) -> Tuple[list, list]:
+    """Run one forward pass over an (N, C, H, W) batch and return per-row top-k lists."""
+    if state.model_type == 'onnx':
+        return onnx_backend.softmax_topk(state.model(batch_tensor), k)
+    batch_tensor = batch_tensor.to(state.device)
+    if state.channels_last:
+        batch_tensor = batch_tensor.contiguous(memory_format=torch.channels_last)
+    with torch.no_grad():
+        outputs = state.model(batch_tensor)
+        probabilities = torch.nn.functional.softmax(outputs, dim=1)
+        top_probs, top_indices = torch.topk(probabilities, min(k, probabilities.shape[1]))
+    return top_probs.tolist(), top_indices.tolist()
+
+
+class _MicroBatcher:
+    """Collect concurrent requests for one model and run them as a single forward pass.
+
+    Callers preprocess in their own thread, then block on a Future while a daemon
+    worker drains the queue: after the first item arrives it waits up to
+    ``wait_ms`` for more (capped at ``max_size``), stacks them and hands each
+    caller back its own top-k row.
+    """
+
+    def __init__(self, model_key: str, state: _ModelState, max_size: int, wait_ms: float) -> None:
+        self.model_key = model_key
+        self.state = state
+        self.max_size = max_size
+        self.wait_s = wait_ms / 1000.0
+        self._queue: "queue.Queue[Optional[Tuple[Any, Future]]]" = queue.Queue()
+        self._closed = False
+        self._close_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.max_seen = 0
+        self._thread = threading.Thread(target=self._run, name=f"batcher-{model_key}", daemon=True)
+        self._thread.start()
+
+    def submit(self, img_tensor) -> Optional[Future]:
+        """Queue one tensor; returns None once the batcher is closed (caller runs it inline)."""
+        fut: Future = Future()
+        with self._close_lock:
+            if self._closed:
+                return None
+            self._queue.put((img_tensor, fut))
+        return fut
+
+    def close(self) -> None:
+        """Stop the worker after it finishes everything already submitted (model evicted)."""
+        with self._close_lock:
+            self._closed = True
+            self._queue.put(None)
+
+    def _collect(self) -> Tuple[list, bool]:
+        first = self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.wait_s
+        while len(batch) < self.max_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    # Window closed: still take anything already queued, but don't wait
+                    item = self._queue.get_nowait()
+                else:
+                    item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        while True:
+            batch, stop = self._collect()
+            if batch:
+                self._run_batch(batch)
+            if stop:
+                # Items queued before close() are still owed an answer
+                rest = []
+                while True:
+                    try:
+                        rest.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                rest = [item for item in rest if item is not None]
+                for i in range(0, len(rest), self.max_size):
+                    self._run_batch(rest[i:i + self.max_size])
+                self.state = None
+                return
+
+    def _run_batch(self, batch: list) -> None:
+        try:
+            stacked = _stack(self.state, [t for t, _ in batch])
+            top_probs, top_indices = _forward_topk(self.state, stacked, TOP_K)
+            for i, (_, fut) in enumerate(batch):
+                fut.set_result((top_probs[i], top_indices[i]))
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+        self.batches += 1
+        self.items += len(batch)
+        self.max_seen = max(self.max_seen, len(batch))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'max_size': self.max_size,
+            'wait_ms': self.wait_s * 1000.0,
+            'queued': self._queue.qsize(),
+            'batches': self.batches,
+            'items': self.items,
+            'avg_batch': round(self.items / self.batches, 2) if self.batches else 0.0,
+            'max_batch_seen': self.max_seen,
+        }
+
+
+_batchers: Dict[str, _MicroBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def _get_batcher(model_key: str, state: _ModelState) -> _MicroBatcher:
+    # Created lazily so the worker thread starts after gunicorn forks
+    with _batchers_lock:
+        b = _batchers.get(model_key)
+        if b is None or b.state is not state:
+            if b is not None:
+                b.close()
+            b = _MicroBatcher(model_key, state, BATCH_MAX_SIZE, BATCH_WAIT_MS)
+            _batchers[model_key] = b
+        return b
 
 
 class InferenceService:
@@ -240,39 +560,87 @@ class InferenceService:
         self.config = self.state.config
 
     def predict(self, img_bytes: bytes) -> Dict[str, Any]:
+        _registry.touch(self.model_key)
         try:
-            return self._predict_pytorch(img_bytes)
+            if not PREDICTION_CACHE_ENABLED:
+                return self._predict_pytorch(img_bytes)
+            # Same bytes + same model => same answer; skip decode, preprocess and forward
+            cache = get_prediction_cache()
+            key = (self.model_key, image_digest(img_bytes))
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+            result = self._predict_pytorch(img_bytes)
+            cache.put(key, result)
+            return result
         except Exception as e:
             return {"success": False, "error": str(e)}
     
     def _predict_pytorch(self, img_bytes: bytes) -> Dict[str, Any]:
-        """Predict using PyTorch model"""
-        arch = self.config['architecture']
-        img_tensor = _preprocess_pytorch(img_bytes, self.input_size, arch)
-        img_tensor = img_tensor.to(self.state.device)
-        
-        self.model.eval()
-        with torch.no_grad():
-            outputs = self.model(img_tensor)
-            probabilities = torch.nn.functional.softmax(outputs, dim=1)
-            
-            # Get top 5
-            top_probs, top_indices = torch.topk(probabilities, min(5, len(self.class_map)))
-        
+        """Predict with the model's backend (PyTorch or ONNX Runtime)"""
+        img_tensor = _preprocess(img_bytes, self.state)
+        top_probs, top_indices = self._infer_topk(img_tensor)
+        return self._build_result(top_probs, top_indices)
+
+    def predict_many(self, images: list) -> list:
+        """Predict several images with tensor-batched forward passes of up to BATCH_MAX_SIZE.
+
+        Results come back in input order; an image that fails to decode gets an error
+        entry of its own without failing the rest.
+        """
+        _registry.touch(self.model_key)
+        results: list = [None] * len(images)
+        cache = get_prediction_cache() if PREDICTION_CACHE_ENABLED else None
+        pending = []
+        for i, img_bytes in enumerate(images):
+            key = (self.model_key, image_digest(img_bytes))
+            cached = cache.get(key) if cache else None
+            if cached is not None:
+                results[i] = cached
+                continue
+            try:
+                pending.append((i, key, _preprocess(img_bytes, self.state)))
+            except Exception as e:
+                results[i] = {"success": False, "error": f"Invalid image: {e}"}
+        step = max(1, BATCH_MAX_SIZE)
+        for start in range(0, len(pending), step):
+            chunk = pending[start:start + step]
+            try:
+                top_probs, top_indices = _forward_topk(self.state, _stack(self.state, [t for _, _, t in chunk]), TOP_K)
+            except Exception as e:
+                for i, _, _ in chunk:
+                    results[i] = {"success": False, "error": str(e)}
+                continue
+            for (i, key, _), probs, indices in zip(chunk, top_probs, top_indices):
+                results[i] = self._build_result(probs, indices)
+                if cache:
+                    cache.put(key, results[i])
+        return results
+
+    def _infer_topk(self, img_tensor) -> Tuple[list, list]:
+        """Top-k for a single (1, C, H, W) tensor, via the shared batcher when enabled."""
+        # A service whose model was evicted mid-request runs inline instead of reviving a batcher
+        if BATCHING_ENABLED and BATCH_MAX_SIZE > 1 and _model_cache.get(self.model_key) is self.state:
+            fut = _get_batcher(self.model_key, self.state).submit(img_tensor)
+            if fut is not None:
+                return fut.result()
+        top_probs, top_indices = _forward_topk(self.state, img_tensor, TOP_K)
+        return top_probs[0], top_indices[0]
+
+    def _build_result(self, top_probs: list, top_indices: list) -> Dict[str, Any]:
         # Top prediction
-        idx = top_indices[0][0].item()
-        conf = top_probs[0][0].item()
+        idx = int(top_indices[0])
+        conf = float(top_probs[0])
         class_name = self.class_map.get(idx, str(idx))
         food_name = class_name.replace("_", " ").title()
         
         # Top-5
         top5 = []
-        for i in range(len(top_indices[0])):
-            class_idx = top_indices[0][i].item()
-            name = self.class_map.get(class_idx, str(class_idx))
+        for class_idx, prob in zip(top_indices, top_probs):
+            name = self.class_map.get(int(class_idx), str(class_idx))
             top5.append({
                 "class_name": name,
-                "confidence": float(top_probs[0][i].item())
+                "confidence": float(prob)
             })
         
         return {
@@ -286,18 +654,184 @@ class InferenceService:
         }
 
 
-_service_cache: Dict[str, InferenceService] = {}
+class CascadeService:
+    """Confidence-gated cascade over CASCADE_ORDER with the same predict() contract as InferenceService.
+
+    Each stage runs only if the previous one had top-1 confidence below CASCADE_CONFIDENCE
+    or predicted one of its config's 'escalate_classes'. An escalated stage's answer
+    replaces the previous one, except after a low-confidence escalation between models
+    sharing a config 'calibration_group', where confidences are comparable and the more
+    confident stage wins. (Softmax confidences of a 101-class and a 30-class head are not
+    on the same scale, and an off-domain answer should not outvote the specialist.)
+    `cascade.stages` records what ran, why it escalated and how long each stage took;
+    `cascade.selected` names the stage whose answer is returned.
+    Later stages are loaded on first escalation, not up front.
+    """
+
+    def __init__(self) -> None:
+        self.model_key = CASCADE_KEY
+        self.model_type = 'cascade'
+        self.config = {'name': 'Auto (cascade)', 'stages': list(CASCADE_ORDER)}
+        self.model = None
+
+    @staticmethod
+    def _escalation_reason(svc: InferenceService, pred: Dict[str, Any]) -> Optional[str]:
+        if float(pred.get('confidence') or 0.0) < CASCADE_CONFIDENCE:
+            return 'low_confidence'
+        if pred.get('class_name') in (svc.config.get('escalate_classes') or ()):
+            return 'out_of_domain'
+        return None
+
+    @staticmethod
+    def _comparable(a: str, b: str) -> bool:
+        group_a = MODEL_CONFIGS[a].get('calibration_group')
+        return group_a is not None and group_a == MODEL_CONFIGS[b].get('calibration_group')
+
+    def predict(self, img_bytes: bytes) -> Dict[str, Any]:
+        stages = []
+        best: Optional[Dict[str, Any]] = None
+        best_key: Optional[str] = None
+        reason: Optional[str] = None
+        for i, key in enumerate(CASCADE_ORDER):
+            start = time.perf_counter()
+            stage: Dict[str, Any] = {'model': key}
+            try:
+                svc = get_inference_service(key)
+                pred = svc.predict(img_bytes)
+            except Exception as e:
+                pred = {'success': False, 'error': str(e)}
+            stage['ms'] = round((time.perf_counter() - start) * 1000, 2)
+            if not pred.get('success'):
+                # A broken stage should not sink the request if another stage can answer
+                stage['error'] = pred.get('error', 'predict failed')
+                stages.append(stage)
+                continue
+            stage['class_name'] = pred.get('class_name')
+            stage['confidence'] = pred.get('confidence')
+            keep_previous = (best is not None and reason == 'low_confidence' and self._comparable(best_key, key)
+                             and float(best['confidence']) >= float(pred['confidence']))
+            if not keep_previous:
+                best, best_key = pred, key
+            reason = self._escalation_reason(svc, pred) if i < len(CASCADE_ORDER) - 1 else None
+            stage['escalated'] = reason
+            stages.append(stage)
+            if reason is None:
+                break
+        if best is None:
+            return {"success": False, "error": stages[-1].get('error') if stages else "No cascade stages configured", "cascade": {"stages": stages}}
+        out = dict(best)
+        out['model_requested'] = CASCADE_KEY
+        out['cascade'] = {'threshold': CASCADE_CONFIDENCE, 'stages': stages, 'selected': best_key}
+        return out
+
+    def predict_many(self, images: list) -> list:
+        # Escalation is decided per image, so there is no shared batch to form here
+        return [self.predict(b) for b in images]
+
+
+_service_cache: Dict[str, Any] = {}
+# One lock per model key so concurrent first requests (or the preloader) load a model once
+_load_locks: Dict[str, threading.Lock] = {}
+_load_locks_guard = threading.Lock()
+
+
+def _load_lock(model_key: str) -> threading.Lock:
+    with _load_locks_guard:
+        return _load_locks.setdefault(model_key, threading.Lock())
+
+
+def _evict_model(model_key: str) -> None:
+    # Drop every module-level reference; requests already holding the service finish normally
+    metrics.inc('model_evictions_total', model=model_key)
+    _model_cache.pop(model_key, None)
+    _service_cache.pop(model_key, None)
+    with _batchers_lock:
+        b = _batchers.pop(model_key, None)
+    if b is not None:
+        b.close()
+
+
+_registry = ModelRegistry(int(MODEL_MEMORY_BUDGET_MB * 2**20), MODEL_PINNED, _evict_model)
+
 
 def get_inference_service(model_key: str = 'resnet_food101') -> InferenceService:
-    """Get or create inference service for specified model"""
-    if model_key not in _service_cache:
-        _service_cache[model_key] = InferenceService(model_key)
-    return _service_cache[model_key]
+    """Get or create inference service for specified model ('auto' returns the cascade)"""
+    svc = _service_cache.get(model_key)
+    if svc is None:
+        with _load_lock(model_key):
+            svc = _service_cache.get(model_key)
+            if svc is None:
+                svc = CascadeService() if model_key == CASCADE_KEY else InferenceService(model_key)
+                _service_cache[model_key] = svc
+    return svc
+
+
+# Startup preloading: PRELOAD_MODELS=all (default) | none | comma-separated model keys
+PRELOAD_MODELS = os.getenv('PRELOAD_MODELS', 'all')
+_preload_state: Dict[str, str] = {}
+
+
+def preload_targets() -> list:
+    raw = PRELOAD_MODELS.strip().lower()
+    if raw in ('', 'none', 'false', '0'):
+        return []
+    if raw in ('all', 'true', '1'):
+        keys = list(MODEL_CONFIGS.keys())
+    else:
+        keys = [k.strip() for k in raw.split(',') if k.strip() in MODEL_CONFIGS]
+    # Pinned models first so a memory budget never spends itself on an evictable one
+    return sorted(keys, key=lambda k: k not in _registry.pinned)
+
+
+def _preload_one(model_key: str) -> None:
+    start = time.time()
+    if model_key not in _registry.pinned and not _registry.fits(_registry.estimate(model_key, _model_file_size(model_key))):
+        # Preloading would only evict something already warm; load on first request instead
+        _preload_state[model_key] = 'skipped: memory budget'
+        print(f"[inference] Preload of '{model_key}' skipped: does not fit MODEL_MEMORY_BUDGET_MB")
+        return
+    try:
+        get_inference_service(model_key)  # loads + warms up
+        _preload_state[model_key] = 'ready'
+        print(f"[inference] Preloaded '{model_key}' in {(time.time() - start) * 1000:.1f}ms")
+    except Exception as e:
+        _preload_state[model_key] = f"error: {e}"
+        print(f"[inference] Preload of '{model_key}' failed: {e}")
+
+
+def start_preload(keys: Optional[list] = None) -> None:
+    """Load and warm models in background threads; returns immediately.
+
+    Parallel by default; with a memory budget, one thread loads them in order so the
+    pinned models go first and the rest are skipped if they would not fit.
+    """
+    pending = [k for k in (keys if keys is not None else preload_targets()) if k not in _preload_state]
+    for key in pending:
+        _preload_state[key] = 'loading'
+    if _registry.budget_bytes:
+        def run_in_order() -> None:
+            for key in pending:
+                _preload_one(key)
+        if pending:
+            threading.Thread(target=run_in_order, name="preload", daemon=True).start()
+        return
+    for key in pending:
+        threading.Thread(target=_preload_one, args=(key,), name=f"preload-{key}", daemon=True).start()
+
+
+def get_readiness() -> Dict[str, Any]:
+    """Ready once every preload target has settled and at least one model is warm."""
+    models = {}
+    for key in preload_targets():
+        models[key] = 'ready' if key in _service_cache else _preload_state.get(key, 'not_started')
+    settled = all(v == 'ready' or v.startswith(('error', 'skipped')) for v in models.values())
+    ready = settled and (not models or any(v == 'ready' for v in models.values()))
+    return {'ready': ready, 'models': models}
 
 
 def get_available_models() -> Dict[str, Dict[str, str]]:
     """Return list of available models"""
-    return {
+    models = {
         key: {
             'name': config['name'],
             'type': config['type'],
@@ -305,30 +839,50 @@ def get_available_models() -> Dict[str, Dict[str, str]]:
         }
         for key, config in MODEL_CONFIGS.items()
     }
+    if len(CASCADE_ORDER) > 1:
+        models[CASCADE_KEY] = {'name': 'Auto (cascade)', 'type': 'cascade', 'file': None}
+    return models
 
 def get_model_status() -> Dict[str, Dict[str, Any]]:
     out: Dict[str, Dict[str, Any]] = {}
     for key, cfg in MODEL_CONFIGS.items():
+        try:
+            backend = _backend_for(key)
+        except ValueError:
+            backend = cfg['type']
         # Existence
-        found_path = None
-        for base in CANDIDATE_MODEL_DIRS:
-            cand = os.path.join(base, cfg['file'])
-            if os.path.exists(cand):
-                found_path = cand
-                break
+        filename = onnx_backend.onnx_path(cfg['file']) if backend == 'onnx' else cfg['file']
+        found_path = _resolve_model_file(filename)
+        if not found_path and backend == 'pytorch':
+            filename = safetensors_weights.safetensors_path(cfg['file'])
+            found_path = _resolve_model_file(filename)
         size = None
         if found_path:
             try:
                 size = os.path.getsize(found_path)
             except Exception:
                 size = None
-        loaded = key in _model_cache and _model_cache[key].model is not None
+        state = _model_cache.get(key)
+        loaded = state is not None and state.model is not None
         out[key] = {
             'architecture': cfg['architecture'],
-            'file': cfg['file'],
+            'backend': backend,
+            'file': filename,
             'exists': bool(found_path),
             'path': found_path,
             'size_bytes': size,
             'loaded': loaded,
+            'weights_file': os.path.basename(state.weights_path) if loaded and state.weights_path else None,
+            'compile_mode': state.compile_mode if loaded else ('onnxruntime' if backend == 'onnx' else COMPILE_MODE),
+            'load_ms': state.load_ms if loaded else None,
+            'warmup_ms': state.warmup_ms if loaded else None,
+            'batching': _batchers[key].stats() if key in _batchers else None,
+            'prediction_cache': get_prediction_cache().stats(key) if PREDICTION_CACHE_ENABLED else None,
+            'registry': _registry.stats(key),
         }
-    return out
\ No newline at end of file
+    return out
+
+
+def get_registry_status() -> Dict[str, Any]:
+    """Worker-wide memory budget view: budget, charged bytes, process RSS and LRU order."""
+    return _registry.summary()
@@ -0,0 +1,136 @@
+"""
+Meal-plan suggestions: which dishes, and how many servings, close today's macro gaps.
+
+A small bounded integer program solved in-process with NumPy. A plan is up to
+PLAN_MAX_ITEMS distinct dishes at 1..PLAN_MAX_SERVINGS whole servings each. Its
+cost is the squared gap per macro, measured as a fraction of the daily target (so a
+macro with nothing left still counts when a plan overshoots it), with overshoot
+weighted PLAN_OVER_PENALTY times heavier than a shortfall:
+
+    cost = sum_m w_m * ((plan_m - remaining_m) / target_m) ** 2,  w_m = penalty if over else 1
+
+Search, all vectorized over the dish table:
+  1. every (dish, servings) option is scored alone;
+  2. the PLAN_CANDIDATES best options are paired exhaustively (distinct dishes);
+  3. the PLAN_BEAM best pairs are extended by a third candidate.
+Steps 2-3 stop early once PLAN_BUDGET_MS is spent; the best plans found so far are
+returned with `truncated: true`. Results are deterministic (stable sorts, ties go
+to fewer items, then the dish table order). scripts/bench_meal_plan.py times it.
+"""
+from __future__ import annotations
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+MACROS = ('calories', 'protein', 'fat', 'carbs', 'fiber')
+PLAN_MAX_ITEMS = max(1, min(3, int(os.getenv('PLAN_MAX_ITEMS', '3'))))
+PLAN_MAX_SERVINGS = max(1, int(os.getenv('PLAN_MAX_SERVINGS', '3')))
+PLAN_CANDIDATES = int(os.getenv('PLAN_CANDIDATES', '160'))
+PLAN_BEAM = int(os.getenv('PLAN_BEAM', '96'))
+PLAN_OVER_PENALTY = float(os.getenv('PLAN_OVER_PENALTY', '2.0'))
+PLAN_BUDGET_MS = float(os.getenv('PLAN_BUDGET_MS', '20'))
+
+
+class MealPlanner:
+    def __init__(self, names: Sequence[str], servings: Sequence[Optional[str]], values: np.ndarray) -> None:
+        """`values` is the (n, 5) per-serving macro matrix in MACROS order."""
+        self.names = list(names)
+        self.servings = list(servings)
+        n = len(self.names)
+        s = np.arange(1, PLAN_MAX_SERVINGS + 1, dtype=np.float64)
+        # Option o = (dish, servings); dish-major so ties fall back to table order
+        self.opt_dish = np.repeat(np.arange(n), len(s))
+        self.opt_servings = np.tile(s, n)
+        self.opt_values = values[self.opt_dish] * self.opt_servings[:, None]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @staticmethod
+    def _cost(plan: np.ndarray, remaining: np.ndarray, scale: np.ndarray) -> np.ndarray:
+        d = (plan - remaining) * scale
+        return np.einsum('...m,...m->...', np.where(d > 0, PLAN_OVER_PENALTY, 1.0) * d, d)
+
+    def suggest(self, remaining: Dict[str, float], targets: Dict[str, float], k: int = 3,
+                max_items: int = PLAN_MAX_ITEMS, budget_ms: float = PLAN_BUDGET_MS) -> Dict[str, Any]:
+        """Best `k` plans for the `remaining` macros (grams/kcal still to eat today)."""
+        t0 = time.perf_counter()
+        deadline = t0 + budget_ms / 1000.0
+        tgt = np.array([float(targets.get(m, 0) or 0) for m in MACROS])
+        rem = np.array([max(0.0, float(remaining.get(m, 0) or 0)) for m in MACROS])
+        scale = np.where(tgt > 0, 1.0 / np.where(tgt > 0, tgt, 1.0), 0.0)
+        baseline = float(self._cost(np.zeros(len(MACROS)), rem, scale))
+        if not len(self) or baseline <= 0:
+            return {"plans": [], "baseline": round(baseline, 4), "truncated": False,
+                    "elapsed_ms": round((time.perf_counter() - t0) * 1000, 3)}
+
+        # (cost, option tuple) batches, appended in order of plan size
+        found: List[Tuple[np.ndarray, np.ndarray]] = []
+        single = self._cost(self.opt_values, rem, scale)
+        found.append((single, np.arange(len(single))[:, None]))
+        truncated = False
+
+        cand = np.argsort(single, kind='stable')[:PLAN_CANDIDATES]
+        cv, cd = self.opt_values[cand], self.opt_dish[cand]
+        if max_items >= 2 and len(cand) > 1:
+            if time.perf_counter() > deadline:
+                truncated = True
+            else:
+                pair = self._cost(cv[:, None, :] + cv[None, :, :], rem, scale)
+                # Distinct dishes, each unordered pair once (lower dish index first)
+                pair = np.where(cd[:, None] < cd[None, :], pair, np.inf)
+                flat = np.argsort(pair, axis=None, kind='stable')
+                flat = flat[np.isfinite(pair.ravel()[flat])]
+                pi, pj = np.unravel_index(flat, pair.shape)
+                found.append((pair[pi, pj], np.stack([cand[pi], cand[pj]], axis=1)))
+
+                if max_items >= 3:
+                    bi, bj = pi[:PLAN_BEAM], pj[:PLAN_BEAM]
+                    step = 32
+                    for lo in range(0, len(bi), step):
+                        if time.perf_counter() > deadline:
+                            truncated = True
+                            break
+                        a, b = bi[lo:lo + step], bj[lo:lo + step]
+                        base = cv[a] + cv[b]
+                        tri = self._cost(base[:, None, :] + cv[None, :, :], rem, scale)
+                        tri = np.where(cd[b][:, None] < cd[None, :], tri, np.inf)
+                        r, c = np.nonzero(np.isfinite(tri))
+                        found.append((tri[r, c], np.stack([cand[a[r]], cand[b[r]], cand[c]], axis=1)))
+
+        plans = self._pick(found, baseline, k)
+        return {"plans": plans, "baseline": round(baseline, 4), "truncated": truncated,
+                "elapsed_ms": round((time.perf_counter() - t0) * 1000, 3)}
+
+    def _pick(self, found: List[Tuple[np.ndarray, np.ndarray]], baseline: float, k: int) -> List[Dict[str, Any]]:
+        costs = np.concatenate([c for c, _ in found])
+        sizes = np.concatenate([np.full(len(c), o.shape[1]) for c, o in found])
+        offsets = np.cumsum([0] + [len(c) for c, _ in found])
+        order = np.lexsort((np.arange(len(costs)), sizes, costs))
+        plans: List[Dict[str, Any]] = []
+        seen = set()
+        for idx in order:
+            if len(plans) >= k or costs[idx] >= baseline:
+                break
+            batch = int(np.searchsorted(offsets, idx, side='right') - 1)
+            opts = found[batch][1][idx - offsets[batch]]
+            dishes = frozenset(int(self.opt_dish[o]) for o in opts)
+            # One plan per dish combination; other serving counts of it add little
+            if dishes in seen:
+                continue
+            seen.add(dishes)
+            plans.append(self._plan(opts, float(costs[idx])))
+        return plans
+
+    def _plan(self, opts: np.ndarray, cost: float) -> Dict[str, Any]:
+        items = []
+        total = np.zeros(len(MACROS))
+        for o in opts:
+            d, n, v = int(self.opt_dish[o]), float(self.opt_servings[o]), self.opt_values[o]
+            total += v
+            items.append({"dish_name": self.names[d], "servings": n, "serving": self.servings[d],
+                          **{m: round(float(v[j]), 1) for j, m in enumerate(MACROS)}})
+        return {"items": items, "totals": {m: round(float(total[j]), 1) for j, m in enumerate(MACROS)},
+                "score": round(cost, 4)}
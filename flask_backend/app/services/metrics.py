@@ -0,0 +1,270 @@
+"""
+Prometheus-style metrics (text exposition format 0.0.4) without extra dependencies.
+
+Each worker keeps counters, gauges and fixed-bucket histograms in memory (a dict
+update under a lock per observation) and flushes a JSON snapshot to
+METRICS_DIR/metrics-<pid>-*.json every METRICS_FLUSH_S seconds. GET /metrics merges
+every snapshot in the directory, so whichever gunicorn worker serves the scrape
+reports totals for all of them: counters and histograms are summed, including
+from workers that have exited; gauges only count live workers.
+
+METRICS_DIR defaults to a per-master directory under the system temp dir (the
+workers' shared parent pid), so restarts of the whole server start from zero.
+METRICS_DIR=none keeps everything in-process (single-worker setups).
+"""
+from __future__ import annotations
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+METRICS_ENABLED = os.getenv('METRICS', 'true').lower() == 'true'
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_FLUSH_S = max(0.5, float(os.getenv('METRICS_FLUSH_S', '5')))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LOAD_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# name -> (type, help, buckets)
+METRICS: Dict[str, Tuple[str, str, Optional[Tuple[float, ...]]]] = {
+    'http_request_duration_seconds': ('histogram', 'HTTP request latency until the response is returned, by route.', LATENCY_BUCKETS),
+    'http_requests_in_flight': ('gauge', 'Requests currently being handled, by route.', None),
+    'stage_duration_seconds': ('histogram', 'Latency of request stages (inference, nutrition lookup, storage upload, inserts, auth).', LATENCY_BUCKETS),
+    'model_load_seconds': ('histogram', 'Model load + warmup time.', LOAD_BUCKETS),
+    'model_evictions_total': ('counter', 'Models evicted by the memory budget.', None),
+    'prediction_cache_requests_total': ('counter', 'Prediction cache lookups by result (hit/miss).', None),
+    'prediction_tokens_total': ('counter', 'Meal logs by prediction handoff result (reused/invalid/absent).', None),
+    'auth_tokens_total': ('counter', 'Bearer token checks by result (cache_hit/local/remote/invalid).', None),
+    'daily_summary_updates_total': ('counter', 'Write-path daily_summaries updates by result (ok/error).', None),
+    'response_cache_total': ('counter', 'Cached read endpoints by result (not_modified/hit/miss).', None),
+    'nutrition_refresh_total': ('counter', 'Background nutrition table refreshes by result (changed/unchanged/error).', None),
+    'admission_total': ('counter', 'Inference admission decisions.', None),
+    'supabase_requests_total': ('counter', 'HTTP calls to Supabase by service, operation, method and status class.', None),
+    'supabase_errors_total': ('counter', 'Supabase calls that returned HTTP status >= 400.', None),
+    'supabase_request_duration_seconds': ('histogram', 'Supabase call latency until response headers.', LATENCY_BUCKETS),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+Key = Tuple[str, Labels]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.pid = os.getpid()
+        self.counters: Dict[Key, float] = {}
+        self.gauges: Dict[Key, float] = {}
+        self.hists: Dict[Key, List[Any]] = {}  # key -> [bucket counts..., +Inf count], sum, count
+        self.dir: Optional[str] = None
+        self._flusher: Optional[threading.Thread] = None
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0.0) + value
+
+    def gauge_add(self, name: str, delta: float, **labels: Any) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self.gauges[key] = self.gauges.get(key, 0.0) + delta
+
+    def observe(self, name: str, seconds: float, **labels: Any) -> None:
+        buckets = METRICS[name][2] or LATENCY_BUCKETS
+        key = (name, _labels(labels))
+        with self._lock:
+            h = self.hists.get(key)
+            if h is None:
+                h = self.hists[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+            h[0][bisect_left(buckets, seconds)] += 1
+            h[1] += seconds
+            h[2] += 1
+
+    @contextmanager
+    def timer(self, name: str, **labels: Any) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'pid': self.pid,
+                'counters': [[n, list(map(list, l)), v] for (n, l), v in self.counters.items()],
+                'gauges': [[n, list(map(list, l)), v] for (n, l), v in self.gauges.items()],
+                'hists': [[n, list(map(list, l)), list(h[0]), h[1], h[2]] for (n, l), h in self.hists.items()],
+            }
+
+    def flush(self) -> None:
+        if not self.dir:
+            return
+        # Module name too: the `app` and `flask_backend.app` import paths are separate registries
+        path = os.path.join(self.dir, f"metrics-{self.pid}-{__name__.replace('.', '_')}.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.snapshot(), f, separators=(',', ':'))
+        os.replace(tmp, path)  # readers never see a half-written file
+
+    def _flush_loop(self) -> None:
+        while True:
+            time.sleep(METRICS_FLUSH_S)
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"[metrics] flush failed: {e}")
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def collect(m: Metrics) -> List[Dict[str, Any]]:
+    """This worker's fresh snapshot plus the last one flushed by every other worker."""
+    if not m.dir:
+        return [m.snapshot()]
+    m.flush()
+    snaps = []
+    for path in glob.glob(os.path.join(m.dir, 'metrics-*.json')):
+        try:
+            with open(path) as f:
+                snaps.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return snaps
+
+
+def _fmt_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ''
+    esc = lambda v: v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')  # noqa: E731
+    return '{' + ','.join(f'{k}="{esc(v)}"' for k, v in items) + '}'
+
+
+def _num(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def render(snaps: List[Dict[str, Any]]) -> str:
+    counters: Dict[Key, float] = {}
+    gauges: Dict[Key, float] = {}
+    hists: Dict[Key, List[Any]] = {}
+    for snap in snaps:
+        live = snap.get('pid') == os.getpid() or _pid_alive(int(snap.get('pid', 0)))
+        for n, l, v in snap.get('counters', []):
+            key = (n, tuple(map(tuple, l)))
+            counters[key] = counters.get(key, 0.0) + v
+        if live:
+            for n, l, v in snap.get('gauges', []):
+                key = (n, tuple(map(tuple, l)))
+                gauges[key] = gauges.get(key, 0.0) + v
+        for n, l, b, s, c in snap.get('hists', []):
+            key = (n, tuple(map(tuple, l)))
+            h = hists.setdefault(key, [[0] * len(b), 0.0, 0])
+            h[0] = [x + y for x, y in zip(h[0], b)]
+            h[1] += s
+            h[2] += c
+
+    lines: List[str] = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == 'histogram':
+            bounds = list(buckets or LATENCY_BUCKETS)
+            for (n, labels), (counts, total, count) in sorted(hists.items()):
+                if n != name:
+                    continue
+                cum = 0
+                for bound, c in zip(bounds + [float('inf')], counts):
+                    cum += c
+                    le = '+Inf' if bound == float('inf') else _num(bound)
+                    lines.append(f"{name}_bucket{_fmt_labels(labels, ('le', le))} {cum}")
+                lines.append(f"{name}_sum{_fmt_labels(labels)} {_num(total)}")
+                lines.append(f"{name}_count{_fmt_labels(labels)} {count}")
+        else:
+            series = counters if kind == 'counter' else gauges
+            for (n, labels), v in sorted(series.items()):
+                if n == name:
+                    lines.append(f"{name}{_fmt_labels(labels)} {_num(v)}")
+    lines.append("# HELP metrics_workers Worker snapshots merged into this scrape.")
+    lines.append("# TYPE metrics_workers gauge")
+    lines.append(f"metrics_workers {len(snaps)}")
+    return '\n'.join(lines) + '\n'
+
+
+def _default_dir() -> str:
+    # Workers forked from one gunicorn master share its pid as their parent
+    return os.path.join(tempfile.gettempdir(), f"app-metrics-{os.getppid()}")
+
+
+_singleton: Optional[Metrics] = None
+_singleton_lock = threading.Lock()
+
+
+def get_metrics() -> Metrics:
+    """Per-process registry; re-created after a fork so workers never inherit the master's counts."""
+    global _singleton
+    m = _singleton
+    if m is not None and m.pid == os.getpid():
+        return m
+    with _singleton_lock:
+        if _singleton is None or _singleton.pid != os.getpid():
+            m = Metrics()
+            target = METRICS_DIR or _default_dir()
+            if target.lower() != 'none':
+                try:
+                    os.makedirs(target, exist_ok=True)
+                    m.dir = target
+                except OSError as e:
+                    print(f"[metrics] {target} unusable ({e}); metrics cover this worker only")
+            if m.dir:
+                m._flusher = threading.Thread(target=m._flush_loop, name="metrics-flush", daemon=True)
+                m._flusher.start()
+            _singleton = m
+    return _singleton
+
+
+# Module-level shorthands; no-ops when METRICS=false
+def inc(name: str, value: float = 1.0, **labels: Any) -> None:
+    if METRICS_ENABLED:
+        get_metrics().inc(name, value, **labels)
+
+
+def gauge_add(name: str, delta: float, **labels: Any) -> None:
+    if METRICS_ENABLED:
+        get_metrics().gauge_add(name, delta, **labels)
+
+
+def observe(name: str, seconds: float, **labels: Any) -> None:
+    if METRICS_ENABLED:
+        get_metrics().observe(name, seconds, **labels)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time one request stage into stage_duration_seconds{stage=name}."""
+    if not METRICS_ENABLED:
+        yield
+        return
+    with get_metrics().timer('stage_duration_seconds', stage=name):
+        yield
+
+
+def render_all() -> str:
+    return render(collect(get_metrics()))
@@ -0,0 +1,129 @@
+"""
+Optional compiled serving mode for the PyTorch classifiers.
+
+INFERENCE_COMPILE_MODE:
+- eager (default): serve the nn.Module as loaded.
+- torchscript: trace + torch.jit.freeze (folds conv-bn, inlines weights), then
+  optimize_for_inference at load. The frozen module is cached next to the .pth as `<name>.torchscript.pt`
+  together with the class list, so later starts skip building the eager model entirely.
+- compile: torch.compile (inductor). Compiled kernels are cached under
+  ml_models/.inductor_cache unless TORCHINDUCTOR_CACHE_DIR is set.
+ResNet-50 additionally runs in channels_last in the non-eager modes.
+Any failure falls back to eager so a missing compiler never takes the service down.
+"""
+from __future__ import annotations
+import json
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import torch
+
+COMPILE_MODE = os.getenv('INFERENCE_COMPILE_MODE', 'eager').lower()
+
+TORCHSCRIPT_SUFFIX = '.torchscript.pt'
+
+
+def uses_channels_last(mode: str, architecture: str) -> bool:
+    return mode != 'eager' and architecture == 'resnet50'
+
+
+def torchscript_path(model_path: str) -> str:
+    return os.path.splitext(model_path)[0] + TORCHSCRIPT_SUFFIX
+
+
+def _source_meta(model_path: str, architecture: str) -> Dict[str, Any]:
+    # Anything that changes the exported graph invalidates the artifact
+    st = os.stat(model_path)
+    return {
+        'source_size': st.st_size,
+        'source_mtime': int(st.st_mtime),
+        'architecture': architecture,
+        'torch': torch.__version__,
+        'dynamic_quantize': os.getenv('DYNAMIC_QUANTIZE'),
+    }
+
+
+def load_torchscript_artifact(model_path: str, architecture: str, device) -> Optional[Tuple[Any, Dict[int, str]]]:
+    """Return (frozen module, class_map) from a cached artifact, or None if missing/stale."""
+    path = torchscript_path(model_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        extra = {'meta.json': ''}
+        module = torch.jit.load(path, map_location=device, _extra_files=extra)
+        meta = json.loads(extra['meta.json'] or '{}')
+    except Exception as e:
+        print(f"[inference] TorchScript artifact unreadable ({path}): {e}")
+        return None
+    class_list = meta.pop('class_list', None)
+    if meta != _source_meta(model_path, architecture) or not class_list:
+        print(f"[inference] TorchScript artifact stale, re-exporting: {path}")
+        return None
+    return _optimize_frozen(module), {i: name for i, name in enumerate(class_list)}
+
+
+def _optimize_frozen(module):
+    # Applied after load: the MKLDNN-rewritten graph it produces cannot be serialized
+    try:
+        return torch.jit.optimize_for_inference(module)
+    except Exception as e:
+        # e.g. dynamically quantized Linear layers
+        print(f"[inference] optimize_for_inference skipped: {e}")
+        return module
+
+
+def _export_torchscript(model, class_map: Dict[int, str], model_path: str, architecture: str, input_size: int, channels_last: bool, device):
+    example = torch.randn(2, 3, input_size, input_size, device=device)
+    if channels_last:
+        example = example.contiguous(memory_format=torch.channels_last)
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example, check_trace=False)
+        module = torch.jit.freeze(traced.eval())
+    meta = _source_meta(model_path, architecture)
+    meta['class_list'] = [class_map[i] for i in range(len(class_map))]
+    path = torchscript_path(model_path)
+    try:
+        torch.jit.save(module, path, _extra_files={'meta.json': json.dumps(meta)})
+        print(f"[inference] Saved TorchScript artifact {path}")
+    except OSError as e:
+        # Read-only model dir: still serve the in-memory module
+        print(f"[inference] Could not save TorchScript artifact: {e}")
+    return _optimize_frozen(module)
+
+
+def compile_model(model, class_map: Dict[int, str], model_path: str, architecture: str, input_size: int, mode: str, device) -> Tuple[Any, str]:
+    """Convert an eager model for `mode`; returns (model, mode actually in use)."""
+    if mode == 'eager':
+        return model, 'eager'
+    channels_last = uses_channels_last(mode, architecture)
+    try:
+        if channels_last:
+            model = model.to(memory_format=torch.channels_last)
+        if mode == 'torchscript':
+            return _export_torchscript(model, class_map, model_path, architecture, input_size, channels_last, device), mode
+        if mode == 'compile':
+            cache_dir = os.path.join(os.path.dirname(model_path), '.inductor_cache')
+            os.environ.setdefault('TORCHINDUCTOR_CACHE_DIR', cache_dir)
+            return torch.compile(model, dynamic=True), mode
+        print(f"[inference] Unknown INFERENCE_COMPILE_MODE={mode}; using eager")
+    except Exception as e:
+        print(f"[inference] {mode} export failed, using eager: {e}")
+    if channels_last:
+        model = model.to(memory_format=torch.contiguous_format)
+    return model, 'eager'
+
+
+def warmup(model, input_size: int, channels_last: bool, batch_sizes: Tuple[int, ...], device, runs: int) -> float:
+    """Run forward passes so JIT profiling / graph compilation happens before the first request."""
+    if runs <= 0:
+        return 0.0
+    start = time.time()
+    with torch.no_grad():
+        for bs in batch_sizes:
+            x = torch.zeros(bs, 3, input_size, input_size, device=device)
+            if channels_last:
+                x = x.contiguous(memory_format=torch.channels_last)
+            for _ in range(runs):
+                model(x)
+    return (time.time() - start) * 1000
@@ -0,0 +1,166 @@
+"""
+Memory-budgeted LRU bookkeeping for the models resident in this worker.
+
+Each loaded model is charged its measured resident size (see inference_service's
+_resident_bytes). Before a load, least-recently-used models are evicted until the new
+one fits MODEL_MEMORY_BUDGET_MB; pinned models (MODEL_PINNED, default: the default
+model) are never evicted. With a budget set, loads are serialized so the RSS delta
+measured around a load belongs to that model alone. This module only decides;
+the owner passes an `evict` callback that drops its own references.
+"""
+from __future__ import annotations
+import contextlib
+import ctypes
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Optional
+
+MODEL_MEMORY_BUDGET_MB = max(0.0, float(os.getenv('MODEL_MEMORY_BUDGET_MB', '0')))  # 0 = unlimited
+MODEL_PINNED = [k.strip() for k in os.getenv('MODEL_PINNED', 'resnet_food101').split(',') if k.strip()]
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size of this process (Linux), or None if unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def release_memory() -> None:
+    """Collect garbage and hand freed heap pages back to the OS so RSS actually drops."""
+    gc.collect()
+    try:
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except Exception:
+        pass
+
+
+@dataclass
+class _Entry:
+    resident_bytes: int = 0
+    loaded: bool = False
+    loads: int = 0
+    evictions: int = 0
+    last_load_ms: Optional[float] = None
+    total_load_ms: float = 0.0
+    last_evict_ms: Optional[float] = None
+    last_used: Optional[float] = None
+
+
+class ModelRegistry:
+    def __init__(self, budget_bytes: int, pinned: Iterable[str], evict: Callable[[str], None]) -> None:
+        self.budget_bytes = int(budget_bytes)
+        self.pinned = set(pinned)
+        self._evict_cb = evict
+        self._lock = threading.RLock()
+        self._load_guard = threading.Lock()
+        self._entries: Dict[str, _Entry] = {}
+        self._lru: "OrderedDict[str, None]" = OrderedDict()  # loaded keys, least recent first
+
+    def _entry(self, key: str) -> _Entry:
+        return self._entries.setdefault(key, _Entry())
+
+    def load_guard(self):
+        """Serialize loads when a budget is enforced; otherwise loads may run in parallel."""
+        return self._load_guard if self.budget_bytes else contextlib.nullcontext()
+
+    def used_bytes(self) -> int:
+        with self._lock:
+            return sum(self._entries[k].resident_bytes for k in self._lru)
+
+    def estimate(self, key: str, fallback: int) -> int:
+        """Size a model will need: what it measured last time, else `fallback` (e.g. file size)."""
+        with self._lock:
+            e = self._entries.get(key)
+            return e.resident_bytes if e and e.resident_bytes else max(0, fallback)
+
+    def fits(self, need_bytes: int) -> bool:
+        return not self.budget_bytes or self.used_bytes() + need_bytes <= self.budget_bytes
+
+    def make_room(self, key: str, need_bytes: int) -> None:
+        """Evict LRU unpinned models (never `key`) until `need_bytes` more fits the budget.
+
+        Raises MemoryError if it still cannot fit while other models stay resident;
+        a lone model is always allowed so the worker can serve something.
+        """
+        if not self.budget_bytes:
+            return
+        with self._lock:
+            while self.used_bytes() + need_bytes > self.budget_bytes:
+                victim = next((k for k in self._lru if k != key and k not in self.pinned), None)
+                if victim is None:
+                    break
+                self.evict(victim)
+            over = self.used_bytes() + need_bytes - self.budget_bytes
+            others = [k for k in self._lru if k != key]
+        if over > 0 and others:
+            raise MemoryError(
+                f"Model '{key}' needs {need_bytes / 2**20:.0f}MB but MODEL_MEMORY_BUDGET_MB leaves no room "
+                f"beside pinned {others}")
+
+    def record_load(self, key: str, resident_bytes: int, load_ms: float) -> None:
+        with self._lock:
+            e = self._entry(key)
+            e.resident_bytes = max(0, int(resident_bytes))
+            e.loaded = True
+            e.loads += 1
+            e.last_load_ms = round(load_ms, 1)
+            e.total_load_ms += load_ms
+            e.last_used = time.time()
+            self._lru[key] = None
+            self._lru.move_to_end(key)
+
+    def touch(self, key: str) -> None:
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                self._entries[key].last_used = time.time()
+
+    def evict(self, key: str) -> None:
+        start = time.time()
+        with self._lock:
+            if key not in self._lru:
+                return
+            del self._lru[key]
+            e = self._entry(key)
+            e.loaded = False
+            e.evictions += 1
+            self._evict_cb(key)
+        release_memory()
+        e.last_evict_ms = round((time.time() - start) * 1000, 1)
+        print(f"[inference] Evicted model '{key}' ({e.resident_bytes / 2**20:.0f}MB) in {e.last_evict_ms}ms; "
+              f"resident now {self.used_bytes() / 2**20:.0f}MB of {self.budget_bytes / 2**20:.0f}MB")
+
+    def stats(self, key: str) -> Dict[str, Any]:
+        with self._lock:
+            e = self._entries.get(key) or _Entry()
+            return {
+                'pinned': key in self.pinned,
+                'resident_bytes': e.resident_bytes if e.loaded else 0,
+                'last_resident_bytes': e.resident_bytes or None,
+                'loads': e.loads,
+                'evictions': e.evictions,
+                'last_load_ms': e.last_load_ms,
+                'avg_load_ms': round(e.total_load_ms / e.loads, 1) if e.loads else None,
+                'last_evict_ms': e.last_evict_ms,
+                'idle_s': round(time.time() - e.last_used, 1) if e.loaded and e.last_used else None,
+            }
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            used = self.used_bytes()
+            return {
+                'budget_bytes': self.budget_bytes or None,
+                'used_bytes': used,
+                'rss_bytes': rss_bytes(),
+                'pinned': sorted(self.pinned),
+                'lru': list(self._lru),  # next eviction candidate first (pinned ones are skipped)
+                'loads': sum(e.loads for e in self._entries.values()),
+                'evictions': sum(e.evictions for e in self._entries.values()),
+            }
@@ -0,0 +1,134 @@
+"""
+In-memory lookup over the nutrition table, built once from its rows.
+
+A name resolves in three steps: the exact dish_name (lowercased), then normalized
+aliases (diacritics folded, any run of separators/punctuation -> '_', plus a compact
+form without separators and with plural 's' dropped, so "Cup Cakes", "cupcakes" and
+"cup_cakes" meet), then a trigram fuzzy match for spelling drift ("spagetti
+bolognese"). A fuzzy hit needs Dice >= NUTRITION_FUZZY_MIN and a lead of at least
+NUTRITION_FUZZY_MARGIN over the runner-up dish; trigrams can't tell "beef salad" from
+beet_salad or "pho bo" from pho (both ~0.73), so anything less certain is a miss
+rather than someone else's macros. Results say how they matched ('match',
+'match_score'). Aliases shared by two different dishes are dropped rather than
+guessed. NutritionService joins each model's class_map against this at load time.
+"""
+from __future__ import annotations
+import os
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+NUTRITION_FUZZY_MIN = float(os.getenv('NUTRITION_FUZZY_MIN', '0.8'))
+NUTRITION_FUZZY_MARGIN = float(os.getenv('NUTRITION_FUZZY_MARGIN', '0.15'))
+MACROS = ('calories', 'protein', 'fat', 'carbs', 'fiber')
+
+_SEP = re.compile(r'[^a-z0-9]+')
+
+
+def fold(name: str) -> str:
+    """Lowercase ASCII with Vietnamese/Latin diacritics removed ('Phở bò' -> 'pho bo')."""
+    s = (name or '').strip().lower().replace('đ', 'd')
+    s = unicodedata.normalize('NFKD', s)
+    return ''.join(c for c in s if not unicodedata.combining(c))
+
+
+def normalize(name: str) -> str:
+    return _SEP.sub('_', fold(name)).strip('_')
+
+
+def compact(name: str) -> str:
+    """Separator-free, plural-insensitive key: 'cup_cakes' / 'cupcake' -> 'cupcake'."""
+    return ''.join(t[:-1] if len(t) > 3 and t.endswith('s') and not t.endswith('ss') else t
+                   for t in normalize(name).split('_'))
+
+
+def trigrams(key: str) -> set:
+    s = f"  {key.replace('_', ' ')} "
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+def _num(v: Any) -> float:
+    try:
+        return float(v) if v not in (None, '') else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def to_result(row: Dict[str, Any]) -> Dict[str, Any]:
+    """get_nutrition's success payload for one table/CSV row."""
+    return {
+        "success": True,
+        "nutrition": {k: _num(row.get(k)) for k in MACROS},
+        "serving": row.get('serving') or None,
+        "source": row.get('dataset_source') or None,
+        "dish_name": (row.get('dish_name') or '').strip().lower(),
+    }
+
+
+class NutritionIndex:
+    def __init__(self, rows: Iterable[Dict[str, Any]]) -> None:
+        self.results: List[Dict[str, Any]] = []
+        self._exact: Dict[str, int] = {}
+        self._alias: Dict[str, int] = {}
+        self._grams: Dict[str, List[int]] = defaultdict(list)
+        self._gram_sets: List[set] = []
+        ambiguous = set()
+        for row in rows:
+            dish = (row.get('dish_name') or '').strip().lower()
+            if not dish or dish in self._exact:
+                continue
+            i = len(self.results)
+            self.results.append(to_result(row))
+            self._exact[dish] = i
+            for alias in {normalize(dish), compact(dish)}:
+                if alias in ambiguous:
+                    continue
+                if self._alias.get(alias, i) != i:
+                    ambiguous.add(alias)
+                    del self._alias[alias]
+                else:
+                    self._alias[alias] = i
+            grams = trigrams(normalize(dish))
+            self._gram_sets.append(grams)
+            for gram in grams:
+                self._grams[gram].append(i)
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def lookup(self, name: str) -> Optional[Tuple[int, str, float]]:
+        """(row index, 'exact' | 'alias' | 'fuzzy', similarity) or None."""
+        key = (name or '').strip().lower()
+        if not key:
+            return None
+        i = self._exact.get(key)
+        if i is not None:
+            return i, 'exact', 1.0
+        for alias in (normalize(key), compact(key)):
+            i = self._alias.get(alias)
+            if i is not None:
+                return i, 'alias', 1.0
+        grams = trigrams(normalize(key))
+        shared: Dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for j in self._grams.get(gram, ()):
+                shared[j] += 1
+        best, best_score, runner_up = None, 0.0, 0.0
+        for j, n in shared.items():
+            score = 2.0 * n / (len(grams) + len(self._gram_sets[j]))
+            # A tie leaves runner_up == best_score, so it fails the margin whatever the row order
+            if score > best_score:
+                best, best_score, runner_up = j, score, best_score
+            elif score > runner_up:
+                runner_up = score
+        if best is not None and best_score >= NUTRITION_FUZZY_MIN and best_score - runner_up >= NUTRITION_FUZZY_MARGIN:
+            return best, 'fuzzy', round(best_score, 3)
+        return None
+
+    def result(self, name: str) -> Optional[Dict[str, Any]]:
+        hit = self.lookup(name)
+        if hit is None:
+            return None
+        i, kind, score = hit
+        return {**self.results[i], "match": kind, "match_score": score}
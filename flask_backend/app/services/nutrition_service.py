@@ -1,7 +1,16 @@
 from __future__ import annotations
 import os, csv
-from typing import Dict, Any, Optional
+import hashlib
+import json
+import threading
+import time
+from typing import Dict, Any, List, Optional
 
+from . import metrics
+from .nutrition_index import NutritionIndex
+from .dish_search import DishSearch, collect_names
+from .meal_plan import PLAN_MAX_ITEMS, MealPlanner
+from .recommendations import RecommendationIndex
 from .supabase_service import get_supabase_service
 
 THIS_DIR = os.path.dirname(__file__)
@@ -9,77 +18,183 @@ CANDIDATE_CSV = [
     os.path.abspath(os.path.join(THIS_DIR, "..", "..", "..", "data", "nutrition_database.csv")),
     os.path.abspath(os.path.join(THIS_DIR, "..", "data", "nutrition_database.csv")),
 ]
+RESOLVED_MAX = 4096
+NUTRITION_REFRESH_S = float(os.getenv("NUTRITION_REFRESH_S", "300"))
+
+
+def _read_csv_rows() -> List[Dict[str, Any]]:
+    csv_path = next((p for p in CANDIDATE_CSV if os.path.exists(p)), None)
+    if not csv_path:
+        raise FileNotFoundError("nutrition_database.csv not found in data/")
+    # Load CSV lightly (avoid pandas)
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+def _rows_version(rows: List[Dict[str, Any]]) -> str:
+    canon = sorted(json.dumps(r, sort_keys=True, default=str) for r in rows)
+    return hashlib.sha256('\n'.join(canon).encode('utf-8')).hexdigest()[:16]
+
+
+class _Store:
+    """One immutable generation of the table: index + resolved names. Swapped as a whole."""
+
+    def __init__(self, rows: List[Dict[str, Any]], source: str) -> None:
+        self.index = NutritionIndex(rows)
+        self.version = _rows_version(rows)
+        self.source = source
+        self.loaded_at = time.time()
+        # Resolved class/dish name -> result payload (class-map joins + memoized lookups)
+        self.resolved: Dict[str, Optional[Dict[str, Any]]] = {}
+        # Per-macro amount/density orderings for recommendations
+        self.recs = RecommendationIndex(self.index.results)
+        self.planner = MealPlanner(self.recs.names, self.recs.servings, self.recs.values)
+        # Dish + class-name prefix index; rebuilt as model class maps are attached
+        self.search: Optional[DishSearch] = None
 
 
 class NutritionService:
+    """Nutrition per dish/class name from an in-memory NutritionIndex (see nutrition_index.py),
+    built from the CSV or, with USE_SUPABASE_NUTRITION=true, the whole `nutrition` table.
+    Model class names are resolved against it when a model loads (attach_class_map), so
+    get_nutrition for a predicted class is a dict hit with no I/O.
+
+    In Supabase mode a daemon thread re-reads the table every NUTRITION_REFRESH_S and,
+    only if its content hash changed, builds a new store (re-joining the attached class
+    maps) and swaps it in; requests keep reading the previous store meanwhile. If the
+    first fetch fails, the CSV serves until a refresh succeeds."""
+
     def __init__(self) -> None:
         self.use_supabase = os.getenv("USE_SUPABASE_NUTRITION", "false").lower() == "true"
+        self._lock = threading.Lock()
+        self._search_lock = threading.Lock()
+        self._class_maps: Dict[str, Dict[int, str]] = {}
         if not self.use_supabase:
-            csv_path = next((p for p in CANDIDATE_CSV if os.path.exists(p)), None)
-            if not csv_path:
-                raise FileNotFoundError("nutrition_database.csv not found in data/")
-            # Load CSV lightly (avoid pandas). Build list of dicts with normalized key.
-            self._rows = []
-            with open(csv_path, newline='', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    dish = (row.get('dish_name') or '').strip()
-                    row['dish_name_norm'] = dish.lower()
-                    # Convert numeric fields defensively
-                    for k in ['calories','protein','fat','carbs','fiber']:
-                        v = row.get(k)
-                        try:
-                            row[k] = float(v) if v not in (None, '') else 0.0
-                        except Exception:
-                            row[k] = 0.0
-                    self._rows.append(row)
+            self._store = _Store(_read_csv_rows(), 'csv')
         else:
             # Ensure Supabase client is available
             self.sb = get_supabase_service()
+            try:
+                self._store = _Store(self._fetch_rows(), 'supabase')
+            except Exception as e:
+                print(f"[nutrition] initial fetch failed ({e}); serving the CSV until a refresh succeeds")
+                self._store = _Store(_read_csv_rows(), 'csv')
+            threading.Thread(target=self._refresh_loop, name="nutrition-refresh", daemon=True).start()
+        self._build_search(self._store)
+        print(f"[nutrition] indexed {len(self.index)} dishes from {self._store.source} (version {self._store.version})")
+
+    @property
+    def index(self) -> NutritionIndex:
+        return self._store.index
+
+    def _fetch_rows(self) -> List[Dict[str, Any]]:
+        res = self.sb.client.table('nutrition').select('*').execute()
+        return res.data or []
+
+    def refresh(self) -> bool:
+        """Re-read the table; swap in a new store if it changed. Returns True on swap."""
+        rows = self._fetch_rows()
+        if self._store.source == 'supabase' and _rows_version(rows) == self._store.version:
+            return False
+        store = _Store(rows, 'supabase')
+        for key, class_map in list(self._class_maps.items()):
+            for name in class_map.values():
+                self._resolve(name, store)
+        self._build_search(store)
+        self._store = store
+        print(f"[nutrition] refreshed: {len(store.index)} dishes (version {store.version})")
+        return True
+
+    def _refresh_loop(self) -> None:
+        while True:
+            time.sleep(NUTRITION_REFRESH_S)
+            try:
+                changed = self.refresh()
+                metrics.inc('nutrition_refresh_total', result='changed' if changed else 'unchanged')
+            except Exception as e:
+                metrics.inc('nutrition_refresh_total', result='error')
+                print(f"[nutrition] refresh failed: {e}; keeping version {self._store.version}")
+
+    def _resolve(self, name: str, store: Optional[_Store] = None) -> Optional[Dict[str, Any]]:
+        store = store or self._store
+        key = (name or '').strip().lower()
+        if key in store.resolved:
+            return store.resolved[key]
+        result = store.index.result(key)
+        with self._lock:
+            if len(store.resolved) >= RESOLVED_MAX:
+                store.resolved.clear()
+            store.resolved[key] = result
+        return result
+
+    def attach_class_map(self, model_key: str, class_map: Dict[int, str]) -> Dict[str, int]:
+        """Resolve every class of a freshly loaded model up front; returns counts per match kind."""
+        self._class_maps[model_key] = dict(class_map)
+        counts = {"exact": 0, "alias": 0, "fuzzy": 0, "missing": 0}
+        unresolved, fuzzy = [], []
+        for name in class_map.values():
+            result = self._resolve(name)
+            kind = result["match"] if result else "missing"
+            counts[kind] += 1
+            if result is None:
+                unresolved.append(name)
+            elif kind == "fuzzy":
+                fuzzy.append(f"{name}->{result['dish_name']}")
+        print(f"[nutrition] {model_key}: {len(class_map)} classes, " + ", ".join(f"{v} {k}" for k, v in counts.items())
+              + (f"; fuzzy {fuzzy}" if fuzzy else "") + (f"; no nutrition for {unresolved}" if unresolved else ""))
+        self._build_search(self._store)
+        return counts
+
+    def _build_search(self, store: _Store) -> None:
+        with self._search_lock:
+            names = collect_names(store.recs.names, dict(self._class_maps))
+            store.search = DishSearch(names, lambda n: self._resolve(n, store))
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Ranked dish/class names starting with `query` (diacritics ignored), nutrition attached."""
+        search = self._store.search
+        return search.search(query, limit) if search else []
+
+    def top_dishes(self, macro: str, k: int = 5) -> List[Dict[str, Any]]:
+        """The k dishes richest in `macro` per serving."""
+        return self._store.recs.top(macro, k)
+
+    def recommend(self, macro: str, gap: Optional[float] = None, kcal_cap: Optional[float] = None,
+                  k: int = 5) -> List[Dict[str, Any]]:
+        """Dishes to close a `macro` gap, ranked as described in recommendations.py."""
+        return self._store.recs.recommend(macro, gap, kcal_cap, k)
+
+    def suggest_plan(self, remaining: Dict[str, float], targets: Dict[str, float], k: int = 3,
+                     max_items: Optional[int] = None) -> Dict[str, Any]:
+        """Dish/serving combinations closing today's `remaining` macros (see meal_plan.py)."""
+        return self._store.planner.suggest(remaining, targets, k=k, max_items=max_items or PLAN_MAX_ITEMS)
 
     def get_nutrition(self, class_name: str) -> Dict[str, Any]:
-        key = (class_name or '').strip().lower()
-        if self.use_supabase:
-            res = (self.sb.client.table('nutrition')
-                   .select('*').eq('dish_name', key).maybe_single().execute())
-            r = res.data
-            if not r:
-                return {"success": False, "error": f"Nutrition not found for {class_name}"}
-            return {
-                "success": True,
-                "nutrition": {
-                    "calories": float(r.get('calories', 0) or 0),
-                    "protein": float(r.get('protein', 0) or 0),
-                    "fat": float(r.get('fat', 0) or 0),
-                    "carbs": float(r.get('carbs', 0) or 0),
-                    "fiber": float(r.get('fiber', 0) or 0),
-                },
-                "serving": r.get('serving', None),
-                "source": r.get('dataset_source', None),
-            }
-        # CSV fallback
-        match = next((r for r in self._rows if r.get('dish_name_norm') == key), None)
-        if not match:
+        result = self._resolve(class_name)
+        if result is None:
             return {"success": False, "error": f"Nutrition not found for {class_name}"}
-        r = match
-        return {
-            "success": True,
-            "nutrition": {
-                "calories": float(r.get('calories', 0) or 0),
-                "protein": float(r.get('protein', 0) or 0),
-                "fat": float(r.get('fat', 0) or 0),
-                "carbs": float(r.get('carbs', 0) or 0),
-                "fiber": float(r.get('fiber', 0) or 0),
-            },
-            "serving": r.get('serving', None),
-            "source": r.get('dataset_source', None),
-        }
+        # Callers may decorate the payload; hand out copies
+        return {**result, "nutrition": dict(result["nutrition"])}
 
 
 _singleton: Optional[NutritionService] = None
+_singleton_lock = threading.Lock()
 
 def get_nutrition_service() -> NutritionService:
     global _singleton
     if _singleton is None:
-        _singleton = NutritionService()
+        # Model preload threads and requests can race to build it
+        with _singleton_lock:
+            if _singleton is None:
+                _singleton = NutritionService()
     return _singleton
+
+
+def warm_nutrition() -> None:
+    """Build the service (and its first table fetch) off the request path; returns immediately."""
+    def run() -> None:
+        try:
+            get_nutrition_service()
+        except Exception as e:
+            print(f"[nutrition] warmup failed: {e}")
+    threading.Thread(target=run, name="nutrition-warm", daemon=True).start()
@@ -0,0 +1,71 @@
+"""
+ONNX Runtime CPU backend for the classifiers; importing this module does not import torch.
+
+Models are `ml_models/<name>.onnx` files produced by scripts/export_onnx.py, with the
+class list stored in the model metadata (`class_list`, JSON). Inputs are the float32
+NCHW arrays from preprocessing.py, outputs are raw logits.
+"""
+from __future__ import annotations
+import json
+import os
+import time
+from typing import Dict, Tuple
+
+import numpy as np
+
+try:
+    import onnxruntime as ort
+    _HAS_ORT = True
+except Exception as _e:
+    ort = None
+    _HAS_ORT = False
+    print(f"[inference] onnxruntime import failed: {_e}")
+
+ONNX_SUFFIX = '.onnx'
+ORT_INTRA_OP_THREADS = int(os.getenv('ORT_INTRA_OP_THREADS', os.getenv('OMP_NUM_THREADS', '0')))
+
+
+def onnx_path(model_file: str) -> str:
+    return os.path.splitext(model_file)[0] + ONNX_SUFFIX
+
+
+class OnnxModel:
+    def __init__(self, path: str) -> None:
+        if not _HAS_ORT:
+            raise RuntimeError("onnxruntime not installed but required for this model")
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        opts.intra_op_num_threads = ORT_INTRA_OP_THREADS
+        opts.inter_op_num_threads = 1
+        self.path = path
+        self.session = ort.InferenceSession(path, sess_options=opts, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        meta = self.session.get_modelmeta().custom_metadata_map
+        self.class_map: Dict[int, str] = {i: n for i, n in enumerate(json.loads(meta.get('class_list', '[]')))}
+        self.architecture = meta.get('architecture')
+
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: np.ascontiguousarray(batch, dtype=np.float32)})[0]
+
+
+def softmax_topk(logits: np.ndarray, k: int) -> Tuple[list, list]:
+    """Row-wise softmax + top-k (descending) for an (N, C) logits array."""
+    z = logits - logits.max(axis=1, keepdims=True)
+    np.exp(z, out=z)
+    z /= z.sum(axis=1, keepdims=True)
+    k = min(k, z.shape[1])
+    idx = np.argpartition(-z, k - 1, axis=1)[:, :k]
+    part = np.take_along_axis(z, idx, axis=1)
+    order = np.argsort(-part, axis=1, kind='stable')
+    return np.take_along_axis(part, order, axis=1).tolist(), np.take_along_axis(idx, order, axis=1).tolist()
+
+
+def warmup(model: OnnxModel, input_size: int, batch_sizes: Tuple[int, ...], runs: int) -> float:
+    if runs <= 0:
+        return 0.0
+    start = time.time()
+    for bs in batch_sizes:
+        x = np.zeros((bs, 3, input_size, input_size), dtype=np.float32)
+        for _ in range(runs):
+            model(x)
+    return (time.time() - start) * 1000
@@ -0,0 +1,96 @@
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, Any, Optional, Tuple
+
+from . import metrics
+
+# Bounded LRU of prediction results keyed by (model_key, sha256(image bytes)).
+# Capped by entry count and by approximate serialized size; entries expire after the TTL.
+PREDICTION_CACHE_ENABLED = os.getenv("PREDICTION_CACHE", "true").lower() == "true"
+PREDICTION_CACHE_MAX_ENTRIES = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "2048"))
+PREDICTION_CACHE_MAX_BYTES = int(os.getenv("PREDICTION_CACHE_MAX_BYTES", str(4 * 1024 * 1024)))
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "3600"))
+
+CacheKey = Tuple[str, str]
+
+
+class PredictionCache:
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # key -> (expires_at, size, result)
+        self._data: "OrderedDict[CacheKey, Tuple[float, int, Dict[str, Any]]]" = OrderedDict()
+        self._bytes = 0
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0, "evictions": 0, "expired": 0})
+
+    def get(self, key: CacheKey) -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            counters = self._counters[key[0]]
+            item = self._data.get(key)
+            if item is None:
+                counters["misses"] += 1
+                metrics.inc('prediction_cache_requests_total', model=key[0], result='miss')
+                return None
+            expires_at, size, result = item
+            if expires_at < now:
+                self._remove(key, size)
+                counters["expired"] += 1
+                counters["misses"] += 1
+                metrics.inc('prediction_cache_requests_total', model=key[0], result='miss')
+                return None
+            self._data.move_to_end(key)
+            counters["hits"] += 1
+            metrics.inc('prediction_cache_requests_total', model=key[0], result='hit')
+            # Callers decorate the dict (nutrition, token); hand out a copy
+            return dict(result)
+
+    def put(self, key: CacheKey, result: Dict[str, Any]) -> None:
+        size = len(json.dumps(result, default=str)) + 200  # payload + key/bookkeeping overhead
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._data[key] = (time.monotonic() + self.ttl, size, dict(result))
+            self._bytes += size
+            while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                old_key, (_, old_size, _) = self._data.popitem(last=False)
+                self._bytes -= old_size
+                self._counters[old_key[0]]["evictions"] += 1
+
+    def _remove(self, key: CacheKey, size: int) -> None:
+        del self._data[key]
+        self._bytes -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self, model_key: str) -> Dict[str, Any]:
+        with self._lock:
+            c = dict(self._counters.get(model_key) or {"hits": 0, "misses": 0, "evictions": 0, "expired": 0})
+            total = c["hits"] + c["misses"]
+            c["hit_rate"] = round(c["hits"] / total, 4) if total else 0.0
+            c["entries"] = sum(1 for k in self._data if k[0] == model_key)
+            c["cache_entries_total"] = len(self._data)
+            c["cache_bytes_total"] = self._bytes
+            c["ttl_s"] = self.ttl
+            return c
+
+
+_singleton: Optional[PredictionCache] = None
+
+def get_prediction_cache() -> PredictionCache:
+    global _singleton
+    if _singleton is None:
+        _singleton = PredictionCache(PREDICTION_CACHE_MAX_ENTRIES, PREDICTION_CACHE_MAX_BYTES, PREDICTION_CACHE_TTL)
+    return _singleton
@@ -0,0 +1,87 @@
+from __future__ import annotations
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from typing import Dict, Any, Optional
+
+# Signed, short-lived handoff from /api/predict to /api/meals/log so the model runs once per meal.
+# The token is stateless and bound to the SHA-256 of the image bytes. It verifies in any
+# worker (or replica) holding the same key: PREDICTION_TOKEN_SECRET, else a key derived
+# from SUPABASE_SERVICE_ROLE_KEY, which every backend process shares.
+PREDICTION_TOKEN_TTL = int(os.getenv("PREDICTION_TOKEN_TTL", "600"))
+
+
+def _load_secret() -> bytes:
+    secret = os.getenv("PREDICTION_TOKEN_SECRET", "").strip()
+    if secret:
+        return secret.encode("utf-8")
+    shared = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "").strip()
+    if shared:
+        # Derived, so a leaked token key never doubles as the service-role key
+        return hmac.new(shared.encode("utf-8"), b"prediction-token-v1", hashlib.sha256).digest()
+    print("[prediction_token] WARNING: neither PREDICTION_TOKEN_SECRET nor SUPABASE_SERVICE_ROLE_KEY is set; "
+          "using a per-process key, so tokens only verify in the worker that issued them "
+          "(/api/meals/log then runs the model again)")
+    return os.urandom(32)
+
+
+_SECRET = _load_secret()
+
+
+def image_digest(img_bytes: bytes) -> str:
+    return hashlib.sha256(img_bytes).hexdigest()
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _unb64(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(body: str) -> str:
+    return _b64(hmac.new(_SECRET, body.encode("ascii"), hashlib.sha256).digest())
+
+
+def issue_prediction_token(pred: Dict[str, Any], img_bytes: bytes, model_key: Optional[str] = None) -> str:
+    """`model_key` is what the client asked for (e.g. 'auto'); defaults to the model that answered."""
+    payload = {
+        "m": model_key or pred.get("model_used"),
+        "c": pred.get("class_name"),
+        "f": pred.get("food_name"),
+        "p": pred.get("confidence"),
+        "h": image_digest(img_bytes),
+        "exp": int(time.time()) + PREDICTION_TOKEN_TTL,
+    }
+    body = _b64(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+    return f"{body}.{_sign(body)}"
+
+
+def verify_prediction_token(token: str, img_bytes: Optional[bytes] = None, model_key: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Return the prediction carried by `token`, or None if it is invalid, expired,
+    issued for another model, or does not match `img_bytes`.
+    """
+    try:
+        body, sig = (token or "").split(".", 1)
+        if not hmac.compare_digest(sig, _sign(body)):
+            return None
+        payload = json.loads(_unb64(body))
+    except Exception:
+        return None
+    if int(payload.get("exp", 0)) < time.time():
+        return None
+    if model_key and payload.get("m") != model_key:
+        return None
+    if img_bytes is not None and not hmac.compare_digest(str(payload.get("h", "")), image_digest(img_bytes)):
+        return None
+    return {
+        "success": True,
+        "class_name": payload.get("c"),
+        "food_name": payload.get("f"),
+        "confidence": payload.get("p"),
+        "model_used": payload.get("m"),
+    }
@@ -0,0 +1,81 @@
+"""
+Image decode + preprocessing for the classifiers, without torchvision.
+
+Equivalent to Resize((256, 256)) -> CenterCrop(224) -> ToTensor -> Normalize(ImageNet)
+but built once per architecture and operating on uint8 NumPy arrays:
+- JPEGs are decoded with PIL draft mode, so a 12 MP photo is DCT-scaled (1/2, 1/4, 1/8)
+  to the smallest size still >= 256x256 instead of being fully decoded first.
+- Normalization is a single fused multiply-add from uint8 into float32 CHW,
+  with no intermediate float PIL image or torch copies.
+The output is a plain float32 array so non-torch backends can use it directly.
+"""
+from __future__ import annotations
+import io
+import os
+from dataclasses import dataclass
+from typing import Dict
+
+import numpy as np
+from PIL import Image
+
+PREPROCESS_JPEG_DRAFT = os.getenv("PREPROCESS_JPEG_DRAFT", "true").lower() == "true"
+
+IMAGENET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+IMAGENET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+
+@dataclass(frozen=True)
+class PreprocessSpec:
+    resize: int = 256
+    crop: int = 224
+    resample: int = Image.BILINEAR
+
+
+# Interpolation matches what each model was trained with
+ARCH_SPECS: Dict[str, PreprocessSpec] = {
+    'vit_b_16': PreprocessSpec(resample=Image.BICUBIC),
+    'resnet50': PreprocessSpec(resample=Image.BILINEAR),
+}
+
+
+class ImagePreprocessor:
+    def __init__(self, spec: PreprocessSpec, use_draft: bool = True) -> None:
+        self.spec = spec
+        self.use_draft = use_draft
+        # (x / 255 - mean) / std  ==  x * scale + bias
+        self.scale = (1.0 / (255.0 * IMAGENET_STD)).astype(np.float32)
+        self.bias = (-IMAGENET_MEAN / IMAGENET_STD).astype(np.float32)
+        # Same rounding as torchvision CenterCrop
+        self.offset = int(round((spec.resize - spec.crop) / 2.0))
+
+    def decode(self, img_bytes: bytes) -> Image.Image:
+        img = Image.open(io.BytesIO(img_bytes))
+        if self.use_draft and img.format == 'JPEG':
+            # Only shrinks by powers of two and never below the requested size
+            img.draft('RGB', (self.spec.resize, self.spec.resize))
+        return img.convert('RGB')
+
+    def to_array(self, img: Image.Image) -> np.ndarray:
+        """Resize/crop/normalize a decoded RGB image into a (1, 3, crop, crop) float32 array."""
+        s = self.spec
+        img = img.resize((s.resize, s.resize), resample=s.resample)
+        o, c = self.offset, s.crop
+        hwc = np.asarray(img, dtype=np.uint8)[o:o + c, o:o + c]
+        out = np.empty((c, c, 3), dtype=np.float32)
+        np.multiply(hwc, self.scale, out=out, casting='unsafe')
+        out += self.bias
+        return np.ascontiguousarray(out.transpose(2, 0, 1))[None]
+
+    def __call__(self, img_bytes: bytes) -> np.ndarray:
+        return self.to_array(self.decode(img_bytes))
+
+
+_preprocessors: Dict[str, ImagePreprocessor] = {}
+
+def get_preprocessor(architecture: str) -> ImagePreprocessor:
+    pre = _preprocessors.get(architecture)
+    if pre is None:
+        spec = ARCH_SPECS.get(architecture, PreprocessSpec())
+        pre = ImagePreprocessor(spec, use_draft=PREPROCESS_JPEG_DRAFT)
+        _preprocessors[architecture] = pre
+    return pre
@@ -0,0 +1,83 @@
+"""
+Post-training static int8 quantization (FX graph mode) for the CNN classifier.
+
+DYNAMIC_QUANTIZE only touches nn.Linear, which is a rounding error for ResNet-50;
+static PTQ quantizes the convolutions too. scripts/quantize_resnet.py calibrates on
+local images and writes `ml_models/<name>.int8.pt`: a frozen TorchScript module with
+the class list, backend and source checkpoint stats in its metadata. With
+STATIC_QUANTIZE=true, _ensure_model_loaded serves that artifact instead of fp32.
+"""
+from __future__ import annotations
+import json
+import os
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import torch
+
+STATIC_QUANTIZE = os.getenv('STATIC_QUANTIZE', 'false').lower() == 'true'
+QUANT_BACKEND = os.getenv('QUANT_BACKEND', 'x86')  # x86 (fbgemm + onednn) | fbgemm | qnnpack (ARM)
+
+INT8_SUFFIX = '.int8.pt'
+
+
+def int8_path(model_path: str) -> str:
+    return os.path.splitext(model_path)[0] + INT8_SUFFIX
+
+
+def _source_stats(model_path: str) -> Dict[str, Any]:
+    st = os.stat(model_path)
+    return {'source_size': st.st_size, 'source_mtime': int(st.st_mtime)}
+
+
+def quantize_static_fx(model, calibration_batches: Iterable, input_size: int, backend: str = QUANT_BACKEND):
+    """Prepare -> calibrate -> convert an eval-mode fp32 model; returns a frozen TorchScript module."""
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    torch.backends.quantized.engine = backend
+    model = model.cpu().eval()
+    example = torch.randn(1, 3, input_size, input_size)
+    prepared = prepare_fx(model, get_default_qconfig_mapping(backend), example_inputs=(example,))
+    seen = 0
+    with torch.no_grad():
+        for batch in calibration_batches:
+            prepared(batch)
+            seen += int(batch.shape[0])
+    if seen == 0:
+        raise ValueError("No calibration images")
+    quantized = convert_fx(prepared)
+    with torch.no_grad():
+        traced = torch.jit.trace(quantized, torch.randn(2, 3, input_size, input_size), check_trace=False)
+        return torch.jit.freeze(traced.eval()), seen
+
+
+def save_int8(module, path: str, model_path: str, class_map: Dict[int, str], architecture: str, backend: str, calibration_images: int) -> None:
+    meta = {
+        **_source_stats(model_path),
+        'architecture': architecture,
+        'backend': backend,
+        'calibration_images': calibration_images,
+        'class_list': [class_map[i] for i in range(len(class_map))],
+    }
+    torch.jit.save(module, path, _extra_files={'meta.json': json.dumps(meta)})
+
+
+def load_int8_artifact(model_path: str) -> Optional[Tuple[Any, Dict[int, str]]]:
+    """Return (int8 module, class_map), or None when no usable artifact exists for this checkpoint."""
+    path = int8_path(model_path)
+    if not os.path.exists(path):
+        print(f"[inference] STATIC_QUANTIZE set but {path} missing (run scripts/quantize_resnet.py); using fp32")
+        return None
+    try:
+        extra = {'meta.json': ''}
+        module = torch.jit.load(path, map_location='cpu', _extra_files=extra)
+        meta = json.loads(extra['meta.json'] or '{}')
+    except Exception as e:
+        print(f"[inference] int8 artifact unreadable ({path}): {e}; using fp32")
+        return None
+    if any(meta.get(k) != v for k, v in _source_stats(model_path).items()):
+        # Calibration cannot be redone at startup; serve fp32 rather than stale weights
+        print(f"[inference] int8 artifact {path} was built from a different checkpoint; using fp32")
+        return None
+    torch.backends.quantized.engine = meta.get('backend', QUANT_BACKEND)
+    return module, {i: name for i, name in enumerate(meta.get('class_list') or [])}
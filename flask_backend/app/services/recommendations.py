@@ -0,0 +1,82 @@
+"""
+Dish recommendations for a macro gap, precomputed over the nutrition table.
+
+Built once per nutrition store (see NutritionService) as NumPy arrays: an (n, 5)
+macro matrix plus, per macro, two stable orderings computed up front: by grams per
+serving and by density (grams per 100 kcal). A query is a boolean mask over the
+calorie column applied to a precomputed order, so it costs microseconds and
+allocates nothing proportional to users.
+
+Ranking rules (deterministic; ties broken by dish_name):
+  - calories: most kcal per serving first.
+  - other macros: highest density first, so the dish that fills the gap with the
+    fewest calories wins; dishes over the optional kcal_cap (e.g. the calories still
+    missing) are skipped, and zero-calorie rows are ranked by grams.
+Every item carries the numbers it was ranked on (`rank_by`, `per_100kcal`, `covers`).
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+MACROS = ('calories', 'protein', 'fat', 'carbs', 'fiber')
+_COL = {m: i for i, m in enumerate(MACROS)}
+
+
+class RecommendationIndex:
+    def __init__(self, results: Sequence[Dict[str, Any]]) -> None:
+        """`results` are NutritionIndex.results (dish_name, nutrition{...}, serving)."""
+        self.names: List[str] = [r['dish_name'] for r in results]
+        self.servings: List[Optional[str]] = [r.get('serving') for r in results]
+        n = len(self.names)
+        self.values = np.array([[float(r['nutrition'].get(m, 0.0)) for m in MACROS] for r in results],
+                               dtype=np.float64).reshape(n, len(MACROS))
+        kcal = self.values[:, 0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.density = np.where(kcal[:, None] > 0, 100.0 * self.values / kcal[:, None], 0.0)
+        # Rank of each name, used as the final lexsort key so ties never depend on row order
+        name_rank = np.argsort(np.argsort(np.array(self.names, dtype=object), kind='stable'), kind='stable')
+        self.by_amount: Dict[str, np.ndarray] = {}
+        self.by_density: Dict[str, np.ndarray] = {}
+        for m, c in _COL.items():
+            self.by_amount[m] = np.lexsort((name_rank, -self.values[:, c]))
+            # Zero-kcal rows have no density; they go after every dense row, by grams
+            no_kcal = (kcal <= 0).astype(np.int8)
+            self.by_density[m] = np.lexsort((name_rank, -self.values[:, c], -self.density[:, c], no_kcal))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _item(self, i: int, macro: str, gap: Optional[float], rank_by: str) -> Dict[str, Any]:
+        row = self.values[i]
+        c = _COL[macro]
+        item: Dict[str, Any] = {"dish_name": self.names[i], **{m: float(row[j]) for j, m in enumerate(MACROS)},
+                                "serving": self.servings[i], "rank_by": rank_by,
+                                "per_100kcal": round(float(self.density[i, c]), 2)}
+        if gap and gap > 0:
+            item["covers"] = round(float(row[c]) / gap, 3)
+        return item
+
+    def top(self, macro: str, k: int = 5) -> List[Dict[str, Any]]:
+        """The k dishes with the most `macro` per serving."""
+        if macro not in _COL:
+            return []
+        return [self._item(int(i), macro, None, 'amount') for i in self.by_amount[macro][:k]]
+
+    def recommend(self, macro: str, gap: Optional[float] = None, kcal_cap: Optional[float] = None,
+                  k: int = 5) -> List[Dict[str, Any]]:
+        """Up to k dishes to close a `gap` in `macro`, never above `kcal_cap` kcal per serving."""
+        if macro not in _COL or k <= 0:
+            return []
+        if macro == 'calories':
+            order, rank_by = self.by_amount[macro], 'amount'
+            if gap and gap > 0:
+                # Don't suggest a dish that alone overshoots the calorie gap by more than half
+                kcal_cap = min(kcal_cap, 1.5 * gap) if kcal_cap else 1.5 * gap
+        else:
+            order, rank_by = self.by_density[macro], 'density'
+        if kcal_cap is not None and kcal_cap > 0:
+            order = order[self.values[order, 0] <= kcal_cap]
+        # Dishes without any of the macro can't fill the gap
+        order = order[self.values[order, _COL[macro]] > 0][:k]
+        return [self._item(int(i), macro, gap, rank_by) for i in order]
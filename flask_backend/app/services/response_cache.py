@@ -0,0 +1,197 @@
+"""
+Per-user versioned response cache with strong ETags for the read endpoints.
+
+Each user has a version token, replaced by the write paths (@invalidates_user_cache
+on log/delete meal, profile upsert, avatar upload). A cached GET's ETag is derived
+from user, version, local date, a RESPONSE_CACHE_TTL epoch and the request path,
+so it is known before any Supabase call: a matching If-None-Match gets 304 straight
+away, and a repeat request is served from this worker's in-memory copy of the body.
+The date and TTL epoch bound staleness for data that changes outside these write
+paths (day rollover, edits made directly in the database).
+
+Bodies are kept per worker in an LRU bounded by RESPONSE_CACHE_MAX entries and
+RESPONSE_CACHE_TOTAL_BYTES in total (bodies over RESPONSE_CACHE_MAX_BYTES are not kept).
+
+Versions live as small files in RESPONSE_CACHE_DIR (default: a per-master directory
+under the system temp dir, like metrics) so a write handled by one gunicorn worker
+invalidates every worker. RESPONSE_CACHE_DIR=none keeps them in-process.
+"""
+from __future__ import annotations
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+from typing import Callable, Dict, Optional, Tuple
+
+from flask import Response, g, make_response, request
+
+from . import metrics
+
+RESPONSE_CACHE = os.getenv('RESPONSE_CACHE', 'true').lower() == 'true'
+RESPONSE_CACHE_DIR = os.getenv('RESPONSE_CACHE_DIR', '')
+RESPONSE_CACHE_TTL = max(1, int(os.getenv('RESPONSE_CACHE_TTL', '300')))
+RESPONSE_CACHE_MAX = int(os.getenv('RESPONSE_CACHE_MAX', '2000'))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', str(512 * 1024)))  # per body
+RESPONSE_CACHE_TOTAL_BYTES = int(os.getenv('RESPONSE_CACHE_TOTAL_BYTES', str(16 * 1024 * 1024)))  # per worker
+
+
+class _Versions:
+    def __init__(self) -> None:
+        self.pid = os.getpid()
+        self.dir: Optional[str] = None
+        self._local: Dict[str, str] = {}
+        target = RESPONSE_CACHE_DIR or os.path.join(tempfile.gettempdir(), f"app-respcache-{os.getppid()}")
+        if target.lower() != 'none':
+            try:
+                os.makedirs(target, exist_ok=True)
+                self.dir = target
+            except OSError as e:
+                print(f"[cache] {target} unusable ({e}); cache versions are per worker")
+
+    def _path(self, user_id: str) -> str:
+        return os.path.join(self.dir or '', hashlib.sha256(user_id.encode('utf-8')).hexdigest()[:32])
+
+    def get(self, user_id: str) -> str:
+        if not self.dir:
+            return self._local.get(user_id, '0')
+        try:
+            with open(self._path(user_id)) as f:
+                return f.read().strip() or '0'
+        except FileNotFoundError:
+            return '0'
+
+    def bump(self, user_id: str) -> None:
+        token = uuid.uuid4().hex
+        if not self.dir:
+            self._local[user_id] = token
+            return
+        path = self._path(user_id)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(token)
+        os.replace(tmp, path)
+
+
+class _Bodies:
+    """LRU of response bodies, capped by entry count and by total size (like prediction_cache)."""
+
+    def __init__(self, max_entries: int, max_bytes: int) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # (user, path) -> (etag, body, mimetype)
+        self._data: "OrderedDict[Tuple[str, str], Tuple[str, bytes, str]]" = OrderedDict()
+        self._bytes = 0
+
+    @staticmethod
+    def _size(key: Tuple[str, str], body: bytes) -> int:
+        return len(body) + len(key[0]) + len(key[1]) + 200  # body + key/bookkeeping overhead
+
+    def get(self, key: Tuple[str, str], etag: str) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] != etag:
+                return None
+            self._data.move_to_end(key)
+            return item[1], item[2]
+
+    def put(self, key: Tuple[str, str], etag: str, body: bytes, mimetype: str) -> None:
+        size = self._size(key, body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            # One entry per (user, path): a new version replaces the stale body
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= self._size(key, old[1])
+            self._data[key] = (etag, body, mimetype)
+            self._bytes += size
+            while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                old_key, (_, old_body, _) = self._data.popitem(last=False)
+                self._bytes -= self._size(old_key, old_body)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'entries': len(self._data), 'bytes': self._bytes, 'max_bytes': self.max_bytes}
+
+
+_versions: Optional[_Versions] = None
+_bodies = _Bodies(RESPONSE_CACHE_MAX, RESPONSE_CACHE_TOTAL_BYTES)
+_lock = threading.Lock()
+
+
+def _get_versions() -> _Versions:
+    global _versions
+    v = _versions
+    if v is not None and v.pid == os.getpid():
+        return v
+    with _lock:
+        if _versions is None or _versions.pid != os.getpid():
+            _versions = _Versions()
+    return _versions
+
+
+def bump_user_version(user_id: str) -> None:
+    try:
+        _get_versions().bump(user_id)
+    except OSError as e:
+        print(f"[cache] version bump failed for {user_id}: {e}")
+
+
+def _etag(user_id: str, path: str) -> str:
+    parts = (user_id, _get_versions().get(user_id), date.today().isoformat(),
+             str(int(time.time() // RESPONSE_CACHE_TTL)), path)
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()[:32]
+
+
+def _finish(resp: Response, etag: str) -> Response:
+    resp.set_etag(etag)
+    # Browsers keep the body but revalidate every time; If-None-Match then gets a 304
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    resp.vary.update(('Authorization', 'X-User-Id'))
+    return resp
+
+
+def cached_response(fn: Callable):
+    """For GET handlers behind @require_auth that depend only on the user's data and the URL."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        uid = getattr(g, 'user_id', None)
+        if not RESPONSE_CACHE or not uid or request.method != 'GET':
+            return fn(*args, **kwargs)
+        path = request.full_path
+        etag = _etag(uid, path)
+        if request.if_none_match.contains(etag):
+            metrics.inc('response_cache_total', result='not_modified')
+            return _finish(Response(status=304), etag)
+        hit = _bodies.get((uid, path), etag)
+        if hit is not None:
+            metrics.inc('response_cache_total', result='hit')
+            return _finish(Response(hit[0], mimetype=hit[1]), etag)
+        metrics.inc('response_cache_total', result='miss')
+        resp = make_response(fn(*args, **kwargs))
+        if resp.status_code != 200:
+            return resp
+        body = resp.get_data()
+        if len(body) <= RESPONSE_CACHE_MAX_BYTES:
+            _bodies.put((uid, path), etag, body, resp.mimetype or 'application/json')
+        return _finish(resp, etag)
+    return wrapper
+
+
+def invalidates_user_cache(fn: Callable):
+    """For write handlers behind @require_auth: bump the user's version once the handler ran."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            uid = getattr(g, 'user_id', None)
+            if RESPONSE_CACHE and uid:
+                bump_user_version(uid)
+    return wrapper
@@ -0,0 +1,112 @@
+"""
+Safetensors checkpoints: `ml_models/<name>.safetensors` next to the `.pth`, written by
+scripts/convert_safetensors.py with class_list / num_classes / architecture and the
+source checkpoint's size and SHA-256 as metadata. Both files are tracked in git LFS;
+a clone or image build resets mtimes, so staleness is judged by content, not mtime.
+
+Unlike torch.load of the pickled .pth, the tensors come back backed by a private
+mmap of the file. The model is built on the meta device and adopts them with
+load_state_dict(assign=True), so untouched weights stay in the OS page cache,
+shared by every worker on the box, and nothing is copied at startup. That holds for
+weights used as loaded: with DYNAMIC_QUANTIZE=true (the default) ViT's Linear layers,
+most of its weights, are quantized into private int8 copies, so only
+DYNAMIC_QUANTIZE=false keeps ViT's private memory near zero.
+CHECKPOINT_FORMAT=auto (default) uses the .safetensors file when present and
+built from the current .pth; `pth` ignores it; `safetensors` requires it.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional
+
+try:
+    # safetensors.torch (load_file/save_file) imports torch, so it is imported where used
+    from safetensors import safe_open
+    _HAS_SAFETENSORS = True
+except Exception as _e:
+    _HAS_SAFETENSORS = False
+    print(f"[inference] safetensors import failed: {_e}; loading .pth checkpoints only")
+
+CHECKPOINT_FORMAT = os.getenv('CHECKPOINT_FORMAT', 'auto').lower()  # auto | safetensors | pth
+SAFETENSORS_SUFFIX = '.safetensors'
+
+
+def safetensors_path(model_file: str) -> str:
+    return os.path.splitext(model_file)[0] + SAFETENSORS_SUFFIX
+
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _source_stats(model_path: str) -> Dict[str, str]:
+    return {'source_size': str(os.path.getsize(model_path)), 'source_sha256': _file_sha256(model_path)}
+
+
+def _is_current(meta: Dict[str, str], model_path: str) -> bool:
+    """Whether the .safetensors metadata describes `model_path`: size first (a stat), then
+    the digest (one sequential read of the .pth, paid only when the sizes agree)."""
+    if meta.get('source_size') != str(os.path.getsize(model_path)):
+        return False
+    if 'source_sha256' not in meta:
+        # Converted before digests were stored; re-run scripts/convert_safetensors.py
+        return meta.get('source_mtime') == str(int(os.path.getmtime(model_path)))
+    return meta['source_sha256'] == _file_sha256(model_path)
+
+
+def read_metadata(path: str) -> Dict[str, str]:
+    with safe_open(path, framework='pt') as f:
+        return dict(f.metadata() or {})
+
+
+def pick_weights(model_path: Optional[str], st_path: Optional[str]) -> Optional[str]:
+    """The .safetensors file to load instead of `model_path`, or None to use the .pth."""
+    if CHECKPOINT_FORMAT == 'pth' or not st_path:
+        if CHECKPOINT_FORMAT == 'safetensors':
+            raise FileNotFoundError(f"CHECKPOINT_FORMAT=safetensors but no {SAFETENSORS_SUFFIX} file found (run scripts/convert_safetensors.py)")
+        return None
+    if not _HAS_SAFETENSORS:
+        if CHECKPOINT_FORMAT == 'safetensors':
+            raise RuntimeError("safetensors not installed but CHECKPOINT_FORMAT=safetensors")
+        return None
+    if model_path and CHECKPOINT_FORMAT == 'auto':
+        try:
+            meta = read_metadata(st_path)
+        except Exception as e:
+            print(f"[inference] {st_path} unreadable: {e}; using {model_path}")
+            return None
+        if not _is_current(meta, model_path):
+            print(f"[inference] {st_path} was converted from a different checkpoint; using {model_path}")
+            return None
+    return st_path
+
+
+def load_checkpoint(path: str) -> Dict[str, Any]:
+    """Same keys the training checkpoints carry, with mmap-backed CPU tensors."""
+    from safetensors.torch import load_file
+    meta = read_metadata(path)
+    class_list = json.loads(meta.get('class_list', '[]'))
+    return {
+        'model_state_dict': load_file(path, device='cpu'),
+        'class_list': class_list,
+        'num_classes': int(meta.get('num_classes', len(class_list))),
+        'mmap': True,
+    }
+
+
+def save_checkpoint(checkpoint: Dict[str, Any], out_path: str, source_path: str, architecture: str) -> None:
+    from safetensors.torch import save_file
+    state_dict = {k: v.detach().cpu().contiguous() for k, v in checkpoint['model_state_dict'].items()}
+    meta = {
+        **_source_stats(source_path),
+        'class_list': json.dumps(list(checkpoint['class_list'])),
+        'num_classes': str(checkpoint['num_classes']),
+        'architecture': architecture,
+        'source_file': os.path.basename(source_path),
+    }
+    save_file(state_dict, out_path, metadata=meta)
@@ -0,0 +1,117 @@
+"""
+Bucketed nutrition totals for /api/stats/series.
+
+The public.stats_series SQL function (supabase/schema.sql) groups a user's food_logs
+by day / ISO week / month / year in the server's local timezone and returns one row
+per bucket, so payload and latency scale with the number of buckets rather than the
+number of meals. The timezone goes over as an IANA name (TZ or /etc/localtime) so
+DST shifts inside the range bucket correctly; without one, the current UTC offset.
+
+If the function isn't deployed yet (PGRST202/42883), the logs are fetched (macro
+columns only) and bucketed here instead; any other RPC error falls back for that
+call only. scripts/check_stats_series.py compares both paths.
+"""
+from __future__ import annotations
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from .supabase_service import is_missing_function
+
+MACROS = ("calories", "protein", "fat", "carbs", "fiber")
+BUCKETS = ("day", "week", "month", "year")
+
+_HAS_RPC = True  # cleared once if supabase/schema.sql predates the function
+
+
+def local_tz_name() -> Optional[str]:
+    """IANA name of the server's local timezone, if it can be determined."""
+    tz = (os.getenv('TZ') or '').lstrip(':')
+    if tz and not tz.startswith('/'):
+        return tz
+    try:
+        target = os.path.realpath(tz or '/etc/localtime')
+    except OSError:
+        return None
+    return target.split('/zoneinfo/', 1)[1] if '/zoneinfo/' in target else None
+
+
+def _offset_minutes(at: datetime) -> int:
+    off = at.astimezone().utcoffset() or timedelta(0)
+    return int(off.total_seconds() // 60)
+
+
+def bucket_key(dt: datetime, bucket: str) -> Tuple[str, date]:
+    """(label, bucket start) for a local datetime; labels match the SQL function."""
+    if bucket == 'week':
+        y, w, _ = dt.isocalendar()
+        return f"{y}-W{int(w):02d}", (dt - timedelta(days=dt.weekday())).date()
+    if bucket == 'month':
+        return f"{dt.year}-{int(dt.month):02d}", date(dt.year, dt.month, 1)
+    if bucket == 'year':
+        return f"{dt.year}", date(dt.year, 1, 1)
+    return dt.date().isoformat(), dt.date()
+
+
+def aggregate_rows(rows: List[Dict[str, Any]], bucket: str) -> List[Dict[str, Any]]:
+    """Python bucketing of food_logs rows in the system timezone (DST-aware per row);
+    same output as the SQL function."""
+    agg: Dict[str, Dict[str, Any]] = {}
+    for r in rows:
+        try:
+            dt = datetime.fromisoformat(str(r.get('created_at')))
+        except ValueError:
+            continue
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        key, start = bucket_key(dt.astimezone(), bucket)
+        a = agg.setdefault(key, {"key": key, "_sort": start, **{m: 0.0 for m in MACROS}})
+        for m in MACROS:
+            a[m] += float(r.get(m, 0) or 0)
+    items = sorted(agg.values(), key=lambda a: a["_sort"])
+    return [{k: v for k, v in a.items() if k != "_sort"} for a in items]
+
+
+def series_python(sb, user_id: str, start_utc: str, end_utc: str, bucket: str) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    page = 1000
+    while True:
+        res = (sb.client.table('food_logs').select('created_at, ' + ', '.join(MACROS))
+               .eq('user_id', user_id)
+               .gte('created_at', start_utc)
+               .lt('created_at', end_utc)
+               .order('created_at', desc=False).order('id')
+               .range(len(rows), len(rows) + page - 1).execute())
+        chunk = res.data or []
+        rows.extend(chunk)
+        if len(chunk) < page:
+            break
+    return aggregate_rows(rows, bucket)
+
+
+def series_sql(sb, user_id: str, start_utc: str, end_utc: str, bucket: str) -> List[Dict[str, Any]]:
+    res = sb.client.rpc('stats_series', {
+        "p_user_id": user_id,
+        "p_start": start_utc,
+        "p_end": end_utc,
+        "p_bucket": bucket,
+        "p_tz": local_tz_name(),
+        "p_offset_minutes": _offset_minutes(datetime.fromisoformat(start_utc)),
+    }).execute()
+    return [{"key": r["key"], **{m: float(r.get(m) or 0) for m in MACROS}} for r in (res.data or [])]
+
+
+def stats_series(sb, user_id: str, start_utc: str, end_utc: str, bucket: str) -> List[Dict[str, Any]]:
+    """[{key, calories, protein, fat, carbs, fiber}] per non-empty bucket, oldest first."""
+    global _HAS_RPC
+    if _HAS_RPC:
+        try:
+            return series_sql(sb, user_id, start_utc, end_utc, bucket)
+        except Exception as e:
+            if is_missing_function(e):
+                _HAS_RPC = False
+                print(f"[stats] stats_series function missing ({e}); run supabase/schema.sql. Bucketing in Python")
+            else:
+                # Transient or permission errors: fall back for this call only, try the RPC next time
+                print(f"[stats] stats_series rpc failed ({e}); bucketing in Python")
+    return series_python(sb, user_id, start_utc, end_utc, bucket)
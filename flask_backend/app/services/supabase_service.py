@@ -1,22 +1,86 @@
 from __future__ import annotations
 import os
+import time
 import uuid
 from datetime import date, datetime, timezone, timedelta
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
+import httpx
 from supabase import create_client, Client
 
+from . import metrics
+
 # SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "")
 SUPABASE_BUCKET = os.getenv("SUPABASE_BUCKET", "food-uploads")
 
+_HAS_SUMMARY_RPC = True  # cleared once if supabase/schema.sql predates the function
+
+
+def is_missing_function(e: Exception) -> bool:
+    """True for PostgREST's 'function not in schema cache' (PGRST202) or Postgres undefined_function (42883)."""
+    return getattr(e, 'code', None) in ('PGRST202', '42883')
+
+
+def _operation(path: str) -> str:
+    # /rest/v1/<table>, /auth/v1/user, /auth/v1/admin/users/<id>, /storage/v1/object/<bucket>/<key>
+    parts = [p for p in path.split('/') if p]
+    rest = parts[2:] if len(parts) > 2 and parts[1] == 'v1' else parts
+    if not rest:
+        return '/'
+    return '/'.join(rest[:2]) if rest[0] == 'admin' else rest[0]
+
+
+def _on_request(request: httpx.Request) -> None:
+    request.extensions['metrics_start'] = time.perf_counter()
+
+
+def _response_hook(service: str):
+    def on_response(response: httpx.Response) -> None:
+        request = response.request
+        op = _operation(request.url.path)
+        start = request.extensions.get('metrics_start')
+        if start is not None:
+            metrics.observe('supabase_request_duration_seconds', time.perf_counter() - start, service=service, op=op)
+        metrics.inc('supabase_requests_total', service=service, op=op, method=request.method,
+                    status=f"{response.status_code // 100}xx")
+        if response.status_code >= 400:
+            metrics.inc('supabase_errors_total', service=service, op=op)
+    return on_response
+
+
+def _instrument(client: Client) -> None:
+    """Count and time every HTTP call the postgrest and storage sub-clients make, including
+    the direct `sb.client.table(...)` queries in routes, through httpx's public event hooks
+    on their `session`. supabase-py 2.6 takes no httpx client or transport in ClientOptions.
+    Transport errors raise to the caller before a response hook runs, so they are not
+    counted here. Auth calls are timed by the 'auth_get_user' stage instead."""
+    # The service-role client never signs in, so these sub-clients are not rebuilt later
+    sessions = {
+        'postgrest': lambda: client.postgrest.session,
+        'storage': lambda: client.storage.session,
+    }
+    for service, get_session in sessions.items():
+        try:
+            session = get_session()
+            if isinstance(session, httpx.Client) and _on_request not in session.event_hooks.get('request', []):
+                hooks = session.event_hooks
+                session.event_hooks = {
+                    'request': [*hooks.get('request', []), _on_request],
+                    'response': [*hooks.get('response', []), _response_hook(service)],
+                }
+        except Exception as e:
+            print(f"[metrics] could not instrument supabase {service} client: {e}")
+
 
 class SupabaseService:
     def __init__(self) -> None:
         if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
             raise RuntimeError("Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY")
         self.client: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+        if metrics.METRICS_ENABLED:
+            _instrument(self.client)
 
     # Profiles
     def get_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
@@ -78,6 +142,15 @@ class SupabaseService:
             return data[0] if data else {}
         return data or {}
 
+    def delete_food_log(self, user_id: str, log_id: str) -> List[Dict[str, Any]]:
+        """Delete one of the user's logs; returns the deleted rows (empty if none matched)."""
+        res = (self.client.table('food_logs')
+               .delete()
+               .eq('id', log_id)
+               .eq('user_id', user_id)
+               .execute())
+        return getattr(res, 'data', []) or []
+
     def get_food_logs_by_day(self, user_id: str, d: date):
         """Fetch logs for a given calendar day in the SERVER'S LOCAL TIMEZONE.
         We compute local [d 00:00, (d+1) 00:00) and convert to UTC for the query,
@@ -134,6 +207,51 @@ class SupabaseService:
             return data[0] if data else record
         return data or record
 
+    def seed_daily_summary(self, user_id: str, d: date, totals: Dict[str, float]) -> None:
+        """Create the day's row with `totals` unless it exists (a concurrent writer's row wins)."""
+        (self.client.table('daily_summaries')
+         .upsert({"user_id": user_id, "day": d.isoformat(), "totals": totals, "complete": False},
+                 on_conflict='user_id,day', ignore_duplicates=True)
+         .execute())
+
+    def get_daily_summary(self, user_id: str, d: date) -> Optional[Dict[str, Any]]:
+        res = (self.client.table('daily_summaries').select('*')
+               .eq('user_id', user_id).eq('day', d.isoformat()).limit(1).execute())
+        data = getattr(res, 'data', None) or []
+        return data[0] if data else None
+
+    def apply_daily_summary_delta(self, user_id: str, d: date, delta: Dict[str, float]) -> Optional[Dict[str, Any]]:
+        """Add `delta` to the day's totals (creating the row) and return the updated row.
+        Uses the apply_daily_summary_delta SQL function so concurrent logs can't lose
+        updates; falls back to read-modify-write if the function isn't deployed."""
+        global _HAS_SUMMARY_RPC
+        if _HAS_SUMMARY_RPC:
+            try:
+                res = self.client.rpc('apply_daily_summary_delta', {
+                    "p_user_id": user_id, "p_day": d.isoformat(), "p_delta": delta,
+                }).execute()
+                data = getattr(res, 'data', None)
+                if isinstance(data, list):
+                    return data[0] if data else None
+                return data
+            except Exception as e:
+                # Anything else (timeouts, 5xx) is raised, not retried: the delta may already
+                # be applied. apply_logs logs it and repair_daily_summaries fixes the day.
+                if not is_missing_function(e):
+                    raise
+                _HAS_SUMMARY_RPC = False
+                print(f"[supabase] apply_daily_summary_delta missing ({e}); run supabase/schema.sql. Using read-modify-write")
+        row = self.get_daily_summary(user_id, d) or {}
+        totals = dict(row.get('totals') or {})
+        for k, v in delta.items():
+            totals[k] = max(0.0, float(totals.get(k, 0) or 0) + float(v))
+        return self.upsert_daily_summary({"user_id": user_id, "day": d.isoformat(), "totals": totals,
+                                          "complete": bool(row.get('complete', False))})
+
+    def set_daily_summary_complete(self, user_id: str, d: date, complete: bool) -> None:
+        (self.client.table('daily_summaries').update({"complete": complete})
+         .eq('user_id', user_id).eq('day', d.isoformat()).execute())
+
     # Storage
     def upload_image(self, user_id: str, content: bytes, filename: str) -> str:
         ext = (os.path.splitext(filename)[1] or '.jpg').lower()
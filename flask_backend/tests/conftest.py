@@ -0,0 +1,10 @@
+"""Unit tests for the backend services; run with `python -m pytest -q` from the repo root."""
+import os
+import sys
+
+# Import services as `app.services...`, the way the routes do
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Keep metrics and cache versions in-process instead of under the system temp dir
+os.environ.setdefault("METRICS_DIR", "none")
+os.environ.setdefault("RESPONSE_CACHE_DIR", "none")
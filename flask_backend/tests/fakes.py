@@ -0,0 +1,139 @@
+"""Minimal stand-in for SupabaseService.client: a chainable query builder over dict rows."""
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Optional
+
+
+class APIError(Exception):
+    """Shaped like postgrest.exceptions.APIError: the PostgREST/Postgres code is on `.code`."""
+
+    def __init__(self, message: str, code: Optional[str] = None) -> None:
+        super().__init__(message)
+        self.code = code
+
+
+class _Result:
+    def __init__(self, data: Any) -> None:
+        self.data = data
+
+
+class _Query:
+    def __init__(self, client: "FakeClient", table: str) -> None:
+        self.client = client
+        self.table = table
+        self.filters: List[Callable[[Dict[str, Any]], bool]] = []
+        self.order_by: List[tuple] = []
+        self.slice = (0, None)
+        self.op = 'select'
+        self.payload: Any = None
+        self.conflict: List[str] = []
+        self.ignore_duplicates = False
+
+    def insert(self, record: Dict[str, Any]) -> "_Query":
+        self.op, self.payload = 'insert', record
+        return self
+
+    def upsert(self, record: Dict[str, Any], on_conflict: str = '', ignore_duplicates: bool = False) -> "_Query":
+        self.op, self.payload = 'upsert', record
+        self.conflict = [c.strip() for c in on_conflict.split(',') if c.strip()]
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, values: Dict[str, Any]) -> "_Query":
+        self.op, self.payload = 'update', values
+        return self
+
+    def delete(self) -> "_Query":
+        self.op = 'delete'
+        return self
+
+    def select(self, *_args, **_kwargs) -> "_Query":
+        return self
+
+    def eq(self, col: str, val: Any) -> "_Query":
+        self.filters.append(lambda r: str(r.get(col)) == str(val))
+        return self
+
+    def gte(self, col: str, val: Any) -> "_Query":
+        self.filters.append(lambda r: str(r.get(col)) >= str(val))
+        return self
+
+    def lt(self, col: str, val: Any) -> "_Query":
+        self.filters.append(lambda r: str(r.get(col)) < str(val))
+        return self
+
+    def order(self, col: str, desc: bool = False) -> "_Query":
+        self.order_by.append((col, desc))
+        return self
+
+    def limit(self, n: int) -> "_Query":
+        self.slice = (0, n)
+        return self
+
+    def range(self, lo: int, hi: int) -> "_Query":
+        self.slice = (lo, hi + 1)
+        return self
+
+    def _write(self) -> _Result:
+        table = self.client.tables.setdefault(self.table, [])
+        self.client.writes.append((self.op, self.table))
+        if self.op == 'insert':
+            table.append(dict(self.payload))
+            return _Result([dict(self.payload)])
+        if self.op == 'upsert':
+            for r in table:
+                if all(str(r.get(c)) == str(self.payload.get(c)) for c in self.conflict):
+                    if self.ignore_duplicates:
+                        return _Result([])
+                    r.update(self.payload)
+                    return _Result([dict(r)])
+            table.append(dict(self.payload))
+            return _Result([dict(self.payload)])
+        matched = [r for r in table if all(f(r) for f in self.filters)]
+        if self.op == 'update':
+            for r in matched:
+                r.update(self.payload)
+        else:
+            table[:] = [r for r in table if r not in matched]
+        return _Result([dict(r) for r in matched])
+
+    def execute(self) -> _Result:
+        if self.op != 'select':
+            return self._write()
+        self.client.reads.append(self.table)
+        rows = [dict(r) for r in self.client.tables.get(self.table, []) if all(f(r) for f in self.filters)]
+        for col, desc in reversed(self.order_by):
+            rows.sort(key=lambda r: str(r.get(col)), reverse=desc)
+        lo, hi = self.slice
+        return _Result(rows[lo:hi])
+
+
+class _Rpc:
+    def __init__(self, fn: Callable[[Dict[str, Any]], Any], params: Dict[str, Any]) -> None:
+        self.fn = fn
+        self.params = params
+
+    def execute(self) -> _Result:
+        return _Result(self.fn(self.params))
+
+
+class FakeClient:
+    def __init__(self, tables: Optional[Dict[str, List[Dict[str, Any]]]] = None) -> None:
+        self.tables = tables or {}
+        self.rpcs: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+        self.rpc_calls: List[str] = []
+        self.reads: List[str] = []
+        self.writes: List[tuple] = []
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    def rpc(self, name: str, params: Dict[str, Any]) -> _Rpc:
+        self.rpc_calls.append(name)
+        if name not in self.rpcs:
+            raise APIError(f"Could not find the function public.{name} in the schema cache", code='PGRST202')
+        return _Rpc(self.rpcs[name], params)
+
+
+class FakeSupabase:
+    def __init__(self, client: FakeClient) -> None:
+        self.client = client
@@ -0,0 +1,89 @@
+import threading
+import time
+
+import pytest
+
+from app.services.admission import AdmissionController, AdmissionRejected
+
+
+def _wait_for(cond, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < end, "timed out"
+        time.sleep(0.001)
+
+
+def _queue(ctl, client, order, timeout_s=5.0):
+    """Start a thread that waits for a slot, records `client`, then releases."""
+    def run():
+        ctl.acquire(client, timeout_s)
+        order.append(client)
+        ctl.release(1.0)
+
+    before = ctl.stats()['queue_depth']
+    t = threading.Thread(target=run, daemon=True)
+    t.start()
+    _wait_for(lambda: ctl.stats()['queue_depth'] == before + 1)
+    return t
+
+
+def test_free_slot_is_immediate():
+    ctl = AdmissionController(2, 0)
+    assert ctl.acquire('a', 1.0) == 0.0
+    assert ctl.acquire('b', 1.0) == 0.0
+    assert ctl.stats()['active'] == 2
+    ctl.release(1.0)
+    ctl.release(1.0)
+    assert ctl.stats()['active'] == 0
+
+
+def test_queue_full_rejects_with_retry_after():
+    ctl = AdmissionController(1, 1)
+    ctl.acquire('a', 1.0)
+    t = _queue(ctl, 'b', [])
+    with pytest.raises(AdmissionRejected) as e:
+        ctl.acquire('c', 1.0)
+    assert e.value.retry_after >= 1
+    assert ctl.would_reject() is not None
+    assert ctl.stats()['rejected_full'] == 1
+    ctl.release(1.0)
+    t.join(5)
+    assert ctl.would_reject() is None
+
+
+def test_deadline_while_queued():
+    ctl = AdmissionController(1, 4)
+    ctl.acquire('a', 1.0)
+    start = time.monotonic()
+    with pytest.raises(AdmissionRejected) as e:
+        ctl.acquire('b', 0.05)
+    assert time.monotonic() - start < 1.0
+    assert 'deadline' in e.value.reason
+    stats = ctl.stats()
+    assert stats['rejected_deadline'] == 1
+    assert stats['queue_depth'] == 0 and stats['waiting_clients'] == 0
+    ctl.release(1.0)
+    assert ctl.stats()['active'] == 0
+
+
+def test_round_robin_across_clients():
+    ctl = AdmissionController(1, 8)
+    ctl.acquire('holder', 1.0)
+    order = []
+    # One client's burst queues first; the other client still gets the second turn
+    threads = [_queue(ctl, c, order) for c in ('a', 'a', 'a', 'b', 'c')]
+    ctl.release(1.0)
+    for t in threads:
+        t.join(5)
+    assert order == ['a', 'b', 'c', 'a', 'a']
+    assert ctl.stats()['active'] == 0
+
+
+def test_slot_context_releases_on_error():
+    ctl = AdmissionController(1, 0)
+    with pytest.raises(RuntimeError):
+        with ctl.slot('a'):
+            raise RuntimeError('inference failed')
+    with ctl.slot('a') as waited:
+        assert waited == 0.0
+    assert ctl.stats()['active'] == 0
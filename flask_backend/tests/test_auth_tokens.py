@@ -0,0 +1,106 @@
+import time
+
+import jwt
+import pytest
+
+from app.services import auth_tokens as at
+
+SECRET = "test-jwt-secret-" * 5  # long enough for HS512 too
+
+
+@pytest.fixture(autouse=True)
+def _config(monkeypatch):
+    monkeypatch.setattr(at, 'SUPABASE_JWT_SECRET', SECRET)
+    monkeypatch.setattr(at, 'SUPABASE_JWKS_URL', '')
+    monkeypatch.setattr(at, 'SUPABASE_JWT_AUDIENCE', 'authenticated')
+    monkeypatch.setattr(at, 'AUTH_VERIFY', 'auto')
+    monkeypatch.setattr(at, 'AUTH_TOKEN_CACHE_TTL', 300.0)
+    monkeypatch.setattr(at, '_cache', at._TokenCache(100))
+    monkeypatch.setattr(at, '_upserts', at.OrderedDict())
+
+
+def _token(secret=SECRET, **overrides):
+    claims = {"sub": "user-1", "aud": "authenticated", "role": "authenticated", "email": "a@example.com",
+              "exp": int(time.time()) + 3600, "user_metadata": {"full_name": "A"}}
+    claims.update(overrides)
+    return jwt.encode({k: v for k, v in claims.items() if v is not None}, secret, algorithm="HS256")
+
+
+def _no_remote(token):
+    raise AssertionError("remote lookup not expected")
+
+
+def test_valid_hs256():
+    user = at.verify_token(_token(), _no_remote)
+    assert user == {"id": "user-1", "email": "a@example.com", "user_metadata": {"full_name": "A"},
+                    "role": "authenticated"}
+
+
+@pytest.mark.parametrize("token", [
+    _token(secret="another-secret--" * 5),
+    _token(aud="someone-else"),
+    _token(sub=None),
+    _token(exp=int(time.time()) - 3600),
+    _token(exp=None),
+    # The project's API keys: same secret, no sub / a role that isn't a user
+    _token(sub=None, aud=None, role="anon"),
+    _token(sub=None, aud=None, role="service_role"),
+    _token(role="service_role"),
+    "not-a-jwt",
+])
+def test_invalid_tokens(token):
+    assert at.verify_token(token, _no_remote) is None
+
+
+def test_unsupported_alg():
+    token = jwt.encode({"sub": "u", "exp": int(time.time()) + 60}, SECRET, algorithm="HS512")
+    assert at.verify_token(token, _no_remote) is None
+
+
+def test_cache_never_outlives_exp(monkeypatch):
+    exp = int(time.time()) + 60
+    token = _token(exp=exp)
+    assert at.verify_token(token, _no_remote)
+    (expires_at, _), = at._cache._data.values()
+    assert expires_at == exp
+    assert at.verify_token(token, _no_remote)["id"] == "user-1"  # cache hit
+    monkeypatch.setattr(at.time, "time", lambda: exp + 1)
+    assert at._cache.get(next(iter(at._cache._data))) is None
+
+
+def test_cache_ttl_caps_long_tokens():
+    at.verify_token(_token(exp=int(time.time()) + 86400), _no_remote)
+    (expires_at, _), = at._cache._data.values()
+    assert expires_at <= time.time() + at.AUTH_TOKEN_CACHE_TTL
+
+
+def test_remote_fallback_without_a_key(monkeypatch):
+    monkeypatch.setattr(at, 'SUPABASE_JWT_SECRET', '')
+    calls = []
+
+    def remote(token):
+        calls.append(token)
+        return {"id": "user-1"}
+
+    token = _token()
+    assert at.verify_token(token, remote) == {"id": "user-1"}
+    assert at.verify_token(token, remote) == {"id": "user-1"}
+    assert len(calls) == 1
+
+    monkeypatch.setattr(at, 'AUTH_VERIFY', 'local')
+    assert at.verify_token(_token(sub="user-2"), remote) is None
+
+
+def test_should_upsert_user_throttle(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(at.time, "time", lambda: now[0])
+    monkeypatch.setattr(at, 'USER_UPSERT_INTERVAL', 3600.0)
+    fields = ("a@example.com", "A", None)
+    assert at.should_upsert_user("u1", fields)
+    assert not at.should_upsert_user("u1", fields)
+    # Changed fields still wait for the interval
+    assert not at.should_upsert_user("u1", ("b@example.com", "A", None))
+    now[0] += 3601
+    assert not at.should_upsert_user("u1", fields)  # unchanged: never rewritten
+    assert at.should_upsert_user("u1", ("b@example.com", "A", None))
+    assert at.should_upsert_user("u2", fields)
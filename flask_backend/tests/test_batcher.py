@@ -0,0 +1,92 @@
+import threading
+
+import numpy as np
+
+from app.services.inference_service import _MicroBatcher, _ModelState
+
+
+class _Model:
+    """ONNX-style callable: logits are the input rows; records each batch size."""
+
+    def __init__(self, gate=None):
+        self.sizes = []
+        self.gate = gate
+
+    def __call__(self, batch):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.sizes.append(len(batch))
+        return batch.astype(np.float32)
+
+
+def _row(hot: int) -> np.ndarray:
+    x = np.zeros((1, 6), dtype=np.float32)
+    x[0, hot] = 10.0
+    return x
+
+
+def _batcher(model, max_size=4, wait_ms=200.0):
+    return _MicroBatcher('test', _ModelState(model=model, model_type='onnx'), max_size, wait_ms)
+
+
+def test_each_caller_gets_its_own_row():
+    model = _Model()
+    b = _batcher(model)
+    futs = [b.submit(_row(i)) for i in range(4)]
+    results = [f.result(5) for f in futs]
+    b.close()
+    for i, (probs, idx) in enumerate(results):
+        assert idx[0] == i
+        assert probs[0] > 0.9
+        assert len(idx) == 5  # TOP_K
+    assert model.sizes == [4]
+
+
+def test_batches_are_capped_at_max_size():
+    gate = threading.Event()
+    model = _Model(gate)
+    b = _batcher(model, max_size=3, wait_ms=50.0)
+    futs = [b.submit(_row(i % 6)) for i in range(7)]
+    gate.set()
+    for f in futs:
+        f.result(5)
+    b.close()
+    assert sum(model.sizes) == 7
+    assert max(model.sizes) <= 3
+    assert b.stats()['items'] == 7
+
+
+def test_lone_request_waits_at_most_the_window():
+    model = _Model()
+    b = _batcher(model, max_size=8, wait_ms=10.0)
+    probs, idx = b.submit(_row(2)).result(2)
+    b.close()
+    assert idx[0] == 2
+    assert model.sizes == [1]
+
+
+def test_model_errors_reach_every_caller():
+    def broken(batch):
+        raise ValueError('boom')
+
+    b = _batcher(broken, max_size=2, wait_ms=100.0)
+    futs = [b.submit(_row(0)), b.submit(_row(1))]
+    b.close()
+    for f in futs:
+        try:
+            f.result(5)
+        except ValueError as e:
+            assert str(e) == 'boom'
+        else:
+            raise AssertionError('expected the model error')
+
+
+def test_close_answers_queued_items_then_refuses():
+    gate = threading.Event()
+    model = _Model(gate)
+    b = _batcher(model, max_size=2, wait_ms=0.0)
+    futs = [b.submit(_row(i)) for i in range(5)]
+    b.close()
+    gate.set()
+    assert [f.result(5)[1][0] for f in futs] == [0, 1, 2, 3, 4]
+    assert b.submit(_row(0)) is None
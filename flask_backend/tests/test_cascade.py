@@ -0,0 +1,96 @@
+import pytest
+
+from app.services import inference_service as inf
+from app.services.inference_service import CascadeService
+
+
+class _Stage:
+    def __init__(self, key, pred=None, error=None, escalate=()):
+        self.model_key = key
+        self.config = {'name': key, 'escalate_classes': list(escalate)}
+        self.pred = pred
+        self.error = error
+        self.calls = 0
+
+    def predict(self, img_bytes):
+        self.calls += 1
+        if self.error:
+            raise RuntimeError(self.error)
+        return {"success": True, "model_used": self.model_key, **self.pred}
+
+
+def _pred(class_name, confidence):
+    return {"class_name": class_name, "confidence": confidence}
+
+
+@pytest.fixture
+def cascade(monkeypatch):
+    stages = {}
+
+    def setup(*specs, groups=None):
+        for spec in specs:
+            stages[spec.model_key] = spec
+            cfg = {'name': spec.model_key}
+            if groups and spec.model_key in groups:
+                cfg['calibration_group'] = groups[spec.model_key]
+            monkeypatch.setitem(inf.MODEL_CONFIGS, spec.model_key, cfg)
+        monkeypatch.setattr(inf, 'CASCADE_ORDER', [s.model_key for s in specs])
+        return CascadeService().predict(b"img")
+
+    monkeypatch.setattr(inf, 'CASCADE_CONFIDENCE', 0.6)
+    monkeypatch.setattr(inf, 'get_inference_service', lambda key: stages[key])
+    setup.stages = stages
+    return setup
+
+
+def test_confident_first_stage_stops(cascade):
+    out = cascade(_Stage('small', _pred('pizza', 0.9)), _Stage('big', _pred('pho', 0.99)))
+    assert out['class_name'] == 'pizza' and out['cascade']['selected'] == 'small'
+    assert cascade.stages['big'].calls == 0
+    assert [s['escalated'] for s in out['cascade']['stages']] == [None]
+    assert out['model_requested'] == 'auto'
+
+
+def test_low_confidence_escalates_and_later_stage_answers(cascade):
+    out = cascade(_Stage('small', _pred('pizza', 0.4)), _Stage('big', _pred('pho', 0.3)))
+    # Different heads: confidences aren't comparable, the escalated stage answers
+    assert out['class_name'] == 'pho' and out['cascade']['selected'] == 'big'
+    assert out['cascade']['stages'][0]['escalated'] == 'low_confidence'
+
+
+def test_low_confidence_within_a_calibration_group_keeps_the_more_confident(cascade):
+    out = cascade(_Stage('small', _pred('pizza', 0.5)), _Stage('big', _pred('pho', 0.3)),
+                  groups={'small': 'g', 'big': 'g'})
+    assert out['class_name'] == 'pizza' and out['cascade']['selected'] == 'small'
+    assert len(out['cascade']['stages']) == 2
+
+
+def test_out_of_domain_always_takes_the_escalated_stage(cascade):
+    out = cascade(_Stage('small', _pred('pho', 0.95), escalate=['pho']), _Stage('big', _pred('pho_bo', 0.7)),
+                  groups={'small': 'g', 'big': 'g'})
+    assert out['class_name'] == 'pho_bo' and out['cascade']['selected'] == 'big'
+    assert out['cascade']['stages'][0]['escalated'] == 'out_of_domain'
+
+
+def test_failing_stage_is_skipped(cascade):
+    out = cascade(_Stage('small', error='weights missing'), _Stage('big', _pred('pho', 0.8)))
+    assert out['class_name'] == 'pho' and out['cascade']['selected'] == 'big'
+    assert out['cascade']['stages'][0] == {'model': 'small', 'ms': out['cascade']['stages'][0]['ms'],
+                                           'error': 'weights missing'}
+
+
+def test_failing_last_stage_keeps_the_earlier_answer(cascade):
+    out = cascade(_Stage('small', _pred('pizza', 0.4)), _Stage('big', error='oom'))
+    assert out['success'] and out['class_name'] == 'pizza' and out['cascade']['selected'] == 'small'
+
+
+def test_last_stage_never_escalates(cascade):
+    out = cascade(_Stage('small', _pred('pizza', 0.2)), _Stage('big', _pred('pho', 0.1), escalate=['pho']))
+    assert out['cascade']['stages'][-1]['escalated'] is None
+    assert out['cascade']['selected'] == 'big'
+
+
+def test_every_stage_failing(cascade):
+    out = cascade(_Stage('small', error='a'), _Stage('big', error='b'))
+    assert out['success'] is False and out['error'] == 'b'
+    assert len(out['cascade']['stages']) == 2
@@ -0,0 +1,158 @@
+from datetime import date, datetime, time, timezone
+
+import pytest
+
+from app.services import supabase_service as ss
+from app.services.daily_summary import MACROS, apply_logs, today_totals
+from app.services.supabase_service import SupabaseService
+
+from fakes import APIError, FakeClient
+
+USER = "u1"
+TODAY = date.today()
+TARGETS = {"calories": 1000, "protein": 50, "fat": 0, "carbs": 0, "fiber": 0}
+
+
+def _at(hour: int) -> str:
+    """food_logs.created_at (UTC) for a local hour today."""
+    return datetime.combine(TODAY, time(hour)).astimezone().astimezone(timezone.utc).isoformat()
+
+
+def _log(log_id, hour, calories, protein=0.0):
+    return {"id": log_id, "user_id": USER, "created_at": _at(hour), "calories": calories, "protein": protein,
+            "fat": 0.0, "carbs": 0.0, "fiber": 0.0}
+
+
+def _rpc_apply(client):
+    """Python twin of the apply_daily_summary_delta SQL function."""
+    def apply(params):
+        table = client.tables.setdefault('daily_summaries', [])
+        row = next((r for r in table if r["user_id"] == params["p_user_id"] and r["day"] == params["p_day"]), None)
+        if row is None:
+            row = {"user_id": params["p_user_id"], "day": params["p_day"], "totals": {}, "complete": False}
+            table.append(row)
+        totals = dict(row["totals"])
+        for k, v in params["p_delta"].items():
+            totals[k] = max(0.0, float(totals.get(k, 0)) + float(v))
+        row["totals"] = totals
+        return [dict(row)]
+    return apply
+
+
+@pytest.fixture(autouse=True)
+def _rpc_enabled(monkeypatch):
+    monkeypatch.setattr(ss, '_HAS_SUMMARY_RPC', True)
+
+
+def _service(logs=(), summary=None, rpc=True):
+    client = FakeClient({
+        "food_logs": [dict(r) for r in logs],
+        "daily_summaries": [summary] if summary else [],
+        "profiles": [{"user_id": USER, "targets": TARGETS}],
+    })
+    if rpc is True:
+        client.rpcs['apply_daily_summary_delta'] = _rpc_apply(client)
+    elif rpc:
+        client.rpcs['apply_daily_summary_delta'] = rpc
+    sb = SupabaseService.__new__(SupabaseService)
+    sb.client = client
+    return sb
+
+
+def _row(sb):
+    rows = sb.client.tables["daily_summaries"]
+    assert len(rows) == 1
+    return rows[0]
+
+
+def _summary(calories, protein=0.0, complete=False):
+    return {"user_id": USER, "day": TODAY.isoformat(), "complete": complete,
+            "totals": {"calories": calories, "protein": protein}}
+
+
+def test_adds_to_existing_row_without_reading_logs():
+    new = _log("c", 12, 300, 20)
+    sb = _service([_log("a", 8, 500), new], summary=_summary(500))
+    apply_logs(sb, USER, [new])
+    assert _row(sb)["totals"]["calories"] == 800
+    assert "food_logs" not in sb.client.reads
+
+
+@pytest.mark.parametrize("rpc", [True, None], ids=["rpc", "no_rpc"])
+def test_missing_row_is_seeded_from_earlier_logs(rpc):
+    new = _log("c", 12, 300, 20)
+    sb = _service([_log("a", 8, 500, 10), _log("b", 9, 100), new], rpc=rpc)
+    apply_logs(sb, USER, [new])
+    totals = _row(sb)["totals"]
+    assert totals["calories"] == 900 and totals["protein"] == 30
+    assert ss._HAS_SUMMARY_RPC is (rpc is True)
+
+
+@pytest.mark.parametrize("rpc", [True, None], ids=["rpc", "no_rpc"])
+def test_delete_with_missing_row(rpc):
+    gone = _log("b", 9, 100)
+    sb = _service([_log("a", 8, 500)], rpc=rpc)  # "b" already deleted from food_logs
+    apply_logs(sb, USER, [gone], sign=-1.0)
+    assert _row(sb)["totals"]["calories"] == 500
+
+
+def test_first_log_ever_needs_no_seed():
+    new = _log("a", 12, 300)
+    sb = _service([new])
+    apply_logs(sb, USER, [new])
+    assert _row(sb)["totals"]["calories"] == 300
+    assert ("upsert", "daily_summaries") not in sb.client.writes
+
+
+def test_complete_flag_follows_targets():
+    new = _log("c", 12, 600, 30)
+    sb = _service([_log("a", 8, 400, 20), new], summary=_summary(400, 20))
+    apply_logs(sb, USER, [new])
+    assert _row(sb)["complete"] is True
+    apply_logs(sb, USER, [new], sign=-1.0)
+    assert _row(sb)["complete"] is False
+
+
+def test_other_rpc_errors_are_not_retried():
+    def broken(params):
+        raise APIError("statement timeout", code="57014")
+
+    sb = _service([_log("a", 12, 300)], summary=_summary(0), rpc=broken)
+    apply_logs(sb, USER, [_log("a", 12, 300)])  # logged, never raised to the meal write
+    assert ss._HAS_SUMMARY_RPC is True
+    assert _row(sb)["totals"]["calories"] == 0
+
+
+def test_today_totals_reads_the_row():
+    sb = _service(summary=_summary(950, 50))
+    totals, evaluation = today_totals(sb, USER, [], TARGETS)
+    assert totals == {"calories": 950.0, "protein": 50.0, "fat": 0.0, "carbs": 0.0, "fiber": 0.0}
+    # Stored complete=False but the targets are met: the flag is corrected
+    assert evaluation["complete"] and _row(sb)["complete"] is True
+
+
+def test_today_totals_seeds_a_missing_row():
+    logs = [_log("a", 8, 500, 10), _log("b", 9, 100)]
+    sb = _service(logs)
+    totals, evaluation = today_totals(sb, USER, logs, TARGETS)
+    assert totals["calories"] == 600 and not evaluation["complete"]
+    assert evaluation["missing"]["protein"] == 40.0
+    assert {k: _row(sb)["totals"][k] for k in MACROS} == totals
+
+
+def test_today_totals_without_logs_writes_nothing():
+    sb = _service()
+    totals, evaluation = today_totals(sb, USER, [], {})
+    assert totals["calories"] == 0 and evaluation["complete"] is False
+    assert sb.client.writes == []
+
+
+def test_today_totals_reads_logs_only_without_a_row():
+    logs = [_log("a", 8, 500, 10)]
+    sb = _service(logs, summary=_summary(500, 10))
+    today_totals(sb, USER, None, TARGETS)
+    assert "food_logs" not in sb.client.reads
+
+    sb = _service(logs)
+    totals, _ = today_totals(sb, USER, None, TARGETS)
+    assert totals["calories"] == 500 and sb.client.reads.count("food_logs") == 1
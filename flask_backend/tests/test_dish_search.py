@@ -0,0 +1,49 @@
+from app.services.dish_search import DishSearch, collect_names
+from app.services.nutrition_index import NutritionIndex
+
+ROWS = [{"dish_name": d, "calories": 100} for d in ("pho", "pho_bo", "banh_mi", "bun_bo_hue", "beef_pho_soup")]
+
+
+def _search():
+    index = NutritionIndex(ROWS)
+    names = collect_names([r["dish_name"] for r in ROWS], {"vn30": {0: "Pho", 1: "Banh_Xeo"}})
+    return DishSearch(names, index.result)
+
+
+def test_collect_names_merges_sources():
+    names = collect_names(["pho"], {"vn30": {0: "Pho"}, "resnet_food101": {0: "pho", 1: "ramen"}})
+    assert names == {"pho": ["nutrition", "vn30", "resnet_food101"], "ramen": ["resnet_food101"]}
+
+
+def test_ranking():
+    results = _search().search("pho")
+    assert [(r["name"], r["rank"]) for r in results] == [
+        ("pho", "exact"), ("pho_bo", "prefix"), ("beef_pho_soup", "word")]
+    assert results[0]["sources"] == ["nutrition", "vn30"]
+    assert results[0]["nutrition"]["calories"] == 100.0
+
+
+def test_folded_and_compact_queries():
+    search = _search()
+    assert search.search("Phở Bò")[0]["name"] == "pho_bo"
+    assert search.search("banhmi")[0]["name"] == "banh_mi"
+    assert [r["name"] for r in search.search("bo")] == ["pho_bo", "bun_bo_hue"]
+
+
+def test_model_only_class_has_no_nutrition():
+    hit = _search().search("banh x")[0]
+    assert hit["name"] == "banh_xeo" and hit["sources"] == ["vn30"]
+    assert hit["nutrition"] is None and hit["food_name"] == "Banh Xeo"
+
+
+def test_limit_and_empty():
+    search = _search()
+    assert len(search.search("b", limit=2)) == 2
+    assert search.search("", limit=5) == [] and search.search("pho", limit=0) == []
+    assert search.search("zzz") == []
+
+
+def test_results_do_not_share_state():
+    search = _search()
+    search.search("pho")[0]["nutrition"]["calories"] = 0
+    assert search.search("pho")[0]["nutrition"]["calories"] == 100.0
@@ -0,0 +1,25 @@
+import pytest
+
+from app.routes.meals import _decode_cursor, _encode_cursor
+
+ROW = {"id": "3f0c1c7e-5d2a-4a53-9a51-0b6f1f3c2d10", "created_at": "2026-10-01T07:30:00.123456+00:00"}
+
+
+def test_round_trip():
+    cursor = _encode_cursor(ROW)
+    assert "=" not in cursor
+    assert _decode_cursor(cursor) == (ROW["created_at"], ROW["id"])
+
+
+@pytest.mark.parametrize("bad", [
+    "",
+    "not-base64!!",
+    _encode_cursor({"id": "x", "created_at": ROW["created_at"]}),
+    _encode_cursor({"id": ROW["id"], "created_at": "yesterday"}),
+    # Values end up in a PostgREST or= filter; anything but a timestamp + uuid is refused
+    _encode_cursor({"id": ROW["id"] + ')', "created_at": ROW["created_at"]}),
+    _encode_cursor({"id": ROW["id"], "created_at": '2026-10-01",id.gt.0'}),
+])
+def test_rejects_malformed(bad):
+    with pytest.raises(ValueError):
+        _decode_cursor(bad)
@@ -0,0 +1,100 @@
+import numpy as np
+
+from app.services.meal_plan import MACROS, MealPlanner
+
+NAMES = ["rice", "chicken", "salad", "cake", "soup"]
+# calories, protein, fat, carbs, fiber per serving
+VALUES = np.array([
+    [200, 4, 1, 45, 1],
+    [250, 40, 8, 0, 0],
+    [80, 2, 5, 6, 4],
+    [450, 5, 25, 55, 1],
+    [120, 6, 3, 15, 3],
+], dtype=np.float64)
+TARGETS = {"calories": 2000, "protein": 100, "fat": 70, "carbs": 250, "fiber": 30}
+
+
+def _planner():
+    return MealPlanner(NAMES, ["1 cup"] * len(NAMES), VALUES)
+
+
+def test_nothing_left_means_no_plan():
+    res = _planner().suggest({m: 0 for m in MACROS}, TARGETS)
+    assert res["plans"] == [] and res["baseline"] == 0
+
+
+def test_exact_fit_is_found():
+    remaining = dict(zip(MACROS, (VALUES[0] * 2 + VALUES[1]).tolist()))
+    res = _planner().suggest(remaining, TARGETS, k=3, budget_ms=1000)
+    best = res["plans"][0]
+    assert best["score"] == 0
+    assert {(i["dish_name"], i["servings"]) for i in best["items"]} == {("rice", 2.0), ("chicken", 1.0)}
+    assert best["totals"]["calories"] == 650.0
+    assert not res["truncated"]
+
+
+def test_plans_are_ranked_distinct_and_better_than_nothing():
+    res = _planner().suggest({"calories": 700, "protein": 45, "fat": 20, "carbs": 70, "fiber": 8}, TARGETS, k=5,
+                             budget_ms=1000)
+    plans = res["plans"]
+    assert plans
+    scores = [p["score"] for p in plans]
+    assert scores == sorted(scores)
+    assert all(s < res["baseline"] for s in scores)
+    combos = [frozenset(i["dish_name"] for i in p["items"]) for p in plans]
+    assert len(set(combos)) == len(combos)
+    for p in plans:
+        names = [i["dish_name"] for i in p["items"]]
+        assert len(names) == len(set(names)) <= 3
+
+
+def test_overshoot_costs_more_than_shortfall():
+    # Cake alone overshoots fat; two rice servings fall a bit short of calories instead
+    res = _planner().suggest({"calories": 430, "fat": 5, "carbs": 95}, TARGETS, k=1, max_items=1)
+    assert res["plans"][0]["items"][0]["dish_name"] == "rice"
+
+
+def test_max_items_and_determinism():
+    planner = _planner()
+    remaining = {"calories": 900, "protein": 60, "fat": 25, "carbs": 90, "fiber": 10}
+    single = planner.suggest(remaining, TARGETS, k=3, max_items=1)
+    assert all(len(p["items"]) == 1 for p in single["plans"])
+    a = planner.suggest(remaining, TARGETS, k=3, budget_ms=1000)
+    b = planner.suggest(remaining, TARGETS, k=3, budget_ms=1000)
+    assert a["plans"] == b["plans"]
+
+
+def test_zero_budget_truncates_but_still_answers():
+    res = _planner().suggest({"calories": 900, "protein": 60}, TARGETS, k=3, budget_ms=0)
+    assert res["truncated"]
+    assert res["plans"] and all(len(p["items"]) == 1 for p in res["plans"])
+
+
+class _Nutrition:
+    def __init__(self):
+        self.planner = _planner()
+
+    def suggest_plan(self, remaining, targets, k=3, max_items=None):
+        return self.planner.suggest(remaining, targets, k=k, max_items=max_items or 3, budget_ms=1000)
+
+
+def test_plan_suggest_reads_the_summary_row_only(monkeypatch):
+    from datetime import date
+
+    from app.controllers import meals_controller as mc
+    from app.services.supabase_service import SupabaseService
+    from fakes import FakeClient
+
+    client = FakeClient({
+        "profiles": [{"user_id": "u1", "targets": TARGETS}],
+        "daily_summaries": [{"user_id": "u1", "day": date.today().isoformat(), "complete": False,
+                             "totals": {"calories": 1200, "protein": 40}}],
+        "food_logs": [],
+    })
+    sb = SupabaseService.__new__(SupabaseService)
+    sb.client = client
+    monkeypatch.setattr(mc, 'get_supabase_service', lambda: sb)
+    monkeypatch.setattr(mc, 'get_nutrition_service', _Nutrition)
+    res = mc.plan_suggest_controller("u1")
+    assert res["success"] and res["remaining"]["calories"] == 800.0 and res["plans"]
+    assert client.reads == ["profiles", "daily_summaries"]
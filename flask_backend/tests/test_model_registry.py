@@ -0,0 +1,78 @@
+import pytest
+
+from app.services.model_registry import ModelRegistry
+
+MB = 2**20
+
+
+def _registry(budget_mb, pinned=()):
+    evicted = []
+    reg = ModelRegistry(budget_mb * MB, pinned, evicted.append)
+    return reg, evicted
+
+
+def _load(reg, key, mb):
+    reg.make_room(key, mb * MB)
+    reg.record_load(key, mb * MB, 10.0)
+
+
+def test_budget_is_enforced_lru_first():
+    reg, evicted = _registry(300)
+    for key in ('a', 'b', 'c'):
+        _load(reg, key, 100)
+    _load(reg, 'd', 150)
+    assert evicted == ['a', 'b']
+    assert reg.summary()['lru'] == ['c', 'd']
+    assert reg.used_bytes() == 250 * MB <= reg.budget_bytes
+    assert reg.stats('a')['evictions'] == 1 and reg.stats('a')['resident_bytes'] == 0
+
+
+def test_touch_moves_to_most_recent():
+    reg, evicted = _registry(300)
+    for key in ('a', 'b', 'c'):
+        _load(reg, key, 100)
+    reg.touch('a')
+    reg.touch('unknown')  # never loaded: ignored
+    _load(reg, 'd', 100)
+    assert evicted == ['b']
+    assert reg.summary()['lru'] == ['c', 'a', 'd']
+
+
+def test_pinned_model_is_never_evicted():
+    reg, evicted = _registry(300, pinned=['a'])
+    _load(reg, 'a', 100)
+    _load(reg, 'b', 100)
+    _load(reg, 'c', 200)
+    assert evicted == ['b']
+    assert reg.summary()['lru'] == ['a', 'c']
+
+
+def test_memory_error_when_nothing_can_be_freed():
+    reg, evicted = _registry(300, pinned=['a'])
+    _load(reg, 'a', 250)
+    with pytest.raises(MemoryError):
+        reg.make_room('b', 100 * MB)
+    assert evicted == [] and reg.summary()['lru'] == ['a']
+
+
+def test_lone_model_is_allowed_over_budget():
+    reg, evicted = _registry(100)
+    _load(reg, 'a', 50)
+    _load(reg, 'big', 500)  # evicts 'a', then fits nothing else: still allowed alone
+    assert evicted == ['a'] and reg.summary()['lru'] == ['big']
+
+
+def test_reload_of_the_same_key_does_not_evict_itself():
+    reg, evicted = _registry(200)
+    _load(reg, 'a', 100)
+    _load(reg, 'b', 100)
+    reg.make_room('b', 100 * MB)
+    assert evicted == ['a']
+
+
+def test_no_budget_never_evicts():
+    reg, evicted = _registry(0)
+    for key in 'abcdef':
+        _load(reg, key, 1000)
+    assert evicted == [] and reg.fits(10**12)
+    assert reg.estimate('a', 1) == 1000 * MB and reg.estimate('zz', 7) == 7
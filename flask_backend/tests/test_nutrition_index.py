@@ -0,0 +1,57 @@
+from app.services.nutrition_index import NutritionIndex, compact, fold, normalize
+
+ROWS = [
+    {"dish_name": "Pho", "calories": "450", "protein": "25", "fat": "10", "carbs": "60", "fiber": "2", "serving": "1 bowl"},
+    {"dish_name": "cup_cakes", "calories": 300, "protein": 3},
+    {"dish_name": "spaghetti_bolognese", "calories": 600, "protein": 30, "fat": ""},
+    {"dish_name": "beet_salad", "calories": 150},
+    {"dish_name": "bun_cha", "calories": 550},
+    {"dish_name": "bun-cha", "calories": 1},  # shares every alias with bun_cha
+    {"dish_name": "pho", "calories": 999},    # duplicate dish_name: first row wins
+]
+
+
+def test_keys():
+    assert fold("Phở Bò Đặc Biệt") == "pho bo dac biet"
+    assert normalize("  Bánh mì / thịt ") == "banh_mi_thit"
+    assert compact("Cup Cakes") == compact("cupcake") == "cupcake"
+    assert compact("sea bass") == "seabass" and compact("gas") == "gas"  # "ss" and short tokens kept
+
+
+def test_exact_and_rows():
+    index = NutritionIndex(ROWS)
+    assert len(index) == 6
+    res = index.result("PHO")
+    assert res["match"] == "exact" and res["match_score"] == 1.0
+    assert res["nutrition"] == {"calories": 450.0, "protein": 25.0, "fat": 10.0, "carbs": 60.0, "fiber": 2.0}
+    assert res["serving"] == "1 bowl"
+    assert index.result("spaghetti_bolognese")["nutrition"]["fat"] == 0.0
+
+
+def test_alias():
+    index = NutritionIndex(ROWS)
+    for name in ("Cup Cakes", "cupcakes", "cup-cake", "Phở"):
+        assert index.result(name)["match"] == "alias", name
+    assert index.result("cupcakes")["dish_name"] == "cup_cakes"
+
+
+def test_ambiguous_alias_is_dropped():
+    index = NutritionIndex(ROWS)
+    assert index.result("bun_cha")["nutrition"]["calories"] == 550.0  # exact still works
+    assert index.result("Bún Chả") is None
+
+
+def test_fuzzy_needs_score_and_margin():
+    index = NutritionIndex(ROWS)
+    hit = index.result("spagetti bolognese")
+    assert hit["match"] == "fuzzy" and hit["dish_name"] == "spaghetti_bolognese"
+    assert 0.8 <= hit["match_score"] < 1.0
+    # Close to a real dish but not it: a miss, not someone else's macros
+    assert index.result("beef salad") is None
+    assert index.result("pho bo") is None
+    assert index.result("") is None
+
+
+def test_fuzzy_tie_is_a_miss():
+    index = NutritionIndex([{"dish_name": "abcd_efgh"}, {"dish_name": "abcd_efgi"}])
+    assert index.lookup("abcd efgx") is None
@@ -0,0 +1,129 @@
+import io
+import json
+
+import numpy as np
+import pytest
+from flask import Flask
+
+from app.routes import predict as route
+from app.services import inference_service as inf
+from app.services.admission import AdmissionController
+from app.services.inference_service import InferenceService, _ModelState
+from app.services.prediction_cache import PredictionCache
+
+CLASSES = {i: f"dish_{i}" for i in range(6)}
+
+
+def _decode(img_bytes):
+    """Stand-in preprocessor: b'img:<k>' becomes a one-hot row for class k."""
+    if not img_bytes.startswith(b'img:'):
+        raise ValueError('cannot identify image file')
+    x = np.zeros((1, len(CLASSES)), dtype=np.float32)
+    x[0, int(img_bytes[4:])] = 10.0
+    return x
+
+
+class _Model:
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, batch):
+        self.batches.append(len(batch))
+        return batch
+
+
+@pytest.fixture
+def service(monkeypatch):
+    model = _Model()
+    state = _ModelState(model=model, class_map=CLASSES, model_type='onnx', config={'name': 'Test', 'architecture': 'x'})
+    svc = InferenceService.__new__(InferenceService)
+    svc.model_key, svc.state, svc.model, svc.config, svc.class_map = 'test', state, model, state.config, CLASSES
+    monkeypatch.setattr(inf, '_preprocess', lambda img_bytes, st: _decode(img_bytes))
+    monkeypatch.setattr(inf, 'BATCH_MAX_SIZE', 2)
+    monkeypatch.setattr(inf, 'get_prediction_cache', lambda: PredictionCache(64, 1 << 20, 60))
+    return svc
+
+
+def test_predict_many_order_errors_and_chunks(service):
+    images = [b'img:3', b'junk', b'img:1', b'img:5', b'img:0']
+    results = service.predict_many(images)
+    assert [r.get('class_name') for r in results] == ['dish_3', None, 'dish_1', 'dish_5', 'dish_0']
+    assert results[1] == {"success": False, "error": "Invalid image: cannot identify image file"}
+    assert service.model.batches == [2, 2]  # four decodable images, BATCH_MAX_SIZE=2
+    assert all(r['model_used'] == 'test' for r in results if r['success'])
+
+
+def test_predict_many_forward_error_only_fails_its_chunk(service, monkeypatch):
+    calls = []
+
+    def forward(state, batch, k):
+        calls.append(len(batch))
+        if len(calls) == 1:
+            raise RuntimeError('device lost')
+        return inf.onnx_backend.softmax_topk(batch, k)
+
+    monkeypatch.setattr(inf, '_forward_topk', forward)
+    results = service.predict_many([b'img:0', b'img:1', b'img:2'])
+    assert [r['success'] for r in results] == [False, False, True]
+    assert results[0]['error'] == 'device lost'
+
+
+class _Nutrition:
+    def get_nutrition(self, name):
+        return {"success": True, "nutrition": {"calories": 100.0}, "dish_name": name, "match": "exact",
+                "match_score": 1.0}
+
+
+@pytest.fixture
+def client(monkeypatch, service):
+    monkeypatch.setattr(route, 'get_inference_service', lambda key: service)
+    monkeypatch.setattr(route, 'get_nutrition_service', lambda: _Nutrition())
+    monkeypatch.setattr(route, 'get_available_models', lambda: {'test': {'name': 'Test'}})
+    monkeypatch.setattr(route, 'get_admission', lambda: AdmissionController(2, 2))
+    monkeypatch.setattr(route, 'BATCH_MAX_SIZE', 2)
+    monkeypatch.setattr(route, 'PREDICT_BATCH_MAX_FILES', 4)
+    monkeypatch.setattr(route, 'PREDICT_BATCH_MAX_BYTES', 4096)
+    app = Flask(__name__)
+    app.register_blueprint(route.bp)
+    return app.test_client()
+
+
+def _post(client, files, **extra):
+    data = {'file': [(io.BytesIO(body), name) for name, body in files], **extra}
+    return client.post('/api/predict/batch?model=test', data=data, content_type='multipart/form-data')
+
+
+def test_streams_one_line_per_image_in_order(client):
+    resp = _post(client, [('a.jpg', b'img:2'), ('b.jpg', b'nope'), ('c.jpg', b'img:4')])
+    assert resp.status_code == 200 and resp.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert [(l['index'], l['filename']) for l in lines[:3]] == [(0, 'a.jpg'), (1, 'b.jpg'), (2, 'c.jpg')]
+    assert lines[0]['class_name'] == 'dish_2' and lines[0]['nutrition'] == {"calories": 100.0}
+    assert lines[0]['nutrition_match']['match'] == 'exact' and lines[0]['prediction_token']
+    assert lines[1] == {"index": 1, "filename": "b.jpg", "success": False,
+                        "error": "Invalid image: cannot identify image file"}
+    assert lines[2]['class_name'] == 'dish_4'
+    assert lines[3]['done'] and lines[3]['count'] == 3 and lines[3]['succeeded'] == 2
+
+
+def test_too_many_files(client):
+    resp = _post(client, [(f'{i}.jpg', b'img:1') for i in range(5)])
+    assert resp.status_code == 413 and 'at most 4' in resp.get_json()['error']
+
+
+def test_form_parts_limit(client):
+    # Far past max_form_parts: the parser stops before reading every part
+    resp = _post(client, [(f'{i}.jpg', b'img:1') for i in range(20)])
+    assert resp.status_code == 413 and 'Batch too large' in resp.get_json()['error']
+
+
+def test_body_size_limit(client):
+    resp = _post(client, [('big.jpg', b'img:1' + b'0' * 5000)])
+    assert resp.status_code == 413 and 'Batch too large' in resp.get_json()['error']
+
+
+def test_no_files_and_unknown_model(client):
+    assert _post(client, []).status_code == 400
+    resp = client.post('/api/predict/batch?model=nope', data={'file': [(io.BytesIO(b'img:1'), 'a.jpg')]},
+                       content_type='multipart/form-data')
+    assert resp.status_code == 400 and 'Invalid model' in resp.get_json()['error']
@@ -0,0 +1,67 @@
+from app.services import prediction_cache as pc
+from app.services.prediction_cache import PredictionCache
+
+
+def _result(n: int = 0) -> dict:
+    return {"class_name": f"dish_{n}", "confidence": 0.5, "top_predictions": []}
+
+
+def test_hit_returns_a_copy():
+    cache = PredictionCache(8, 1 << 20, 60)
+    cache.put(("vn30", "a"), _result())
+    hit = cache.get(("vn30", "a"))
+    hit["nutrition"] = {"calories": 1}
+    assert "nutrition" not in cache.get(("vn30", "a"))
+    assert cache.get(("resnet_food101", "a")) is None
+    assert cache.stats("vn30")["hits"] == 2
+
+
+def test_lru_by_entries():
+    cache = PredictionCache(2, 1 << 20, 60)
+    cache.put(("m", "a"), _result(1))
+    cache.put(("m", "b"), _result(2))
+    cache.get(("m", "a"))  # a is now most recent
+    cache.put(("m", "c"), _result(3))
+    assert cache.get(("m", "b")) is None
+    assert cache.get(("m", "a"))["class_name"] == "dish_1"
+    assert cache.get(("m", "c")) is not None
+    assert cache.stats("m")["evictions"] == 1
+
+
+def test_bytes_cap():
+    one = PredictionCache(100, 1 << 20, 60)
+    one.put(("m", "a"), _result())
+    size = one.stats("m")["cache_bytes_total"]
+
+    cache = PredictionCache(100, 2 * size + size // 2, 60)
+    for key in "abc":
+        cache.put(("m", key), _result())
+    stats = cache.stats("m")
+    assert stats["entries"] == 2 and stats["cache_bytes_total"] == 2 * size
+    assert cache.get(("m", "a")) is None
+
+    # A result bigger than the whole budget is never stored
+    tiny = PredictionCache(100, size - 1, 60)
+    tiny.put(("m", "a"), _result())
+    assert tiny.stats("m")["entries"] == 0
+
+
+def test_replacing_a_key_keeps_the_byte_count():
+    cache = PredictionCache(8, 1 << 20, 60)
+    cache.put(("m", "a"), _result())
+    before = cache.stats("m")["cache_bytes_total"]
+    cache.put(("m", "a"), _result())
+    assert cache.stats("m")["cache_bytes_total"] == before
+
+
+def test_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(pc.time, "monotonic", lambda: now[0])
+    cache = PredictionCache(8, 1 << 20, 10)
+    cache.put(("m", "a"), _result())
+    now[0] += 9
+    assert cache.get(("m", "a")) is not None
+    now[0] += 2
+    assert cache.get(("m", "a")) is None
+    stats = cache.stats("m")
+    assert stats["expired"] == 1 and stats["entries"] == 0 and stats["cache_bytes_total"] == 0
@@ -0,0 +1,55 @@
+import hashlib
+import hmac
+import importlib
+
+import pytest
+
+from app.services import prediction_token as pt
+
+PRED = {"class_name": "pho", "food_name": "Pho", "confidence": 0.93, "model_used": "vn30"}
+
+
+def test_round_trip():
+    token = pt.issue_prediction_token(PRED, b"img")
+    assert pt.verify_prediction_token(token, b"img") == {**PRED, "success": True}
+
+
+def test_rejects_other_image_and_model():
+    token = pt.issue_prediction_token(PRED, b"img", model_key="auto")
+    assert pt.verify_prediction_token(token, b"other") is None
+    assert pt.verify_prediction_token(token, b"img", model_key="vn30") is None
+    assert pt.verify_prediction_token(token, b"img", model_key="auto") is not None
+
+
+def test_rejects_expired(monkeypatch):
+    token = pt.issue_prediction_token(PRED, b"img")
+    now = pt.time.time()
+    monkeypatch.setattr(pt.time, "time", lambda: now + pt.PREDICTION_TOKEN_TTL + 5)
+    assert pt.verify_prediction_token(token, b"img") is None
+
+
+@pytest.mark.parametrize("mangle", [
+    lambda t: t[:-2] + ("AA" if not t.endswith("AA") else "BB"),  # signature
+    lambda t: "x" + t,                                            # body
+    lambda t: t.split(".")[0],                                    # no signature
+    lambda t: "",
+])
+def test_rejects_tampered(mangle):
+    assert pt.verify_prediction_token(mangle(pt.issue_prediction_token(PRED, b"img")), b"img") is None
+
+
+def test_key_derivation(monkeypatch):
+    try:
+        monkeypatch.setenv("PREDICTION_TOKEN_SECRET", "explicit")
+        assert importlib.reload(pt)._SECRET == b"explicit"
+        monkeypatch.delenv("PREDICTION_TOKEN_SECRET")
+        monkeypatch.setenv("SUPABASE_SERVICE_ROLE_KEY", "service-key")
+        derived = importlib.reload(pt)._SECRET
+        assert derived == hmac.new(b"service-key", b"prediction-token-v1", hashlib.sha256).digest()
+        assert b"service-key" not in derived
+        # Every process with the same shared secret verifies the same tokens
+        token = pt.issue_prediction_token(PRED, b"img")
+        assert importlib.reload(pt).verify_prediction_token(token, b"img") is not None
+    finally:
+        monkeypatch.undo()
+        importlib.reload(pt)
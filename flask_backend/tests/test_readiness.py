@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+from app.routes import health
+from app.services import inference_service as inf
+from app.services.model_registry import ModelRegistry
+
+
+@pytest.fixture
+def preload(monkeypatch):
+    gates = {key: threading.Event() for key in inf.MODEL_CONFIGS}
+    failures = {}
+
+    class _StubService:
+        def __init__(self, model_key):
+            gates[model_key].wait(5)
+            if model_key in failures:
+                raise RuntimeError(failures[model_key])
+            self.model_key = model_key
+
+    monkeypatch.setattr(inf, 'InferenceService', _StubService)
+    monkeypatch.setattr(inf, '_service_cache', {})
+    monkeypatch.setattr(inf, '_preload_state', {})
+    monkeypatch.setattr(inf, '_registry', ModelRegistry(0, [], lambda key: None))
+    monkeypatch.setattr(inf, 'PRELOAD_MODELS', 'all')
+    app = Flask(__name__)
+    app.register_blueprint(health.bp)
+    client = app.test_client()
+    yield client, gates, failures
+    for gate in gates.values():
+        gate.set()
+
+
+def _wait_settled(key):
+    end = time.monotonic() + 5
+    while inf._preload_state.get(key) == 'loading':
+        assert time.monotonic() < end, "preload did not finish"
+        time.sleep(0.005)
+
+
+def test_not_ready_until_preload_finishes(preload):
+    client, gates, _ = preload
+    inf.start_preload()
+    resp = client.get('/ready')
+    assert resp.status_code == 503
+    assert resp.get_json()['status'] == 'starting'
+    assert set(resp.get_json()['models'].values()) == {'loading'}
+
+    keys = list(gates)
+    gates[keys[0]].set()
+    _wait_settled(keys[0])
+    assert client.get('/ready').status_code == 503  # one model still loading
+
+    for key in keys[1:]:
+        gates[key].set()
+        _wait_settled(key)
+    resp = client.get('/ready')
+    assert resp.status_code == 200
+    assert resp.get_json()['models'] == {key: 'ready' for key in keys}
+
+
+def test_failed_preload_is_reported(preload):
+    client, gates, failures = preload
+    bad, good = list(gates)[:2]
+    failures[bad] = 'weights missing'
+    inf.start_preload()
+    gates[bad].set()
+    _wait_settled(bad)
+    gates[good].set()
+    _wait_settled(good)
+    body = client.get('/ready').get_json()
+    assert body['models'][bad] == 'error: weights missing'
+    # Settled with one warm model: ready, and the failure stays visible
+    assert body['ready'] is True
+
+
+def test_every_preload_failing_is_not_ready(preload):
+    client, gates, failures = preload
+    for key in gates:
+        failures[key] = 'no weights'
+    inf.start_preload()
+    for key, gate in gates.items():
+        gate.set()
+        _wait_settled(key)
+    resp = client.get('/ready')
+    assert resp.status_code == 503
+    assert all(v == 'error: no weights' for v in resp.get_json()['models'].values())
+
+
+def test_nothing_to_preload_is_ready(preload, monkeypatch):
+    client, _, _ = preload
+    monkeypatch.setattr(inf, 'PRELOAD_MODELS', 'none')
+    inf.start_preload()
+    assert client.get('/ready').status_code == 200
@@ -0,0 +1,59 @@
+from app.services.recommendations import RecommendationIndex
+
+
+def _r(name, calories, protein=0.0, fat=0.0, carbs=0.0, fiber=0.0):
+    return {"dish_name": name, "serving": "1 portion",
+            "nutrition": {"calories": calories, "protein": protein, "fat": fat, "carbs": carbs, "fiber": fiber}}
+
+
+RESULTS = [
+    _r("steak", 600, protein=50, fat=40),
+    _r("tofu", 150, protein=15, fat=8),
+    _r("egg_white", 50, protein=10),
+    _r("beans", 300, protein=15, carbs=40, fiber=12),
+    _r("water", 0),
+    _r("broth", 0, protein=2),
+    _r("alpha_tofu", 150, protein=15, fat=8),  # ties tofu on everything
+]
+
+
+def _names(items):
+    return [i["dish_name"] for i in items]
+
+
+def test_top_by_amount():
+    index = RecommendationIndex(RESULTS)
+    assert _names(index.top("protein", 2)) == ["steak", "alpha_tofu"]
+    assert index.top("sodium") == []
+
+
+def test_density_ranking_and_ties_by_name():
+    index = RecommendationIndex(RESULTS)
+    items = index.recommend("protein", gap=30, k=10)
+    # egg_white: 20 g/100 kcal, tofu: 10, steak: 8.3, beans: 5; zero-kcal broth last; water has none
+    assert _names(items) == ["egg_white", "alpha_tofu", "tofu", "steak", "beans", "broth"]
+    assert items[0]["rank_by"] == "density" and items[0]["per_100kcal"] == 20.0
+    assert items[0]["covers"] == round(10 / 30, 3)
+
+
+def test_kcal_cap():
+    index = RecommendationIndex(RESULTS)
+    assert "steak" not in _names(index.recommend("protein", gap=30, kcal_cap=400, k=10))
+
+
+def test_calorie_gap_skips_big_overshoots():
+    index = RecommendationIndex(RESULTS)
+    items = index.recommend("calories", gap=300, k=10)
+    assert items[0]["dish_name"] == "beans" and items[0]["rank_by"] == "amount"
+    assert "steak" not in _names(items) and "water" not in _names(items)
+
+
+def test_row_order_does_not_matter():
+    a = RecommendationIndex(RESULTS).recommend("protein", gap=30, k=10)
+    b = RecommendationIndex(list(reversed(RESULTS))).recommend("protein", gap=30, k=10)
+    assert a == b
+
+
+def test_empty_table():
+    index = RecommendationIndex([])
+    assert len(index) == 0 and index.recommend("protein", gap=10) == []
@@ -0,0 +1,91 @@
+import pytest
+from flask import Flask, g, jsonify, request
+
+from app.services import response_cache as rc
+from app.services.response_cache import _Bodies, cached_response, invalidates_user_cache
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache(monkeypatch):
+    monkeypatch.setattr(rc, '_bodies', _Bodies(100, 1 << 20))
+    monkeypatch.setattr(rc, '_versions', None)
+
+
+def _app():
+    app = Flask(__name__)
+    calls = []
+
+    @app.before_request
+    def auth():
+        g.user_id = request.headers.get('X-User-Id')
+
+    @app.get('/summary')
+    @cached_response
+    def summary():
+        calls.append(request.full_path)
+        return jsonify({"success": True, "n": len(calls)})
+
+    @app.post('/log')
+    @invalidates_user_cache
+    def log():
+        return jsonify({"success": True})
+
+    return app.test_client(), calls
+
+
+def test_etag_304_and_body_hit():
+    client, calls = _app()
+    first = client.get('/summary', headers={'X-User-Id': 'u1'})
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and first.headers['Cache-Control'] == 'private, no-cache'
+
+    again = client.get('/summary', headers={'X-User-Id': 'u1'})
+    assert again.headers['ETag'] == etag and again.get_json()["n"] == 1
+
+    revalidate = client.get('/summary', headers={'X-User-Id': 'u1', 'If-None-Match': etag})
+    assert revalidate.status_code == 304
+    assert len(calls) == 1
+
+
+def test_etag_is_per_user_and_path():
+    client, calls = _app()
+    a = client.get('/summary', headers={'X-User-Id': 'u1'}).headers['ETag']
+    b = client.get('/summary', headers={'X-User-Id': 'u2'}).headers['ETag']
+    c = client.get('/summary?days=7', headers={'X-User-Id': 'u1'}).headers['ETag']
+    assert len({a, b, c}) == 3
+    assert len(calls) == 3
+
+
+def test_write_bumps_the_version():
+    client, calls = _app()
+    etag = client.get('/summary', headers={'X-User-Id': 'u3'}).headers['ETag']
+    client.post('/log', headers={'X-User-Id': 'u3'})
+    after = client.get('/summary', headers={'X-User-Id': 'u3', 'If-None-Match': etag})
+    assert after.status_code == 200 and after.headers['ETag'] != etag
+    assert after.get_json()["n"] == 2
+
+
+def test_anonymous_is_not_cached():
+    client, calls = _app()
+    resp = client.get('/summary')
+    assert 'ETag' not in resp.headers
+    client.get('/summary')
+    assert len(calls) == 2
+
+
+def test_bodies_lru_by_total_bytes():
+    size = _Bodies._size(('u', '/a'), b'x' * 100)
+    bodies = _Bodies(100, 2 * size)
+    bodies.put(('u', '/a'), 'ea', b'x' * 100, 'application/json')
+    bodies.put(('u', '/b'), 'eb', b'x' * 100, 'application/json')
+    assert bodies.get(('u', '/a'), 'stale') is None
+    assert bodies.get(('u', '/a'), 'ea') is not None  # /a is now most recent
+    bodies.put(('u', '/c'), 'ec', b'x' * 100, 'application/json')
+    assert bodies.get(('u', '/b'), 'eb') is None
+    assert bodies.get(('u', '/a'), 'ea') is not None
+    # Same key replaces the old version without double counting
+    bodies.put(('u', '/a'), 'ea2', b'y' * 100, 'application/json')
+    assert bodies.stats()['bytes'] == 2 * size
+    # Over the whole budget: skipped
+    bodies.put(('u', '/d'), 'ed', b'x' * (2 * size), 'application/json')
+    assert bodies.get(('u', '/d'), 'ed') is None and bodies.stats()['entries'] == 2
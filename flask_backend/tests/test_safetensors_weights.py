@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("safetensors")
+
+from app.services import safetensors_weights as sw  # noqa: E402
+
+
+@pytest.fixture
+def converted(tmp_path, monkeypatch):
+    monkeypatch.setattr(sw, 'CHECKPOINT_FORMAT', 'auto')
+    pth = tmp_path / "model.pth"
+    pth.write_bytes(b"pickled checkpoint bytes")
+    checkpoint = {"model_state_dict": {"w": torch.arange(6, dtype=torch.float32).reshape(2, 3)},
+                  "class_list": ["pho", "bun_cha"], "num_classes": 2}
+    st = sw.safetensors_path(str(pth))
+    sw.save_checkpoint(checkpoint, st, str(pth), 'vit_b_16')
+    return str(pth), st
+
+
+def test_round_trip(converted):
+    _, st = converted
+    ck = sw.load_checkpoint(st)
+    assert ck["class_list"] == ["pho", "bun_cha"] and ck["num_classes"] == 2 and ck["mmap"]
+    assert torch.equal(ck["model_state_dict"]["w"], torch.arange(6, dtype=torch.float32).reshape(2, 3))
+
+
+def test_fresh_clone_mtime_is_ignored(converted):
+    pth, st = converted
+    os.utime(pth, (1, 1))
+    assert sw.pick_weights(pth, st) == st
+
+
+def test_changed_source_is_stale(converted):
+    pth, st = converted
+    with open(pth, 'r+b') as f:
+        f.write(b"P")  # same size, different content
+    assert sw.pick_weights(pth, st) is None
+    with open(pth, 'ab') as f:
+        f.write(b"more")
+    assert sw.pick_weights(pth, st) is None
+
+
+def test_format_switches(converted, monkeypatch):
+    pth, st = converted
+    monkeypatch.setattr(sw, 'CHECKPOINT_FORMAT', 'pth')
+    assert sw.pick_weights(pth, st) is None
+    monkeypatch.setattr(sw, 'CHECKPOINT_FORMAT', 'safetensors')
+    assert sw.pick_weights(pth, st) == st
+    with pytest.raises(FileNotFoundError):
+        sw.pick_weights(pth, None)
@@ -0,0 +1,55 @@
+import pytest
+
+from app.services import stats_series as ss
+
+from fakes import APIError, FakeClient, FakeSupabase
+
+LOGS = [
+    {"user_id": "u1", "created_at": "2026-10-01T12:00:00+00:00", "calories": 500, "protein": 20},
+    {"user_id": "u1", "created_at": "2026-10-01T13:00:00+00:00", "calories": 300, "protein": 10},
+    {"user_id": "u2", "created_at": "2026-10-01T13:00:00+00:00", "calories": 999},
+]
+RANGE = ("2026-09-30T00:00:00+00:00", "2026-10-03T00:00:00+00:00")
+
+
+@pytest.fixture(autouse=True)
+def _rpc_available(monkeypatch):
+    monkeypatch.setattr(ss, '_HAS_RPC', True)
+
+
+def _sb(rpc=None):
+    client = FakeClient({"food_logs": [dict(r) for r in LOGS]})
+    if rpc is not None:
+        client.rpcs['stats_series'] = rpc
+    return FakeSupabase(client)
+
+
+def _fail(code):
+    def rpc(params):
+        raise APIError('permission denied for function stats_series', code=code)
+    return rpc
+
+
+def test_uses_rpc_rows():
+    sb = _sb(lambda p: [{"key": "2026-10-01", "calories": 800, "protein": 30}])
+    assert ss.stats_series(sb, "u1", *RANGE, 'day') == [
+        {"key": "2026-10-01", "calories": 800.0, "protein": 30.0, "fat": 0.0, "carbs": 0.0, "fiber": 0.0}]
+    assert sb.client.reads == []
+
+
+def test_missing_function_disables_rpc():
+    sb = _sb()
+    rows = ss.stats_series(sb, "u1", *RANGE, 'year')
+    assert rows == [{"key": "2026", "calories": 800.0, "protein": 30.0, "fat": 0.0, "carbs": 0.0, "fiber": 0.0}]
+    assert ss._HAS_RPC is False
+    ss.stats_series(sb, "u1", *RANGE, 'year')
+    assert sb.client.rpc_calls == ['stats_series']
+
+
+def test_other_rpc_errors_fall_back_once():
+    sb = _sb(_fail('42501'))
+    rows = ss.stats_series(sb, "u1", *RANGE, 'year')
+    assert rows[0]["calories"] == 800.0
+    assert ss._HAS_RPC is True
+    ss.stats_series(sb, "u1", *RANGE, 'year')
+    assert sb.client.rpc_calls == ['stats_series', 'stats_series']
@@ -0,0 +1,243 @@
+"""
+Per-stage micro-benchmark of InferenceService.predict: decode, preprocess (the rest of
+_preprocess_pytorch), forward, softmax/top-k and result-dict building, for every model
+key x batch size x thread count, on synthetic images at several resolutions and formats
+(plus --images samples). Prints JSON with p50/p95/p99 ms, images/s and peak RSS per
+model, so runs before/after a torch upgrade or a quantization flag can be diffed.
+
+Usage:
+  python scripts/bench_inference.py [--models vn30,resnet_food101] [--batch-sizes 1,8]
+      [--threads 1,4] [--repeat 30] [--images DIR] [--out bench.json]
+  python scripts/bench_inference.py --compare old.json new.json
+
+Each model runs in its own interpreter so peak RSS is attributable to it. Serving env
+flags (INFERENCE_BACKEND, INFERENCE_COMPILE_MODE, DYNAMIC_QUANTIZE, STATIC_QUANTIZE,
+CHECKPOINT_FORMAT, PREPROCESS_JPEG_DRAFT) apply as in production and are recorded.
+"""
+from __future__ import annotations
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(__file__))
+
+# The benchmark times the forward pass itself, not the micro-batcher's queueing
+os.environ["INFERENCE_BATCHING"] = "false"
+os.environ.setdefault("PRELOAD_MODELS", "none")
+
+import numpy as np  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from bench_preprocess import make_jpeg  # noqa: E402
+
+RESOLUTIONS = [(640, 480), (1920, 1080), (4032, 3024)]
+FORMATS = ['jpeg', 'png', 'webp']
+ENV_FLAGS = ['INFERENCE_BACKEND', 'INFERENCE_COMPILE_MODE', 'DYNAMIC_QUANTIZE', 'STATIC_QUANTIZE',
+             'CHECKPOINT_FORMAT', 'PREPROCESS_JPEG_DRAFT', 'OMP_NUM_THREADS']
+
+
+def encode(w: int, h: int, fmt: str) -> bytes:
+    data = make_jpeg(w, h)
+    if fmt == 'jpeg':
+        return data
+    buf = io.BytesIO()
+    Image.open(io.BytesIO(data)).save(buf, format=fmt.upper())
+    return buf.getvalue()
+
+
+def load_samples(folder: str, limit: int) -> list:
+    names = sorted(f for f in os.listdir(folder) if f.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')))[:limit]
+    return [open(os.path.join(folder, f), 'rb').read() for f in names]
+
+
+def summarize(times_ms: list, images_per_call: int = 1) -> dict:
+    a = np.asarray(times_ms, dtype=np.float64)
+    return {
+        'n': int(a.size),
+        'p50_ms': round(float(np.percentile(a, 50)), 3),
+        'p95_ms': round(float(np.percentile(a, 95)), 3),
+        'p99_ms': round(float(np.percentile(a, 99)), 3),
+        'mean_ms': round(float(a.mean()), 3),
+        'img_per_s': round(images_per_call * 1000.0 / float(np.percentile(a, 50)), 1) if a.size else None,
+    }
+
+
+def timeit(fn, repeat: int, warmup: int) -> list:
+    for _ in range(warmup):
+        fn()
+    out = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        out.append((time.perf_counter() - t0) * 1000.0)
+    return out
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1)
+
+
+def bench_model(model_key: str, batch_sizes: list, threads: list, repeat: int, warmup: int, samples: list) -> dict:
+    from flask_backend.app.services import inference_service as inf
+    from flask_backend.app.services import onnx_backend
+    from flask_backend.app.services.preprocessing import get_preprocessor
+
+    t0 = time.perf_counter()
+    svc = inf.get_inference_service(model_key)
+    load_ms = (time.perf_counter() - t0) * 1000.0
+    state = svc.state
+    pre = get_preprocessor(state.config['architecture'])
+    rows = []
+    base = {'model': model_key, 'backend': state.model_type, 'compile_mode': state.compile_mode}
+    onnx = state.model_type == 'onnx'
+    if not onnx:
+        # Only PyTorch models need it; ONNX-only installs have no torch (see inference_service)
+        import torch
+
+    # Decode + preprocess: per image, independent of batch size and thread count
+    inputs = [(f"{w}x{h}", fmt, encode(w, h, fmt)) for w, h in RESOLUTIONS for fmt in FORMATS]
+    inputs += [('sample', 'file', b) for b in samples]
+    for res, fmt, data in inputs:
+        rows.append({**base, 'stage': 'decode', 'resolution': res, 'format': fmt, 'bytes': len(data),
+                     **summarize(timeit(lambda: pre.decode(data), repeat, warmup))})
+        img = pre.decode(data)
+        to_input = (lambda: pre.to_array(img)) if onnx else (lambda: torch.from_numpy(pre.to_array(img)))
+        rows.append({**base, 'stage': 'preprocess', 'resolution': res, 'format': fmt, 'bytes': len(data),
+                     **summarize(timeit(to_input, repeat, warmup))})
+
+    one = inf._preprocess(make_jpeg(640, 480), state)
+    for n_threads in threads:
+        if onnx:
+            # ORT fixes its thread pool at session creation
+            onnx_backend.ORT_INTRA_OP_THREADS = n_threads
+            state.model = onnx_backend.OnnxModel(state.model_path)
+        else:
+            torch.set_num_threads(n_threads)
+        for bs in batch_sizes:
+            batch = inf._stack(state, [one] * bs)
+            cfg = {**base, 'batch': bs, 'threads': n_threads}
+            if onnx:
+                forward = lambda: state.model(batch)  # noqa: E731
+                logits = forward()
+                topk = lambda: onnx_backend.softmax_topk(logits, inf.TOP_K)  # noqa: E731
+            else:
+                x = batch.to(state.device)
+                if state.channels_last:
+                    x = x.contiguous(memory_format=torch.channels_last)
+
+                def forward():
+                    with torch.no_grad():
+                        return state.model(x)
+                logits = forward()
+
+                def topk():
+                    probs = torch.nn.functional.softmax(logits, dim=1)
+                    p, i = torch.topk(probs, min(inf.TOP_K, probs.shape[1]))
+                    return p.tolist(), i.tolist()
+            top_probs, top_indices = topk()
+            build = lambda: [svc._build_result(p, i) for p, i in zip(top_probs, top_indices)]  # noqa: E731
+            rows.append({**cfg, 'stage': 'forward', **summarize(timeit(forward, repeat, warmup), bs)})
+            rows.append({**cfg, 'stage': 'softmax_topk', **summarize(timeit(topk, repeat, warmup), bs)})
+            rows.append({**cfg, 'stage': 'build_result', **summarize(timeit(build, repeat, warmup), bs)})
+            # End to end on a typical phone-sized JPEG, as predict_many runs it (cache bypassed)
+            photo = encode(1920, 1080, 'jpeg')
+
+            def end_to_end():
+                t = inf._stack(state, [inf._preprocess(photo, state) for _ in range(bs)])
+                p, i = inf._forward_topk(state, t, inf.TOP_K)
+                return [svc._build_result(pp, ii) for pp, ii in zip(p, i)]
+            rows.append({**cfg, 'stage': 'end_to_end', 'resolution': '1920x1080', 'format': 'jpeg',
+                         **summarize(timeit(end_to_end, max(3, repeat // 3), 1), bs)})
+    return {'model': model_key, 'load_ms': round(load_ms, 1), 'warmup_ms': state.warmup_ms,
+            'peak_rss_mb': peak_rss_mb(), 'rows': rows}
+
+
+def environment() -> dict:
+    info = {'python': platform.python_version(), 'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+            'env': {k: os.environ.get(k) for k in ENV_FLAGS}}
+    for mod in ('torch', 'torchvision', 'onnxruntime', 'numpy', 'PIL', 'safetensors'):
+        try:
+            info[mod] = __import__(mod).__version__
+        except Exception:
+            info[mod] = None
+    try:
+        info['git_commit'] = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                            capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        info['git_commit'] = None
+    return info
+
+
+def _row_key(r: dict) -> tuple:
+    return tuple(r.get(k) for k in ('model', 'stage', 'batch', 'threads', 'resolution', 'format'))
+
+
+def compare(old_path: str, new_path: str) -> None:
+    """Print p50 per matching row, new/old (below 1.0 is faster)."""
+    old = {_row_key(r): r for m in json.load(open(old_path))['models'] for r in m.get('rows', [])}
+    print(f"{'model':<15} {'stage':<13} {'bs':>3} {'thr':>3} {'input':<16} {'old p50':>9} {'new p50':>9} {'ratio':>6}")
+    for m in json.load(open(new_path))['models']:
+        for r in m.get('rows', []):
+            o = old.get(_row_key(r))
+            if not o:
+                continue
+            ratio = r['p50_ms'] / o['p50_ms'] if o['p50_ms'] else float('nan')
+            inp = f"{r.get('resolution') or ''} {r.get('format') or ''}".strip()
+            print(f"{r['model']:<15} {r['stage']:<13} {r.get('batch') or '':>3} {r.get('threads') or '':>3} {inp:<16} "
+                  f"{o['p50_ms']:>9.2f} {r['p50_ms']:>9.2f} {ratio:>6.2f}")
+
+
+def main() -> None:
+    from flask_backend.app.services.inference_service import MODEL_CONFIGS
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--models', default=','.join(MODEL_CONFIGS.keys()))
+    ap.add_argument('--batch-sizes', default='1,8')
+    ap.add_argument('--threads', default=','.join(sorted({'1', str(os.cpu_count() or 1)}, key=int)))
+    ap.add_argument('--repeat', type=int, default=30)
+    ap.add_argument('--warmup', type=int, default=3)
+    ap.add_argument('--images', help='folder of sample images (timed as format "file")')
+    ap.add_argument('--max-images', type=int, default=8)
+    ap.add_argument('--out', help='write JSON here as well as stdout')
+    ap.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'))
+    ap.add_argument('--_child', help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    batch_sizes = [int(x) for x in args.batch_sizes.split(',')]
+    threads = [int(x) for x in args.threads.split(',')]
+    if args._child:
+        samples = load_samples(args.images, args.max_images) if args.images else []
+        print(json.dumps(bench_model(args._child, batch_sizes, threads, args.repeat, args.warmup, samples)))
+        return
+
+    report = {'environment': environment(), 'config': {'batch_sizes': batch_sizes, 'threads': threads,
+              'repeat': args.repeat, 'resolutions': [f"{w}x{h}" for w, h in RESOLUTIONS], 'formats': FORMATS},
+              'models': []}
+    passthrough = sys.argv[1:]
+    for key in args.models.split(','):
+        print(f"[bench] {key} ...", file=sys.stderr)
+        out = subprocess.run([sys.executable, __file__, *passthrough, '--_child', key], capture_output=True, text=True)
+        if out.returncode != 0:
+            report['models'].append({'model': key, 'error': out.stderr.strip().splitlines()[-1:] or ['failed']})
+            continue
+        report['models'].append(json.loads(out.stdout.strip().splitlines()[-1]))
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
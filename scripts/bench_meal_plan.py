@@ -0,0 +1,70 @@
+"""
+Time the /api/plan/suggest solver (services/meal_plan.py) over the whole dish table
+against random daily gaps, and report whether it stays inside PLAN_BUDGET_MS.
+
+Usage:
+  python scripts/bench_meal_plan.py [--runs 500] [--scale 1] [--k 3] [--max-items 3]
+
+Uses the CSV, or the Supabase `nutrition` table with USE_SUPABASE_NUTRITION=true.
+--scale N replicates the table N times (names suffixed) to see how the solver holds
+up as the table grows. Exits 1 if the p95 exceeds the budget.
+"""
+from __future__ import annotations
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from dotenv import load_dotenv  # noqa: E402
+load_dotenv(os.path.join(ROOT, ".env"))
+
+import numpy as np  # noqa: E402
+
+from flask_backend.app.services import meal_plan as mp  # noqa: E402
+from flask_backend.app.services.nutrition_goal_service import Profile, calculate_targets  # noqa: E402
+from flask_backend.app.services.nutrition_service import NutritionService  # noqa: E402
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--runs', type=int, default=500)
+    ap.add_argument('--scale', type=int, default=1, help='replicate the dish table N times')
+    ap.add_argument('--k', type=int, default=3)
+    ap.add_argument('--max-items', type=int, default=mp.PLAN_MAX_ITEMS)
+    args = ap.parse_args()
+
+    recs = NutritionService()._store.recs
+    scale = max(1, args.scale)
+    names = [f"{n}#{i}" if i else n for i in range(scale) for n in recs.names]
+    planner = mp.MealPlanner(names, list(recs.servings) * scale, np.tile(recs.values, (scale, 1)))
+    print(f"dishes={len(planner)} options={len(planner.opt_dish)} candidates={mp.PLAN_CANDIDATES} "
+          f"beam={mp.PLAN_BEAM} budget={mp.PLAN_BUDGET_MS}ms")
+
+    rnd = random.Random(0)
+    planner.suggest({'calories': 800}, {'calories': 2000})  # first-call allocations
+    times, truncated, empty = [], 0, 0
+    for _ in range(args.runs):
+        targets = calculate_targets(Profile(age=rnd.randint(18, 70), weight_kg=rnd.uniform(45, 110),
+                                            height_cm=rnd.uniform(150, 195), gender=rnd.choice(('male', 'female')),
+                                            activity=rnd.choice(('sedentary', 'light', 'moderate', 'active'))))
+        eaten = rnd.uniform(0.0, 0.9)
+        remaining = {m: max(0.0, v * (1 - eaten) * rnd.uniform(0.7, 1.3)) for m, v in targets.items()}
+        t0 = time.perf_counter()
+        res = planner.suggest(remaining, targets, k=args.k, max_items=args.max_items)
+        times.append((time.perf_counter() - t0) * 1000)
+        truncated += res['truncated']
+        empty += not res['plans']
+    t = np.array(times)
+    p50, p95, p99 = np.percentile(t, [50, 95, 99])
+    print(f"runs={len(t)} p50={p50:.2f}ms p95={p95:.2f}ms p99={p99:.2f}ms max={t.max():.2f}ms "
+          f"truncated={truncated} no_plan={empty}")
+    if p95 > mp.PLAN_BUDGET_MS:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
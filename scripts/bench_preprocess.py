@@ -0,0 +1,91 @@
+"""
+Benchmark decode + preprocess per image: legacy torchvision Compose (full decode, transforms
+rebuilt per call) vs the cached NumPy path in app/services/preprocessing.py (JPEG draft decode).
+
+Usage: python scripts/bench_preprocess.py [--repeat 20] [--arch resnet50]
+Images are synthetic JPEGs generated in memory, so this runs fully offline.
+"""
+from __future__ import annotations
+import argparse
+import importlib.util
+import io
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from flask_backend.app.services.preprocessing import ImagePreprocessor, ARCH_SPECS  # noqa: E402
+
+SIZES = [(640, 480), (1280, 960), (1920, 1080), (3024, 4032), (4000, 3000)]
+
+
+def make_jpeg(w: int, h: int, quality: int = 90) -> bytes:
+    # Smooth gradients + noise compress like a real photo (pure noise would be unrealistic)
+    rng = np.random.default_rng(0)
+    yy, xx = np.mgrid[0:h, 0:w]
+    base = np.stack([(xx * 255 // max(1, w - 1)), (yy * 255 // max(1, h - 1)), ((xx + yy) % 256)], axis=-1)
+    arr = np.clip(base + rng.integers(-12, 12, size=base.shape), 0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(arr).save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def legacy_preprocess(img_bytes: bytes, architecture: str):
+    import torchvision.transforms as transforms
+    from torchvision.transforms import InterpolationMode
+    interpolation = InterpolationMode.BICUBIC if architecture == 'vit_b_16' else InterpolationMode.BILINEAR
+    transform = transforms.Compose([
+        transforms.Resize((256, 256), interpolation=interpolation),
+        transforms.CenterCrop(224),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
+    ])
+    img = Image.open(io.BytesIO(img_bytes)).convert("RGB")
+    return transform(img).unsqueeze(0)
+
+
+def time_ms(fn, data: bytes, repeat: int) -> list:
+    fn(data)  # warm
+    out = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(data)
+        out.append((time.perf_counter() - t0) * 1000.0)
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--arch", default="resnet50", choices=sorted(ARCH_SPECS))
+    args = ap.parse_args()
+
+    has_tv = importlib.util.find_spec("torchvision") is not None
+    if not has_tv:
+        print("torchvision not installed: legacy column skipped")
+
+    fast = ImagePreprocessor(ARCH_SPECS[args.arch], use_draft=True)
+    no_draft = ImagePreprocessor(ARCH_SPECS[args.arch], use_draft=False)
+    print(f"arch={args.arch} repeat={args.repeat} (median ms per image)")
+    print(f"{'size':>11} {'bytes':>9} {'legacy':>9} {'numpy':>9} {'numpy+draft':>12} {'speedup':>8} {'max|diff|':>10}")
+    for w, h in SIZES:
+        data = make_jpeg(w, h)
+        t_fast = statistics.median(time_ms(fast, data, args.repeat))
+        t_nodraft = statistics.median(time_ms(no_draft, data, args.repeat))
+        if has_tv:
+            t_legacy = statistics.median(time_ms(lambda b: legacy_preprocess(b, args.arch), data, args.repeat))
+            # Draft decode is not bit-exact, so report drift against the legacy tensor
+            diff = float(np.abs(legacy_preprocess(data, args.arch).numpy() - fast(data)).max())
+            print(f"{w:>5}x{h:<5} {len(data):>9} {t_legacy:>9.2f} {t_nodraft:>9.2f} {t_fast:>12.2f} {t_legacy / t_fast:>7.1f}x {diff:>10.3f}")
+        else:
+            print(f"{w:>5}x{h:<5} {len(data):>9} {'-':>9} {t_nodraft:>9.2f} {t_fast:>12.2f} {t_nodraft / t_fast:>7.1f}x {'-':>10}")
+
+
+if __name__ == "__main__":
+    main()
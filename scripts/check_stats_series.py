@@ -0,0 +1,91 @@
+"""
+Check the stats_series SQL function against the Python bucketing it replaced, for
+every bucket size. Point it at a local stack (`supabase start`, then load
+supabase/schema.sql) or any project with the function deployed.
+
+Usage:
+  python scripts/check_stats_series.py --user USER_ID [--start 2024-01-01] [--end 2024-12-31] [--seed 500]
+
+--seed inserts that many synthetic food_logs for the user spread over the range
+(including times near local midnight and DST changes), runs the comparison, and
+deletes them again. Exits 1 if any bucket differs.
+"""
+from __future__ import annotations
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from dotenv import load_dotenv  # noqa: E402
+load_dotenv(os.path.join(ROOT, ".env"))
+
+from flask_backend.app.services import stats_series as ss  # noqa: E402
+from flask_backend.app.services.supabase_service import get_supabase_service  # noqa: E402
+
+SEED_TAG = 'stats-check'
+
+
+def _utc_range(start: date, end: date):
+    local_tz = datetime.now().astimezone().tzinfo
+    s = datetime.combine(start, datetime.min.time(), tzinfo=local_tz).astimezone(timezone.utc)
+    e = datetime.combine(end + timedelta(days=1), datetime.min.time(), tzinfo=local_tz).astimezone(timezone.utc)
+    return s, e
+
+
+def seed(sb, user_id: str, start: datetime, end: datetime, n: int) -> None:
+    rnd = random.Random(0)
+    span = (end - start).total_seconds()
+    rows = []
+    for i in range(n):
+        ts = start + timedelta(seconds=rnd.random() * span)
+        if i % 5 == 0:
+            # Pile some onto local midnight, where an offset/DST mistake moves them a day
+            local = ts.astimezone()
+            ts = local.replace(hour=0, minute=0, second=rnd.randint(0, 59)).astimezone(timezone.utc) - timedelta(seconds=rnd.choice((0, 61)))
+        rows.append({"user_id": user_id, "meal_type": SEED_TAG, "food_name": "seed", "created_at": ts.isoformat(),
+                     **{m: round(rnd.uniform(0, 800 if m == 'calories' else 60), 2) for m in ss.MACROS}})
+    for i in range(0, len(rows), 500):
+        sb.client.table('food_logs').insert(rows[i:i + 500]).execute()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--user', required=True)
+    ap.add_argument('--start', default=(date.today() - timedelta(days=400)).isoformat())
+    ap.add_argument('--end', default=date.today().isoformat())
+    ap.add_argument('--seed', type=int, default=0)
+    args = ap.parse_args()
+    sb = get_supabase_service()
+    start_utc, end_utc = _utc_range(date.fromisoformat(args.start), date.fromisoformat(args.end))
+    print(f"tz={ss.local_tz_name() or 'offset %+d min' % ss._offset_minutes(start_utc)}")
+    if args.seed:
+        seed(sb, args.user, start_utc, end_utc, args.seed)
+    failed = False
+    try:
+        for bucket in ss.BUCKETS:
+            t0 = time.perf_counter()
+            sql = ss.series_sql(sb, args.user, start_utc.isoformat(), end_utc.isoformat(), bucket)
+            t1 = time.perf_counter()
+            py = ss.series_python(sb, args.user, start_utc.isoformat(), end_utc.isoformat(), bucket)
+            t2 = time.perf_counter()
+            a = {r['key']: r for r in sql}
+            b = {r['key']: r for r in py}
+            bad = [k for k in sorted(set(a) | set(b))
+                   if k not in a or k not in b or any(abs(a[k][m] - b[k][m]) > 1e-6 * max(1.0, abs(b[k][m])) for m in ss.MACROS)]
+            print(f"{bucket:<6} buckets sql={len(a):<4} python={len(b):<4} sql={1000 * (t1 - t0):.1f}ms python={1000 * (t2 - t1):.1f}ms"
+                  + (f" MISMATCH {bad[:10]}" if bad else " ok"))
+            failed = failed or bool(bad)
+    finally:
+        if args.seed:
+            sb.client.table('food_logs').delete().eq('user_id', args.user).eq('meal_type', SEED_TAG).execute()
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Convert the pickled .pth checkpoints in ml_models/ to ml_models/<name>.safetensors
+(class_list, num_classes, architecture and source size/SHA-256 stored as metadata),
+then check the converted weights give identical logits and compare cold-load cost.
+
+Usage:
+  python scripts/convert_safetensors.py [model_key ...] [--check-only]
+
+Workers pick the .safetensors file up automatically (CHECKPOINT_FORMAT=auto) and
+memory-map it instead of unpickling the .pth; see services/safetensors_weights.py.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+os.environ["DYNAMIC_QUANTIZE"] = "false"
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import torch  # noqa: E402
+
+from flask_backend.app.services import inference_service as inf  # noqa: E402
+from flask_backend.app.services import safetensors_weights as stw  # noqa: E402
+
+
+def _loader(model_key: str):
+    return inf._load_pytorch_vit if inf.MODEL_CONFIGS[model_key]['architecture'] == 'vit_b_16' else inf._load_pytorch_resnet
+
+
+def _paths(model_key: str):
+    cfg = inf.MODEL_CONFIGS[model_key]
+    model_path = inf._resolve_model_file(cfg['file'])
+    if not model_path:
+        raise SystemExit(f"Checkpoint not found: {cfg['file']}")
+    return model_path, stw.safetensors_path(model_path)
+
+
+def convert(model_key: str) -> str:
+    model_path, out = _paths(model_key)
+    checkpoint = inf._read_checkpoint(model_path, torch.device('cpu'))
+    stw.save_checkpoint(checkpoint, out, model_path, inf.MODEL_CONFIGS[model_key]['architecture'])
+    print(f"[{model_key}] wrote {out} ({os.path.getsize(out)} bytes, source {os.path.getsize(model_path)} bytes)")
+    return out
+
+
+def check(model_key: str) -> float:
+    model_path, st_path = _paths(model_key)
+    size = inf.MODEL_CONFIGS[model_key]['input_size']
+    ref, ref_classes = _loader(model_key)(model_path, torch.device('cpu'))
+    mm, mm_classes = _loader(model_key)(st_path, torch.device('cpu'))
+    if ref_classes != mm_classes:
+        raise SystemExit(f"[{model_key}] class_list mismatch")
+    x = torch.randn(4, 3, size, size)
+    with torch.no_grad():
+        diff = float((ref(x) - mm(x)).abs().max())
+    print(f"[{model_key}] max_abs_logit_diff={diff:.2e} classes={len(mm_classes)}")
+    return diff
+
+
+def _mem_kb() -> dict:
+    out = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(('RssAnon:', 'RssFile:')):
+                key, val = line.split(':')
+                out[key] = int(val.split()[0])
+    return out
+
+
+def _load_child(model_key: str, path: str) -> None:
+    before = _mem_kb()
+    start = time.perf_counter()
+    model, _ = _loader(model_key)(path, torch.device('cpu'))
+    load_ms = (time.perf_counter() - start) * 1000
+    after = _mem_kb()
+    print(json.dumps({
+        'load_ms': round(load_ms, 1),
+        # Anonymous memory is private to each worker; file-backed pages are shared page cache
+        'private_mb': round((after.get('RssAnon', 0) - before.get('RssAnon', 0)) / 1024, 1),
+        'file_backed_mb': round((after.get('RssFile', 0) - before.get('RssFile', 0)) / 1024, 1),
+    }))
+
+
+def measure(model_key: str) -> dict:
+    """Cold load of each format in a fresh interpreter."""
+    report = {}
+    for fmt, path in zip(('pth', 'safetensors'), _paths(model_key)):
+        out = subprocess.run([sys.executable, __file__, '--_load', model_key, path], capture_output=True, text=True, check=True)
+        report[fmt] = json.loads(out.stdout.strip().splitlines()[-1])
+    print(f"[{model_key}] {json.dumps(report)}")
+    return report
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument('models', nargs='*', default=list(inf.MODEL_CONFIGS.keys()))
+    ap.add_argument('--check-only', action='store_true')
+    ap.add_argument('--_load', nargs=2, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args._load:
+        _load_child(*args._load)
+        return
+    if not stw._HAS_SAFETENSORS:
+        raise SystemExit("pip install safetensors")
+
+    failed = []
+    for key in args.models:
+        if not args.check_only:
+            convert(key)
+        if check(key) > 1e-4:
+            failed.append(key)
+        measure(key)
+    if failed:
+        raise SystemExit(f"converted weights disagree with the .pth: {failed}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Export the PyTorch checkpoints in ml_models/ to ONNX (ml_models/<name>.onnx) for the
+onnx backend, then check that ONNX Runtime agrees with the PyTorch path.
+
+Usage:
+  python scripts/export_onnx.py [model_key ...] [--images DIR] [--samples 32] [--check-only]
+
+The class list, num_classes and architecture are stored as ONNX metadata, so serving
+needs only the .onnx file. Agreement is measured on images from --images (jpg/png)
+or on synthetic JPEGs; the run fails if top-1 agreement is below --min-agreement.
+Serve with INFERENCE_BACKEND=onnx or INFERENCE_BACKEND_<KEY>=onnx.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import sys
+
+# Export the fp32 graph: dynamically quantized Linear layers do not export to ONNX
+os.environ["DYNAMIC_QUANTIZE"] = "false"
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np  # noqa: E402
+import torch  # noqa: E402
+
+from flask_backend.app.services import inference_service as inf  # noqa: E402
+from flask_backend.app.services.onnx_backend import OnnxModel, onnx_path, softmax_topk  # noqa: E402
+from flask_backend.app.services.preprocessing import get_preprocessor  # noqa: E402
+from bench_preprocess import make_jpeg  # noqa: E402
+
+
+def load_eager(model_key: str):
+    cfg = inf.MODEL_CONFIGS[model_key]
+    model_path = inf._resolve_model_file(cfg['file'])
+    if not model_path:
+        raise SystemExit(f"Checkpoint not found: {cfg['file']}")
+    loader = inf._load_pytorch_vit if cfg['architecture'] == 'vit_b_16' else inf._load_pytorch_resnet
+    model, class_map = loader(model_path, torch.device('cpu'))
+    return model, class_map, model_path
+
+
+def export(model_key: str) -> str:
+    import onnx
+    cfg = inf.MODEL_CONFIGS[model_key]
+    model, class_map, model_path = load_eager(model_key)
+    out = onnx_path(model_path)
+    size = cfg['input_size']
+    dummy = torch.randn(1, 3, size, size)
+    kwargs = dict(input_names=['input'], output_names=['logits'],
+                  dynamic_axes={'input': {0: 'batch'}, 'logits': {0: 'batch'}}, opset_version=17)
+    # Not under no_grad: that enables nn.MultiheadAttention's fused fast path,
+    # whose aten::_native_multi_head_attention op has no ONNX symbolic
+    try:
+        torch.onnx.export(model, (dummy,), out, dynamo=False, **kwargs)
+    except TypeError:
+        # Older torch without the dynamo switch
+        torch.onnx.export(model, (dummy,), out, **kwargs)
+    proto = onnx.load(out)
+    meta = {
+        'class_list': json.dumps([class_map[i] for i in range(len(class_map))]),
+        'num_classes': str(len(class_map)),
+        'architecture': cfg['architecture'],
+        'model_key': model_key,
+        'source_file': cfg['file'],
+    }
+    del proto.metadata_props[:]
+    for k, v in meta.items():
+        entry = proto.metadata_props.add()
+        entry.key, entry.value = k, v
+    onnx.save(proto, out)
+    print(f"[{model_key}] exported {out} ({os.path.getsize(out)} bytes)")
+    return out
+
+
+def sample_images(images_dir: str | None, n: int) -> list:
+    if images_dir:
+        names = sorted(f for f in os.listdir(images_dir) if f.lower().endswith(('.jpg', '.jpeg', '.png')))[:n]
+        return [open(os.path.join(images_dir, f), 'rb').read() for f in names]
+    return [make_jpeg(320 + 37 * i, 240 + 23 * i) for i in range(n)]
+
+
+def check(model_key: str, images: list) -> float:
+    cfg = inf.MODEL_CONFIGS[model_key]
+    model, _, model_path = load_eager(model_key)
+    ort_model = OnnxModel(onnx_path(model_path))
+    pre = get_preprocessor(cfg['architecture'])
+    batch = np.concatenate([pre(b) for b in images], axis=0)
+    with torch.no_grad():
+        ref = torch.nn.functional.softmax(model(torch.from_numpy(batch)), dim=1).numpy()
+    ref_p, ref_i = softmax_topk(np.log(np.maximum(ref, 1e-30)), 5)
+    ort_p, ort_i = softmax_topk(ort_model(batch), 5)
+    top1 = float(np.mean([a[0] == b[0] for a, b in zip(ref_i, ort_i)]))
+    top5 = float(np.mean([len(set(a) & set(b)) / len(a) for a, b in zip(ref_i, ort_i)]))
+    max_diff = float(np.max(np.abs(np.array(ref_p)[:, 0] - np.array(ort_p)[:, 0])))
+    print(f"[{model_key}] n={len(images)} top1_agreement={top1:.4f} top5_overlap={top5:.4f} max_top1_prob_diff={max_diff:.2e}")
+    return top1
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument('models', nargs='*', default=list(inf.MODEL_CONFIGS.keys()))
+    ap.add_argument('--images', help='folder of sample images for the agreement check')
+    ap.add_argument('--samples', type=int, default=32)
+    ap.add_argument('--min-agreement', type=float, default=0.99)
+    ap.add_argument('--check-only', action='store_true')
+    args = ap.parse_args()
+
+    images = sample_images(args.images, args.samples)
+    failed = []
+    for key in args.models:
+        if not args.check_only:
+            export(key)
+        if check(key, images) < args.min_agreement:
+            failed.append(key)
+    if failed:
+        raise SystemExit(f"top-1 agreement below {args.min_agreement}: {failed}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,24 @@
+"""
+Pre-build frozen TorchScript artifacts (ml_models/<name>.torchscript.pt) for every
+MODEL_CONFIGS entry, e.g. at image build time, so workers started with
+INFERENCE_COMPILE_MODE=torchscript load them directly. Runs fully offline.
+
+Usage: python scripts/export_torchscript.py [model_key ...]
+"""
+from __future__ import annotations
+import os
+import sys
+
+os.environ["INFERENCE_COMPILE_MODE"] = "torchscript"
+os.environ.setdefault("INFERENCE_WARMUP_RUNS", "1")
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from flask_backend.app.services.inference_service import MODEL_CONFIGS, _ensure_model_loaded  # noqa: E402
+from flask_backend.app.services.model_compile import torchscript_path  # noqa: E402
+
+if __name__ == "__main__":
+    keys = sys.argv[1:] or list(MODEL_CONFIGS.keys())
+    for key in keys:
+        state = _ensure_model_loaded(key)
+        print(f"{key}: mode={state.compile_mode} artifact={torchscript_path(state.model_path)}")
@@ -0,0 +1,155 @@
+"""
+Static int8 PTQ for the ResNet-50 Food-101 model (FX graph mode, x86/fbgemm backend).
+
+Calibrates on a local image folder, writes ml_models/best_food101_model.int8.pt and
+prints a JSON report comparing fp32 vs int8: batch-1/batch-8 latency, resident memory
+after load, artifact size and top-1/top-5 agreement. Serve with STATIC_QUANTIZE=true.
+
+Usage:
+  python scripts/quantize_resnet.py --calib DIR [--eval DIR] [--calib-limit 256] [--backend x86]
+Without --calib, synthetic JPEGs are used (only useful for smoke-testing the pipeline).
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+os.environ["DYNAMIC_QUANTIZE"] = "false"
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np  # noqa: E402
+import torch  # noqa: E402
+
+from flask_backend.app.services import inference_service as inf  # noqa: E402
+from flask_backend.app.services.preprocessing import get_preprocessor  # noqa: E402
+from flask_backend.app.services.quantization import (  # noqa: E402
+    QUANT_BACKEND, int8_path, load_int8_artifact, quantize_static_fx, save_int8,
+)
+from bench_preprocess import make_jpeg  # noqa: E402
+
+MODEL_KEY = 'resnet_food101'
+
+
+def load_fp32():
+    cfg = inf.MODEL_CONFIGS[MODEL_KEY]
+    model_path = inf._resolve_model_file(cfg['file'])
+    if not model_path:
+        raise SystemExit(f"Checkpoint not found: {cfg['file']}")
+    model, class_map = inf._load_pytorch_resnet(model_path, torch.device('cpu'))
+    return model, class_map, model_path
+
+
+def load_images(folder: str | None, limit: int) -> list:
+    if folder:
+        names = []
+        for dirpath, _, files in os.walk(folder):
+            names += [os.path.join(dirpath, f) for f in files if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
+        return [open(p, 'rb').read() for p in sorted(names)[:limit]]
+    print("warning: no --calib folder given; calibrating on synthetic images", file=sys.stderr)
+    return [make_jpeg(320 + 29 * i, 240 + 17 * i) for i in range(min(limit, 32))]
+
+
+def to_batches(images: list, batch_size: int = 16):
+    pre = get_preprocessor('resnet50')
+    for i in range(0, len(images), batch_size):
+        yield torch.from_numpy(np.concatenate([pre(b) for b in images[i:i + batch_size]], axis=0))
+
+
+def latency_ms(model, batch_size: int, repeat: int = 10) -> float:
+    x = torch.randn(batch_size, 3, 224, 224)
+    times = []
+    with torch.no_grad():
+        model(x)
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            model(x)
+            times.append((time.perf_counter() - t0) * 1000)
+    return round(statistics.median(times), 2)
+
+
+def rss_mb() -> float:
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def measure_rss(variant: str) -> float:
+    """Resident MB added by loading one variant, measured in a fresh interpreter."""
+    out = subprocess.run([sys.executable, __file__, '--_rss', variant], capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def _rss_child(variant: str) -> None:
+    before = rss_mb()
+    if variant == 'int8':
+        loaded = load_int8_artifact(inf._resolve_model_file(inf.MODEL_CONFIGS[MODEL_KEY]['file']))
+        if loaded is None:
+            raise SystemExit("int8 artifact not loadable")
+        model = loaded[0]
+    else:
+        model, _, _ = load_fp32()
+    latency_ms(model, 1, repeat=1)
+    print(round(rss_mb() - before, 1))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--calib', help='folder of calibration images (searched recursively)')
+    ap.add_argument('--eval', help='folder for the agreement check (default: calibration images)')
+    ap.add_argument('--calib-limit', type=int, default=256)
+    ap.add_argument('--backend', default=QUANT_BACKEND, choices=['x86', 'fbgemm', 'qnnpack'])
+    ap.add_argument('--_rss', help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args._rss:
+        _rss_child(args._rss)
+        return
+
+    fp32, class_map, model_path = load_fp32()
+    calib = load_images(args.calib, args.calib_limit)
+    t0 = time.time()
+    int8, seen = quantize_static_fx(load_fp32()[0], to_batches(calib), 224, args.backend)
+    out = int8_path(model_path)
+    save_int8(int8, out, model_path, class_map, 'resnet50', args.backend, seen)
+    quant_s = time.time() - t0
+
+    eval_images = load_images(args.eval, args.calib_limit) if args.eval else calib
+    ref_i, q_i = [], []
+    with torch.no_grad():
+        for batch in to_batches(eval_images):
+            ref_i += torch.topk(fp32(batch), 5).indices.tolist()
+            q_i += torch.topk(int8(batch), 5).indices.tolist()
+
+    report = {
+        'model': MODEL_KEY,
+        'backend': args.backend,
+        'artifact': out,
+        'calibration_images': seen,
+        'quantize_seconds': round(quant_s, 1),
+        'eval_images': len(eval_images),
+        'top1_agreement': round(float(np.mean([a[0] == b[0] for a, b in zip(ref_i, q_i)])), 4),
+        'top5_overlap': round(float(np.mean([len(set(a) & set(b)) / 5 for a, b in zip(ref_i, q_i)])), 4),
+        'size_bytes': {'fp32': os.path.getsize(model_path), 'int8': os.path.getsize(out)},
+        'latency_ms_batch1': {'fp32': latency_ms(fp32, 1), 'int8': latency_ms(int8, 1)},
+        'latency_ms_batch8': {'fp32': latency_ms(fp32, 8), 'int8': latency_ms(int8, 8)},
+        'rss_mb_after_load': {'fp32': measure_rss('fp32'), 'int8': measure_rss('int8')},
+        'torch_threads': torch.get_num_threads(),
+    }
+    for k in ('latency_ms_batch1', 'latency_ms_batch8'):
+        report[k]['speedup'] = round(report[k]['fp32'] / max(report[k]['int8'], 1e-6), 2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
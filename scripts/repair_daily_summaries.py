@@ -0,0 +1,42 @@
+"""
+Recompute daily_summaries from food_logs and rewrite rows that drifted from the
+write-path updates (see services/daily_summary.py). Run once after deploying the
+apply_daily_summary_delta function, then periodically (e.g. nightly cron).
+
+Usage:
+  python scripts/repair_daily_summaries.py [--days 30] [--user USER_ID] [--dry-run]
+
+Needs SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY. Days are the server's local
+calendar days, so run it with the same TZ as the backend.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import sys
+from datetime import date, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from dotenv import load_dotenv  # noqa: E402
+load_dotenv(os.path.join(ROOT, ".env"))
+
+from flask_backend.app.services.daily_summary import repair_daily_summaries  # noqa: E402
+from flask_backend.app.services.supabase_service import get_supabase_service  # noqa: E402
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--days', type=int, default=30, help='check the last N days, today included')
+    ap.add_argument('--user', help='only this user id')
+    ap.add_argument('--dry-run', action='store_true', help='report drifted rows without writing')
+    args = ap.parse_args()
+    end = date.today()
+    start = end - timedelta(days=max(1, args.days) - 1)
+    report = repair_daily_summaries(get_supabase_service(), start, end, user_id=args.user, dry_run=args.dry_run)
+    print(json.dumps({"start": start.isoformat(), "end": end.isoformat(), **report}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
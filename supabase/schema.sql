@@ -47,6 +47,77 @@ alter table public.daily_summaries enable row level security;
 create policy if not exists "Profiles own" on public.profiles for all using (auth.uid() = user_id) with check (auth.uid() = user_id);
 create policy if not exists "Food logs own" on public.food_logs for all using (auth.uid() = user_id) with check (auth.uid() = user_id);
 create policy if not exists "Daily summaries own" on public.daily_summaries for all using (auth.uid() = user_id) with check (auth.uid() = user_id);
+-- Write-path maintenance of daily_summaries: add a (possibly negative) macro delta to
+-- one day's totals in a single statement, creating the row if needed. Called by the
+-- backend on meal insert/delete; values are clamped at 0 (scripts/repair_daily_summaries.py fixes drift).
+create or replace function public.apply_daily_summary_delta(p_user_id uuid, p_day date, p_delta jsonb)
+returns public.daily_summaries
+language sql
+as $$
+  insert into public.daily_summaries as s (user_id, day, totals, updated_at)
+  select p_user_id, p_day, coalesce(jsonb_object_agg(d.key, greatest(0, d.value::numeric)), '{}'::jsonb), now()
+  from jsonb_each_text(p_delta) d
+  on conflict (user_id, day) do update set
+    totals = (
+      select coalesce(jsonb_object_agg(k.key, greatest(0, coalesce((s.totals->>k.key)::numeric, 0) + coalesce((p_delta->>k.key)::numeric, 0))), '{}'::jsonb)
+      from (select jsonb_object_keys(s.totals) as key union select jsonb_object_keys(p_delta)) k
+    ),
+    updated_at = now()
+  returning *;
+$$;
+-- Per-user time-range scans (history, stats) read food_logs by (user_id, created_at);
+-- id is the keyset tiebreaker for /api/meals/history pages
+create index if not exists food_logs_user_created_id_idx on public.food_logs (user_id, created_at, id);
+drop index if exists public.food_logs_user_created_idx;
+-- /api/stats/series: nutrition totals per local day / ISO week / month / year, one row
+-- per non-empty bucket. p_tz is an IANA zone name; when null, p_offset_minutes (east
+-- of UTC) is applied instead. Keys match the backend's labels (2024-05-01, 2024-W18, 2024-05, 2024).
+create or replace function public.stats_series(
+  p_user_id uuid,
+  p_start timestamptz,
+  p_end timestamptz,
+  p_bucket text default 'day',
+  p_tz text default null,
+  p_offset_minutes int default 0
+)
+returns table (key text, bucket_start date, calories numeric, protein numeric, fat numeric, carbs numeric, fiber numeric, meals bigint)
+language sql
+stable
+as $$
+  with local_logs as (
+    select
+      case when p_tz is not null then f.created_at at time zone p_tz
+           else (f.created_at at time zone 'UTC') + make_interval(mins => p_offset_minutes) end as local_ts,
+      f.calories, f.protein, f.fat, f.carbs, f.fiber
+    from public.food_logs f
+    where f.user_id = p_user_id
+      and f.created_at >= p_start
+      and f.created_at < p_end
+  ),
+  bucketed as (
+    select
+      date_trunc(case when p_bucket in ('day', 'week', 'month', 'year') then p_bucket else 'day' end, l.local_ts)::date as b_start,
+      l.calories, l.protein, l.fat, l.carbs, l.fiber
+    from local_logs l
+  )
+  select
+    case p_bucket
+      when 'week' then to_char(b.b_start, 'IYYY-"W"IW')
+      when 'month' then to_char(b.b_start, 'YYYY-MM')
+      when 'year' then to_char(b.b_start, 'YYYY')
+      else to_char(b.b_start, 'YYYY-MM-DD')
+    end,
+    b.b_start,
+    coalesce(sum(b.calories), 0),
+    coalesce(sum(b.protein), 0),
+    coalesce(sum(b.fat), 0),
+    coalesce(sum(b.carbs), 0),
+    coalesce(sum(b.fiber), 0),
+    count(*)
+  from bucketed b
+  group by b.b_start
+  order by b.b_start;
+$$;
 -- Storage bucket (create from UI or CLI). Name: food-uploads (public)
 -- Optional: App-level Users table (public) referencing auth.users
 create table if not exists public.users (